@@ -0,0 +1,333 @@
+"""Пакетный (неинтерактивный) расчет фигур из CSV/JSONL файла.
+
+Входной файл читается потоком, расчет идет частями по chunk_size строк, а
+результаты сразу пишутся в выходной файл и, при необходимости, в базу.
+Поэтому расход памяти не зависит от размера файла.
+"""
+import csv
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from geometry_package import Parallelepiped, Tetrahedron, Sphere, Material, Steel, Aluminum, Copper, ShapeBatch
+from geometry_package.base import Shape3D
+from geometry_package.cache import ResultCache, default_cache
+from geometry_package.dedup import deduplicate
+from database import GeometryDatabase, PARAMETER_COLUMNS
+
+SHAPE_CLASSES = {
+    'Parallelepiped': Parallelepiped,
+    'Tetrahedron': Tetrahedron,
+    'Sphere': Sphere
+}
+
+# Материалы ищутся без учета регистра по русскому и английскому названию
+MATERIALS = {}
+for _material in (Steel(), Aluminum(), Copper()):
+    MATERIALS[_material.name.lower()] = _material
+    MATERIALS[_material.__class__.__name__.lower()] = _material
+
+# Сколько пропущенных строк перечислять в stderr; остальные только считаются
+MAX_REPORTED_ERRORS = 20
+
+# Форматы входного файла, которые понимает read_parts
+INPUT_EXTENSIONS = ('.csv', '.jsonl', '.ndjson')
+
+RESULT_FIELDS = ('line', 'type', 'material', *PARAMETER_COLUMNS, 'volume', 'surface_area', 'mass')
+
+def check_input(path: str):
+    """Проверка формата и наличия входного файла до создания выходного"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in INPUT_EXTENSIONS:
+        raise ValueError(f"Неподдерживаемый формат входного файла: {extension}")
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"Входной файл не найден: {path}")
+
+def materials_for(db: Optional[GeometryDatabase] = None) -> Dict[str, Material]:
+    """Материалы для part_to_shape: встроенные и, если задана база, все
+    материалы ее справочника с известной плотностью (справочник перечитывается)"""
+    materials = dict(MATERIALS)
+    if db is not None:
+        db.materials.reload()
+        for material in db.materials:
+            materials[material.name.lower()] = material
+    return materials
+
+def read_parts(path: str, raw: bool = False) -> Iterator[Any]:
+    """Потоковое чтение описаний деталей из .csv или .jsonl файла.
+    
+    С raw=True строки JSONL выдаются без разбора: их разбирает evaluate_parts,
+    в том числе в рабочих процессах evaluate_parts_parallel.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if extension == '.csv':
+            for row in csv.DictReader(f):
+                yield {key: value for key, value in row.items() if value not in (None, '')}
+        elif extension in ('.jsonl', '.ndjson'):
+            for line in f:
+                if line.strip():
+                    yield line if raw else json.loads(line)
+        else:
+            raise ValueError(f"Неподдерживаемый формат входного файла: {extension}")
+
+def part_to_shape(part: Dict[str, Any], materials: Optional[Dict[str, Material]] = None
+                  ) -> Tuple[Shape3D, Dict[str, float]]:
+    """Фигура и ее параметры по описанию детали.
+    
+    materials - материалы по названию в нижнем регистре (см. materials_for),
+    по умолчанию встроенные MATERIALS.
+    """
+    if materials is None:
+        materials = MATERIALS
+    if not isinstance(part, dict):
+        raise ValueError("Описание детали должно быть объектом")
+    shape_type = part.get('type')
+    if shape_type not in SHAPE_CLASSES:
+        raise ValueError(f"Неизвестный тип фигуры: {shape_type}")
+    
+    material_name = str(part.get('material', '')).lower()
+    if material_name not in materials:
+        raise ValueError(f"Неизвестный материал: {part.get('material')}")
+    
+    parameters = {}
+    for name in ShapeBatch.PARAMETERS[shape_type]:
+        if name not in part:
+            raise ValueError(f"Не задан параметр {name}")
+        value = float(part[name])
+        if value <= 0:
+            raise ValueError(f"Параметр {name} должен быть положительным")
+        parameters[name] = value
+    
+    shape = SHAPE_CLASSES[shape_type](**parameters, material=materials[material_name])
+    return shape, parameters
+
+def parse_parts(parts: Iterable[Any], on_error: Optional[Callable[[int, str], None]] = None,
+                first_line: int = 1, materials: Optional[Dict[str, Material]] = None
+                ) -> Iterator[Tuple[int, Shape3D, Dict[str, float]]]:
+    """Фигуры по потоку деталей; выдает (номер строки, фигура, параметры).
+    
+    Деталь - словарь или неразобранная строка JSONL. Некорректные строки
+    пропускаются, о каждой сообщается через on_error.
+    """
+    for line, part in enumerate(parts, start=first_line):
+        try:
+            if isinstance(part, str):
+                part = json.loads(part)
+            shape, parameters = part_to_shape(part, materials)
+        except (ValueError, TypeError) as e:
+            if on_error is not None:
+                on_error(line, str(e))
+            continue
+        yield line, shape, parameters
+
+def evaluate_parts(parts: Iterable[Any], chunk_size: int = 1000,
+                   cache: ResultCache = default_cache,
+                   on_error: Optional[Callable[[int, str], None]] = None,
+                   first_line: int = 1, materials: Optional[Dict[str, Material]] = None
+                   ) -> Iterator[Tuple[int, Dict[str, Any], Dict[str, float]]]:
+    """Расчет потока деталей частями; выдает (номер строки, результат, параметры)"""
+    parsed = parse_parts(parts, on_error, first_line, materials)
+    while True:
+        chunk = list(islice(parsed, chunk_size))
+        if not chunk:
+            break
+        
+        lines, shapes, parameters = zip(*chunk)
+        for line, result, shape_parameters in zip(lines, cache.calculate_many(shapes), parameters):
+            yield line, result, shape_parameters
+
+def evaluate_parts_deduplicated(parts: Iterable[Any], chunk_size: int = 1000, tolerance: float = 0.0,
+                                cache: ResultCache = default_cache,
+                                on_error: Optional[Callable[[int, str], None]] = None,
+                                materials: Optional[Dict[str, Material]] = None
+                                ) -> Iterator[Tuple[int, Dict[str, Any], Dict[str, float], int]]:
+    """Расчет потока деталей со схлопыванием повторов; выдает (номер строки,
+    результат, параметры, число повторов).
+    
+    Одинаковые детали (тип, параметры с шагом tolerance и материал) считаются
+    один раз; номер строки и параметры берутся у первого вхождения. Поток
+    читается целиком, в памяти хранятся только уникальные детали.
+    """
+    unique = deduplicate(parse_parts(parts, on_error, materials=materials), tolerance, shape_of=itemgetter(1))
+    while True:
+        chunk = list(islice(unique, chunk_size))
+        if not chunk:
+            break
+        
+        results = cache.calculate_many(shape for (_, shape, _), _ in chunk)
+        for ((line, _, parameters), count), result in zip(chunk, results):
+            yield line, result, parameters, count
+
+def result_row(line: int, result: Dict[str, Any], parameters: Dict[str, float]) -> Dict[str, Any]:
+    """Строка выходного файла"""
+    row = {'line': line, 'type': result['type'], 'material': result['material']}
+    for name in PARAMETER_COLUMNS:
+        row[name] = parameters.get(name)
+    row['volume'] = result['volume']
+    row['surface_area'] = result['surface_area']
+    row['mass'] = result['mass']
+    return row
+
+class ResultWriter:
+    """Потоковая запись результатов в .csv или .jsonl"""
+    
+    def __init__(self, path: str, fieldnames: Tuple[str, ...] = RESULT_FIELDS):
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in ('.csv', '.jsonl', '.ndjson'):
+            raise ValueError(f"Неподдерживаемый формат выходного файла: {extension}")
+        self._file = open(path, 'w', encoding='utf-8', newline='')
+        self._csv = None
+        if extension == '.csv':
+            self._csv = csv.DictWriter(self._file, fieldnames=fieldnames)
+            self._csv.writeheader()
+    
+    def write(self, row: Dict[str, Any]):
+        if self._csv is not None:
+            self._csv.writerow(row)
+        else:
+            self._file.write(json.dumps(row, ensure_ascii=False) + '\n')
+    
+    def close(self):
+        self._file.close()
+    
+    def __enter__(self) -> 'ResultWriter':
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def _evaluate_chunk(first_line: int, parts: List[Any], materials: Optional[Dict[str, Material]] = None
+                    ) -> Tuple[List[Tuple[int, Dict[str, Any], Dict[str, float]]], List[Tuple[int, str]]]:
+    """Расчет одной части в рабочем процессе; номера строк сквозные по файлу"""
+    errors: List[Tuple[int, str]] = []
+    results = list(evaluate_parts(parts, max(len(parts), 1), first_line=first_line,
+                                  on_error=lambda line, message: errors.append((line, message)),
+                                  materials=materials))
+    return results, errors
+
+def evaluate_parts_parallel(parts: Iterable[Any], workers: int, chunk_size: int = 5000,
+                            ordered: bool = True,
+                            on_error: Optional[Callable[[int, str], None]] = None,
+                            materials: Optional[Dict[str, Material]] = None
+                            ) -> Iterator[Tuple[int, Dict[str, Any], Dict[str, float]]]:
+    """Параллельный вариант evaluate_parts на пуле процессов.
+    
+    Поток деталей режется на части по chunk_size, части считаются в workers
+    процессах. В работе одновременно не больше 2 * workers частей, поэтому
+    память ограничена и при большом файле. При ordered=True результаты выдаются
+    в порядке входного файла, иначе - по мере готовности частей. Детали могут
+    быть словарями или неразобранными строками JSONL; materials передаются
+    в процессы вместе с каждой частью.
+    """
+    numbered = enumerate(parts, start=1)
+    max_in_flight = 2 * workers
+    
+    def next_chunk():
+        chunk = list(islice(numbered, chunk_size))
+        if not chunk:
+            return None
+        return chunk[0][0], [part for _, part in chunk]
+    
+    def drain(future):
+        results, errors = future.result()
+        if on_error is not None:
+            for line, message in errors:
+                on_error(line, message)
+        return results
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = deque()
+        exhausted = False
+        while True:
+            while not exhausted and len(in_flight) < max_in_flight:
+                chunk = next_chunk()
+                if chunk is None:
+                    exhausted = True
+                    break
+                in_flight.append(executor.submit(_evaluate_chunk, *chunk, materials))
+            if not in_flight:
+                break
+            
+            if ordered:
+                done = in_flight.popleft()
+            else:
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                done = finished.pop()
+                in_flight.remove(done)
+            yield from drain(done)
+
+def run_batch(input_path: str, output_path: str, db: Optional[GeometryDatabase] = None,
+              chunk_size: int = 1000, workers: int = 1, ordered: bool = True,
+              dedup: bool = False, tolerance: float = 0.0) -> Dict[str, Any]:
+    """Расчет всех деталей входного файла с записью в файл и, если задано, в базу.
+    
+    При workers > 1 расчет идет в пуле процессов (см. evaluate_parts_parallel),
+    запись в файл и базу остается в основном процессе. С dedup=True повторы
+    схлопываются до расчета (см. evaluate_parts_deduplicated): в файл попадает
+    одна строка на уникальную деталь со столбцом count, а в базу - count строк
+    с одним и тем же результатом, как и без dedup.
+    dedup не сочетается с workers > 1 и ordered=False: ValueError до создания
+    выходного файла, как и для отрицательного tolerance, chunk_size или workers < 1 и
+    входного файла неподдерживаемого формата (FileNotFoundError - если его нет).
+    С базой детали могут ссылаться на материалы ее справочника (materials_for).
+    """
+    if chunk_size < 1:
+        raise ValueError("Размер части должен быть положительным")
+    if workers < 1:
+        raise ValueError("Число процессов должно быть положительным")
+    check_input(input_path)
+    if tolerance < 0:
+        raise ValueError("Допуск не может быть отрицательным")
+    if dedup and (workers > 1 or not ordered):
+        raise ValueError("Схлопывание повторов не сочетается с workers > 1 и ordered=False")
+    errors = 0
+    written = 0
+    total = 0
+    
+    def report_error(line: int, message: str):
+        nonlocal errors
+        errors += 1
+        if errors <= MAX_REPORTED_ERRORS:
+            print(f"Строка {line} пропущена: {message}", file=sys.stderr)
+    
+    # Строки JSONL разбираются в evaluate_parts, чтобы битая строка только пропускалась
+    parts = read_parts(input_path, raw=True)
+    materials = materials_for(db)
+    if dedup:
+        evaluated = evaluate_parts_deduplicated(parts, chunk_size, tolerance, on_error=report_error,
+                                                materials=materials)
+    elif workers > 1:
+        evaluated = evaluate_parts_parallel(parts, workers, chunk_size, ordered, on_error=report_error,
+                                            materials=materials)
+    else:
+        evaluated = evaluate_parts(parts, chunk_size, on_error=report_error, materials=materials)
+    pending: List[Tuple[Dict[str, Any], Dict[str, float]]] = []
+    
+    with ResultWriter(output_path, RESULT_FIELDS + ('count',) if dedup else RESULT_FIELDS) as writer:
+        for line, result, parameters, *count in evaluated:
+            row = result_row(line, result, parameters)
+            if dedup:
+                row['count'] = count[0]
+            writer.write(row)
+            written += 1
+            total += count[0] if dedup else 1
+            if db is not None:
+                # Каждое вхождение - отдельный расчет в базе, иначе статистика занижена
+                pending.extend([(result, parameters)] * (count[0] if dedup else 1))
+                if len(pending) >= chunk_size:
+                    db.save_calculations(pending, chunk_size)
+                    pending = []
+    
+    if db is not None and pending:
+        db.save_calculations(pending, chunk_size)
+    
+    summary = {'rows': written, 'errors': errors}
+    if dedup:
+        summary['parts'] = total
+    return summary
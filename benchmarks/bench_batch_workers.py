@@ -0,0 +1,62 @@
+"""Масштабирование пакетного режима по числу процессов.
+
+Генерирует входной JSONL файл со случайными деталями и прогоняет run_batch
+с разным числом рабочих процессов.
+
+Запуск: python benchmarks/bench_batch_workers.py [--parts N] [--workers 1 2 4]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from batch_runner import run_batch
+
+def generate_parts(path, count, seed=1):
+    rng = random.Random(seed)
+    materials = ['Сталь', 'Алюминий', 'Медь']
+    with open(path, 'w', encoding='utf-8') as f:
+        for _ in range(count):
+            kind = rng.randrange(3)
+            if kind == 0:
+                part = {'type': 'Sphere', 'radius': rng.uniform(0.01, 2.0)}
+            elif kind == 1:
+                part = {'type': 'Tetrahedron', 'edge': rng.uniform(0.01, 2.0)}
+            else:
+                part = {'type': 'Parallelepiped', 'length': rng.uniform(0.01, 2.0),
+                        'width': rng.uniform(0.01, 2.0), 'height': rng.uniform(0.01, 2.0)}
+            part['material'] = rng.choice(materials)
+            f.write(json.dumps(part, ensure_ascii=False) + '\n')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--parts', type=int, default=200_000)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument('--unordered', action='store_true')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, 'parts.jsonl')
+        generate_parts(input_path, args.parts)
+
+        print(f"Деталей: {args.parts}, ядер: {os.cpu_count()}")
+        print(f"{'процессов':>10}{'время, с':>12}{'деталей/с':>14}{'ускорение':>12}")
+        baseline = None
+        for workers in args.workers:
+            output_path = os.path.join(tmp, f'results_{workers}.csv')
+            start = time.perf_counter()
+            run_batch(input_path, output_path, chunk_size=args.chunk_size,
+                      workers=workers, ordered=not args.unordered)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"{workers:>10}{elapsed:>12.2f}{args.parts / elapsed:>14.0f}{baseline / elapsed:>12.2f}")
+
+if __name__ == "__main__":
+    main()
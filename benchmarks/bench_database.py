@@ -0,0 +1,75 @@
+"""Сравнение прежней схемы "соединение на каждый вызов" с долгоживущим соединением.
+
+Запуск: python benchmarks/bench_database.py [--rows N]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from database import GeometryDatabase, INSERT_CALCULATION
+from geometry_package import Sphere, Steel
+
+def per_call_insert(db_path, row):
+    # Так работал save_calculation до перехода на долгоживущее соединение
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute(INSERT_CALCULATION, row)
+    conn.commit()
+    conn.close()
+
+def per_call_count(db_path):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute('SELECT COUNT(*) FROM calculations')
+    result = cursor.fetchone()[0]
+    conn.close()
+    return result
+
+def measure(label, rows, insert, read):
+    start = time.perf_counter()
+    for shape_data, parameters in rows:
+        insert(shape_data, parameters)
+    write_time = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    for _ in range(len(rows)):
+        read()
+    read_time = time.perf_counter() - start
+    
+    print(f"{label:<34}{len(rows) / write_time:>14.0f}{len(rows) / read_time:>14.0f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=2000)
+    args = parser.parse_args()
+    
+    rows = [(Sphere(0.1 + i * 1e-4, Steel()).to_dict(), {'radius': 0.1 + i * 1e-4})
+            for i in range(args.rows)]
+    
+    print(f"{'Вариант':<34}{'запись, стр/с':>14}{'чтение, оп/с':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'per_call.db')
+        # Схема и справочник материалов для строк вставки
+        schema = GeometryDatabase(path)
+        schema.close()
+        measure("connect на каждый вызов", rows,
+                lambda d, p: per_call_insert(path, schema._calculation_row(d, p)),
+                lambda: per_call_count(path))
+        
+        count_sql = 'SELECT COUNT(*) FROM calculations'
+        with GeometryDatabase(os.path.join(tmp, 'persistent.db')) as db:
+            measure("долгоживущее соединение", rows, db.save_calculation,
+                    lambda: db.connection.execute(count_sql).fetchone())
+        
+        with GeometryDatabase(os.path.join(tmp, 'tuned.db'), wal=True,
+                              cache_size_kib=64 * 1024, mmap_size=256 * 1024 * 1024) as db:
+            measure("соединение + WAL/NORMAL/cache/mmap", rows, db.save_calculation,
+                    lambda: db.connection.execute(count_sql).fetchone())
+
+if __name__ == "__main__":
+    main()
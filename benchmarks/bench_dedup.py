@@ -0,0 +1,97 @@
+"""Схлопывание повторов на входе с большим числом одинаковых деталей.
+
+Детали берутся случайно из каталога --unique позиций. Сравниваются:
+попарное сравнение через __eq__ (O(n²), на выборке --naive-count),
+deduplicate по хешу и пакетный режим с записью в базу без --dedup и с ним.
+
+Запуск: python benchmarks/bench_dedup.py [--parts N] [--unique U]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from batch_runner import run_batch, part_to_shape
+from database import GeometryDatabase
+from geometry_package import deduplicate
+
+def catalog(count, seed=1):
+    rng = random.Random(seed)
+    materials = ['Сталь', 'Алюминий', 'Медь']
+    parts = []
+    for _ in range(count):
+        kind = rng.randrange(3)
+        if kind == 0:
+            part = {'type': 'Sphere', 'radius': round(rng.uniform(0.01, 2.0), 3)}
+        elif kind == 1:
+            part = {'type': 'Tetrahedron', 'edge': round(rng.uniform(0.01, 2.0), 3)}
+        else:
+            part = {'type': 'Parallelepiped', 'length': round(rng.uniform(0.01, 2.0), 3),
+                    'width': round(rng.uniform(0.01, 2.0), 3), 'height': round(rng.uniform(0.01, 2.0), 3)}
+        part['material'] = rng.choice(materials)
+        parts.append(part)
+    return parts
+
+def naive_deduplicate(shapes):
+    # Поиск повтора перебором списка уникальных: так приходилось делать без __hash__
+    unique, counts = [], []
+    for shape in shapes:
+        for index, seen in enumerate(unique):
+            if seen == shape and seen.material is shape.material:
+                counts[index] += 1
+                break
+        else:
+            unique.append(shape)
+            counts.append(1)
+    return list(zip(unique, counts))
+
+def timed(action):
+    start = time.perf_counter()
+    result = action()
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--parts', type=int, default=200_000)
+    parser.add_argument('--unique', type=int, default=1000)
+    parser.add_argument('--naive-count', type=int, default=20_000)
+    args = parser.parse_args()
+    
+    rng = random.Random(2)
+    items = catalog(args.unique)
+    parts = [rng.choice(items) for _ in range(args.parts)]
+    shapes = [part_to_shape(part)[0] for part in parts]
+    print(f"Деталей: {args.parts}, уникальных в каталоге: {args.unique}")
+    print(f"{'способ':<36}{'деталей':>10}{'время, с':>11}{'деталей/с':>13}{'уникальных':>12}")
+    
+    def report(label, count, seconds, unique):
+        print(f"{label:<36}{count:>10}{seconds:>11.3f}{count / seconds:>13.0f}{unique:>12}")
+    
+    sample = shapes[:args.naive_count]
+    seconds, pairs = timed(lambda: naive_deduplicate(sample))
+    report("перебор через __eq__", len(sample), seconds, len(pairs))
+    seconds, pairs = timed(lambda: list(deduplicate(sample)))
+    report("deduplicate (хеш)", len(sample), seconds, len(pairs))
+    seconds, pairs = timed(lambda: list(deduplicate(shapes)))
+    report("deduplicate (хеш)", len(shapes), seconds, len(pairs))
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, 'parts.jsonl')
+        with open(input_path, 'w', encoding='utf-8') as f:
+            for part in parts:
+                f.write(json.dumps(part, ensure_ascii=False) + '\n')
+        
+        for dedup in (False, True):
+            label = "run_batch + база" + (" --dedup" if dedup else "")
+            with GeometryDatabase(os.path.join(tmp, f'batch_{dedup}.db')) as db:
+                seconds, summary = timed(lambda: run_batch(
+                    input_path, os.path.join(tmp, 'results.csv'), db, chunk_size=5000, dedup=dedup))
+            report(label, args.parts, seconds, summary['rows'])
+
+if __name__ == "__main__":
+    main()
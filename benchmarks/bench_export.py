@@ -0,0 +1,73 @@
+"""Время и память выгрузки истории расчетов в XLSX и DOCX.
+
+Заполняет временную базу N расчетами и выгружает ее целиком. С --trace-memory
+дополнительно измеряется пик памяти Python (tracemalloc замедляет выгрузку,
+поэтому время и память меряются отдельными прогонами).
+
+Запуск: python benchmarks/bench_export.py [--rows N] [--trace-memory]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from database import GeometryDatabase
+from geometry_package import Parallelepiped, Tetrahedron, Sphere, Steel, Aluminum, Copper
+from reports import export_xlsx, export_docx
+
+def generate_calculations(count, seed=1):
+    rng = random.Random(seed)
+    materials = [Steel(), Aluminum(), Copper()]
+    for _ in range(count):
+        material = rng.choice(materials)
+        kind = rng.randrange(3)
+        if kind == 0:
+            radius = rng.uniform(0.01, 2.0)
+            yield Sphere(radius, material).to_dict(), {'radius': radius}
+        elif kind == 1:
+            edge = rng.uniform(0.01, 2.0)
+            yield Tetrahedron(edge, material).to_dict(), {'edge': edge}
+        else:
+            length, width, height = (rng.uniform(0.01, 2.0) for _ in range(3))
+            yield (Parallelepiped(length, width, height, material).to_dict(),
+                   {'length': length, 'width': width, 'height': height})
+
+def measure(label, export, db, path, rows, trace_memory):
+    start = time.perf_counter()
+    export(db, path)
+    elapsed = time.perf_counter() - start
+    line = f"{label:<6}{elapsed:>10.2f}{rows / elapsed:>14.0f}{os.path.getsize(path) / 2**20:>12.1f}"
+    
+    if trace_memory:
+        tracemalloc.start()
+        export(db, path)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        line += f"{peak / 2**20:>16.1f}"
+    print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--trace-memory', action='store_true')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        with GeometryDatabase(os.path.join(tmp, 'export.db')) as db:
+            db.save_calculations(generate_calculations(args.rows), chunk_size=10000)
+            
+            print(f"Строк: {args.rows}")
+            header = f"{'формат':<6}{'время, с':>10}{'строк/с':>14}{'файл, МБ':>12}"
+            if args.trace_memory:
+                header += f"{'пик памяти, МБ':>16}"
+            print(header)
+            measure('xlsx', export_xlsx, db, os.path.join(tmp, 'history.xlsx'), args.rows, args.trace_memory)
+            measure('docx', export_docx, db, os.path.join(tmp, 'history.docx'), args.rows, args.trace_memory)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Скорость fast_power и fast_power_batch в сравнении со встроенным pow.
+
+Сценарии: степень по модулю для больших чисел (как в RSA), степень без
+модуля с ростом результата и пакет оснований с общим показателем. Окно 1 -
+прежний двоичный алгоритм, для сравнения с выбором окна по длине показателя.
+
+Запуск: python benchmarks/bench_fast_power.py [--bits 2048] [--bases 100]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from task import fast_power, fast_power_batch
+
+def timed(action, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = action()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def report(title, cases, repeat):
+    print(title)
+    reference_time, reference = timed(cases[0][1], repeat)
+    print(f"  {cases[0][0]:<36}{reference_time * 1000:>10.2f} мс")
+    for label, action in cases[1:]:
+        elapsed, result = timed(action, repeat)
+        assert result == reference, label
+        print(f"  {label:<36}{elapsed * 1000:>10.2f} мс{reference_time / elapsed:>8.2f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bits', type=int, default=2048)
+    parser.add_argument('--bases', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    
+    rng = random.Random(1)
+    mod = rng.getrandbits(args.bits) | (1 << (args.bits - 1)) | 1
+    exponent = rng.getrandbits(args.bits)
+    base = rng.randrange(2, mod)
+    
+    report(f"Степень по модулю, {args.bits} бит (скорость относительно pow):", [
+        ('pow(base, exponent, mod)', lambda: pow(base, exponent, mod)),
+        ('fast_power, окно 1 (двоичный)', lambda: fast_power(base, exponent, mod, window=1)),
+        ('fast_power, окно по умолчанию', lambda: fast_power(base, exponent, mod)),
+    ], args.repeat)
+    
+    small_base = rng.getrandbits(64)
+    power = 20000
+    report(f"Степень без модуля: 64-битное основание, показатель {power}:", [
+        ('base ** exponent', lambda: small_base ** power),
+        ('fast_power, окно 1 (двоичный)', lambda: fast_power(small_base, power, window=1)),
+        ('fast_power, окно по умолчанию', lambda: fast_power(small_base, power)),
+    ], args.repeat)
+    
+    bases = [rng.randrange(2, mod) for _ in range(args.bases)]
+    report(f"Пакет из {args.bases} оснований, общий показатель {args.bits} бит:", [
+        ('[pow(b, e, mod) ...]', lambda: [pow(b, exponent, mod) for b in bases]),
+        ('[fast_power(b, e, mod) ...]', lambda: [fast_power(b, exponent, mod) for b in bases]),
+        ('fast_power_batch', lambda: fast_power_batch(bases, exponent, mod)),
+    ], args.repeat)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Масштабирование точного целочисленного корня integer_nth_root по длине числа.
+
+Для чисел от десятков до сотен тысяч десятичных знаков выводит время и число
+итераций целочисленного метода Ньютона; число итераций растет как логарифм
+длины числа. Для сравнения - поплавковый nth_root_newton, который на числах
+больше 1e308 не работает, а на меньших теряет младшие разряды.
+
+Запуск: python benchmarks/bench_integer_root.py [--digits 100 1000 ...] [--degrees 2 3 7]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from task import _integer_newton, integer_nth_root, nth_root_newton
+
+def float_root_error(number, n, root):
+    # Относительное отличие поплавкового корня от точного
+    try:
+        return abs(int(nth_root_newton(number, n)) - root) / root
+    except OverflowError:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--digits', type=int, nargs='+', default=[20, 100, 300, 1000, 10000, 100000])
+    parser.add_argument('--degrees', type=int, nargs='+', default=[2, 3, 7])
+    args = parser.parse_args()
+    
+    rng = random.Random(1)
+    print(f"{'знаков':>8}{'n':>4}{'итераций':>10}{'время, мс':>12}{'отн. ошибка float':>20}")
+    for digits in args.digits:
+        number = rng.randrange(10 ** (digits - 1), 10 ** digits)
+        for n in args.degrees:
+            start = time.perf_counter()
+            root, iterations = _integer_newton(number, n)
+            elapsed = time.perf_counter() - start
+            assert integer_nth_root(number, n)[0] == root
+            
+            error = float_root_error(number, n, root)
+            error_text = 'переполнение' if error is None else f"{error:.1e}"
+            print(f"{digits:>8}{n:>4}{iterations:>10}{elapsed * 1000:>12.3f}{error_text:>20}")
+
+if __name__ == "__main__":
+    main()
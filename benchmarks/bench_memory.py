@@ -0,0 +1,92 @@
+"""Замер памяти на один экземпляр фигуры и материала.
+
+Сравнивает текущую компоновку со __slots__ с прежней компоновкой на __dict__,
+которую воспроизводят классы _Legacy* ниже.
+
+Запуск: python benchmarks/bench_memory.py [--count N]
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from geometry_package import Parallelepiped, Tetrahedron, Sphere, Material
+
+class _LegacyMaterial:
+    def __init__(self, name, density):
+        self._name = name
+        self._density = density
+
+class _LegacyShape:
+    def __init__(self, material=None):
+        self._material = material
+        self._volume = None
+        self._surface_area = None
+
+class _LegacyParallelepiped(_LegacyShape):
+    def __init__(self, length, width, height, material=None):
+        super().__init__(material)
+        self._length = length
+        self._width = width
+        self._height = height
+
+class _LegacyTetrahedron(_LegacyShape):
+    def __init__(self, edge, material=None):
+        super().__init__(material)
+        self._edge = edge
+
+class _LegacySphere(_LegacyShape):
+    def __init__(self, radius, material=None):
+        super().__init__(material)
+        self._radius = radius
+
+def bytes_per_instance(factory, count):
+    """Средний прирост памяти на один созданный объект"""
+    gc.collect()
+    tracemalloc.start()
+    # Список ссылок нужен, чтобы объекты не освобождались; его размер вычитаем
+    objects = [None] * count
+    baseline = tracemalloc.get_traced_memory()[0]
+    for i in range(count):
+        objects[i] = factory(i)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return (after - baseline) / count
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=200_000)
+    args = parser.parse_args()
+    
+    material = Material("Сталь", 7850.0)
+    # Аргументы заранее созданы и общие для обеих компоновок, чтобы в замер
+    # попадали только сами экземпляры
+    values = [float(i % 1000) + 0.5 for i in range(1000)]
+    
+    cases = [
+        ("Parallelepiped",
+         lambda i: _LegacyParallelepiped(values[i % 1000], 2.0, 3.0, material),
+         lambda i: Parallelepiped(values[i % 1000], 2.0, 3.0, material)),
+        ("Tetrahedron",
+         lambda i: _LegacyTetrahedron(values[i % 1000], material),
+         lambda i: Tetrahedron(values[i % 1000], material)),
+        ("Sphere",
+         lambda i: _LegacySphere(values[i % 1000], material),
+         lambda i: Sphere(values[i % 1000], material)),
+        ("Material",
+         lambda i: _LegacyMaterial("Сталь", values[i % 1000]),
+         lambda i: Material("Сталь", values[i % 1000])),
+    ]
+    
+    print(f"{'Класс':<16}{'__dict__, байт':>16}{'__slots__, байт':>17}{'экономия':>10}")
+    for name, legacy, current in cases:
+        before = bytes_per_instance(legacy, args.count)
+        after = bytes_per_instance(current, args.count)
+        print(f"{name:<16}{before:>16.1f}{after:>17.1f}{1 - after / before:>10.0%}")
+
+if __name__ == "__main__":
+    main()
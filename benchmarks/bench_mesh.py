@@ -0,0 +1,82 @@
+"""Загрузка и расчет треугольной сетки из двоичного STL.
+
+Файл со сферой из --facets треугольников читается двумя способами:
+разбором записей через struct (на выборке --naive-count) и read_stl
+(numpy.memmap без копирования). Для сетки из memmap считаются объем и
+площадь TriangleMesh и сравниваются с аналитическими для сферы.
+
+Запуск: python benchmarks/bench_mesh.py [--facets N]
+"""
+import argparse
+import math
+import os
+import struct
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from geometry_package import TriangleMesh, Steel, read_stl, write_stl
+
+def sphere_triangles(radius, facets):
+    # Сфера по параллелям и меридианам: rings * 2 * rings ячеек по два треугольника
+    rings = max(2, int(math.sqrt(facets / 4)))
+    theta = np.linspace(0, np.pi, rings + 1)
+    phi = np.linspace(0, 2 * np.pi, 2 * rings + 1)
+    theta, phi = np.meshgrid(theta, phi, indexing='ij')
+    points = np.stack([radius * np.sin(theta) * np.cos(phi),
+                       radius * np.sin(theta) * np.sin(phi),
+                       radius * np.cos(theta)], axis=-1)
+    a, b, c, d = points[:-1, :-1], points[1:, :-1], points[1:, 1:], points[:-1, 1:]
+    return np.concatenate([np.stack([a, b, c], axis=-2).reshape(-1, 3, 3),
+                           np.stack([a, c, d], axis=-2).reshape(-1, 3, 3)])
+
+def naive_read_stl(path, limit):
+    # Разбор записей по одной через struct, как без memmap
+    triangles = []
+    with open(path, 'rb') as f:
+        f.seek(80)
+        count = min(struct.unpack('<I', f.read(4))[0], limit)
+        for _ in range(count):
+            record = struct.unpack('<12fH', f.read(50))
+            triangles.append((record[3:6], record[6:9], record[9:12]))
+    return triangles
+
+def timed(action):
+    start = time.perf_counter()
+    result = action()
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--facets', type=int, default=2_000_000)
+    parser.add_argument('--naive-count', type=int, default=200_000)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'sphere.stl')
+        write_stl(path, sphere_triangles(1.0, args.facets))
+        print(f"Треугольников: {len(read_stl(path))}, файл: {os.path.getsize(path) / 2**20:.1f} МБ")
+        print(f"{'операция':<36}{'треугольников':>15}{'время, с':>11}{'треуг./с':>14}")
+        
+        def report(label, count, seconds):
+            print(f"{label:<36}{count:>15}{seconds:>11.4f}{count / seconds:>14.0f}")
+        
+        seconds, triangles = timed(lambda: naive_read_stl(path, args.naive_count))
+        report("чтение через struct", len(triangles), seconds)
+        seconds, mesh = timed(lambda: TriangleMesh.from_stl(path, Steel()))
+        report("TriangleMesh.from_stl (memmap)", len(mesh), seconds)
+        seconds, volume = timed(lambda: mesh.volume)
+        report("объем", len(mesh), seconds)
+        seconds, area = timed(lambda: mesh.surface_area)
+        report("площадь", len(mesh), seconds)
+        print(f"Объем {volume:.6f} (сфера {4 / 3 * math.pi:.6f}), "
+              f"площадь {area:.6f} (сфера {4 * math.pi:.6f}), масса {mesh.mass:.1f} кг")
+        # memmap держит файл открытым до удаления сетки
+        del mesh
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Корень n-й степени: прежний nth_root_newton, новый скалярный, пакетный и x ** (1/n).
+
+Числа берутся равномерно по порядкам от 1e-300 до 1e300. Прежняя версия
+(начальное приближение number / n, абсолютная точность) для больших чисел не
+останавливается, поэтому здесь ее итерации ограничены LEGACY_MAX_ITERATIONS.
+
+Запуск: python benchmarks/bench_nth_root.py [--count N] [--degrees 2 3 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from task import nth_root_newton, nth_root_newton_batch
+
+LEGACY_MAX_ITERATIONS = 5000
+
+def legacy_nth_root_newton(number, n, precision=1e-10):
+    # Прежняя реализация из task.py; возвращает корень и число итераций
+    x = number / n
+    for iteration in range(1, LEGACY_MAX_ITERATIONS + 1):
+        x_new = ((n - 1) * x + number / (x ** (n - 1))) / n
+        if abs(x_new - x) < precision:
+            return x_new, iteration
+        x = x_new
+    return x, LEGACY_MAX_ITERATIONS
+
+def timed(action):
+    start = time.perf_counter()
+    result = action()
+    return time.perf_counter() - start, result
+
+def max_relative_error(roots, reference):
+    with np.errstate(all='ignore'):
+        return float(np.nanmax(np.abs(np.asarray(roots) / reference - 1)))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=1_000_000)
+    parser.add_argument('--legacy-count', type=int, default=2000)
+    parser.add_argument('--degrees', type=int, nargs='+', default=[2, 3, 5, 7])
+    args = parser.parse_args()
+    
+    numbers = np.logspace(-300, 300, args.count)
+    sample = numbers[::max(args.count // args.legacy_count, 1)]
+    print(f"Чисел: {args.count}, для скалярных версий: {len(sample)}")
+    print(f"{'n':>3}  {'способ':<26}{'мкс/число':>11}{'итераций ср/макс':>20}{'отн. ошибка':>14}")
+    
+    for n in args.degrees:
+        elapsed, reference = timed(lambda: numbers ** (1 / n))
+        rows = [('x ** (1/n)', elapsed / len(numbers), '', 0.0)]
+        
+        elapsed, (roots, iterations) = timed(lambda: nth_root_newton_batch(numbers, n))
+        rows.append(('nth_root_newton_batch', elapsed / len(numbers),
+                     f"{iterations.mean():.1f}/{iterations.max()}", max_relative_error(roots, reference)))
+        
+        sample_reference = sample ** (1 / n)
+        elapsed, roots = timed(lambda: [nth_root_newton(x, n) for x in sample])
+        rows.append(('nth_root_newton', elapsed / len(sample), '',
+                     max_relative_error(roots, sample_reference)))
+        
+        # Прежняя версия на части чисел переполняется; ошибка попадает в последний столбец
+        with np.errstate(all='ignore'):
+            elapsed, legacy = timed(lambda: [legacy_nth_root_newton(x, n) for x in sample])
+        legacy_iterations = np.array([iteration for _, iteration in legacy])
+        rows.append(('прежний nth_root_newton', elapsed / len(sample),
+                     f"{legacy_iterations.mean():.1f}/{legacy_iterations.max()}",
+                     max_relative_error([root for root, _ in legacy], sample_reference)))
+        
+        for label, seconds, iterations_text, error in rows:
+            print(f"{n:>3}  {label:<26}{seconds * 1e6:>11.3f}{iterations_text:>20}{error:>14.2e}")
+
+if __name__ == "__main__":
+    main()
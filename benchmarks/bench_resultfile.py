@@ -0,0 +1,72 @@
+"""Повторная загрузка результатов для анализа: SQLite, CSV и двоичный файл.
+
+Для каждого источника считается суммарная масса шаров: из базы - запросом по
+calculations, из CSV - чтением всего файла, из файла результатов - по
+столбцам memmap без копирования записей.
+
+Запуск: python benchmarks/bench_resultfile.py [--rows N]
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from database import GeometryDatabase
+from geometry_package import ResultFile
+from bench_export import generate_calculations
+
+def timed(label, action):
+    start = time.perf_counter()
+    value = action()
+    print(f"{label:<28}{time.perf_counter() - start:>10.3f}{value:>20.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=500_000)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'results.db')
+        csv_path = os.path.join(tmp, 'results.csv')
+        bin_path = os.path.join(tmp, 'results.bin')
+        
+        with GeometryDatabase(db_path) as db:
+            db.save_calculations(generate_calculations(args.rows), chunk_size=10000)
+            with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(('shape_type', 'material', 'volume', 'surface_area', 'mass'))
+                for row in db.iter_calculations(batch_size=10000):
+                    writer.writerow((row['shape_type'], row['material'], row['volume'],
+                                     row['surface_area'], row['mass']))
+            
+            start = time.perf_counter()
+            db.export_results(bin_path)
+            print(f"Строк: {args.rows}, выгрузка в файл результатов: {time.perf_counter() - start:.2f} с, "
+                  f"{os.path.getsize(bin_path) / 2**20:.1f} МБ")
+            print(f"{'источник':<28}{'время, с':>10}{'масса шаров, кг':>20}")
+            
+            timed('SQLite (SUM по запросу)', lambda: db.connection.execute(
+                "SELECT SUM(mass) FROM calculations WHERE shape_type = 'Sphere'").fetchone()[0])
+            timed('SQLite (iter_calculations)', lambda: sum(
+                row['mass'] for row in db.iter_calculations(batch_size=10000)
+                if row['shape_type'] == 'Sphere'))
+        
+        def from_csv():
+            with open(csv_path, encoding='utf-8', newline='') as f:
+                return sum(float(row['mass']) for row in csv.DictReader(f) if row['shape_type'] == 'Sphere')
+        
+        def from_result_file():
+            with ResultFile(bin_path) as results:
+                return float(np.sum(results.column('mass'), where=results.mask(shape_type='Sphere')))
+        
+        timed('CSV', from_csv)
+        timed('Файл результатов (memmap)', from_result_file)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Нагрузочный тест HTTP сервиса расчетов.
+
+Клиенты держат keep-alive соединения и шлют запросы POST /calculate (или
+/calculate/batch с --batch-size); по времени ответа считаются p50 и p99.
+Без --port сервис запускается в этом же процессе на временной базе.
+
+Запуск: python benchmarks/load_test.py [--requests N] [--concurrency C] [--port P]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from database import GeometryDatabase
+from geometry_package import ResultCache
+from service import CalculationService
+
+def random_part(rng):
+    material = rng.choice(['Сталь', 'Алюминий', 'Медь'])
+    kind = rng.randrange(3)
+    if kind == 0:
+        return {'type': 'Sphere', 'radius': round(rng.uniform(0.01, 2.0), 3), 'material': material}
+    if kind == 1:
+        return {'type': 'Tetrahedron', 'edge': round(rng.uniform(0.01, 2.0), 3), 'material': material}
+    return {'type': 'Parallelepiped', 'length': round(rng.uniform(0.01, 2.0), 3),
+            'width': round(rng.uniform(0.01, 2.0), 3), 'height': round(rng.uniform(0.01, 2.0), 3),
+            'material': material}
+
+async def client(host, port, requests, batch_size, seed, latencies):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(requests):
+            if batch_size:
+                path, payload = '/calculate/batch', [random_part(rng) for _ in range(batch_size)]
+            else:
+                path, payload = '/calculate', random_part(rng)
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            request = (f"POST {path} HTTP/1.1\r\nHost: {host}\r\n"
+                       f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n")
+            
+            start = time.perf_counter()
+            writer.write(request.encode('latin-1') + body)
+            status_line = await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                if name.lower() == 'content-length':
+                    length = int(value)
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            
+            if status_line.split()[1] != b'200':
+                raise RuntimeError(f"Ошибка сервиса: {status_line.decode().strip()}")
+    finally:
+        writer.close()
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+async def run(args):
+    service = None
+    host, port = args.host, args.port
+    tmp = tempfile.TemporaryDirectory()
+    if port is None:
+        db = GeometryDatabase(os.path.join(tmp.name, 'load.db'), wal=True)
+        service = CalculationService(db, cache=ResultCache(), queue_size=args.queue_size)
+        host, port = await service.start(host, 0)
+    
+    latencies = []
+    per_client = max(args.requests // args.concurrency, 1)
+    start = time.perf_counter()
+    await asyncio.gather(*(client(host, port, per_client, args.batch_size, seed, latencies)
+                           for seed in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    
+    if service is not None:
+        flush_start = time.perf_counter()
+        await service.stop()
+        flush_elapsed = time.perf_counter() - flush_start
+        saved = service.saved
+        service.db.close()
+    tmp.cleanup()
+    
+    print(f"Запросов: {len(latencies)}, клиентов: {args.concurrency}, "
+          f"деталей в запросе: {args.batch_size or 1}")
+    print(f"Запросов/с: {len(latencies) / elapsed:.0f}")
+    print(f"p50: {percentile(latencies, 0.50) * 1000:.2f} мс")
+    print(f"p99: {percentile(latencies, 0.99) * 1000:.2f} мс")
+    print(f"max: {max(latencies) * 1000:.2f} мс, среднее: {statistics.mean(latencies) * 1000:.2f} мс")
+    if service is not None:
+        print(f"Сохранено в базу: {saved}, дозапись очереди при остановке: {flush_elapsed:.2f} с")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=None,
+                        help='Порт запущенного сервиса; без него сервис запускается здесь же')
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--batch-size', type=int, default=0,
+                        help='Деталей в запросе /calculate/batch; 0 - запросы /calculate')
+    parser.add_argument('--queue-size', type=int, default=10000)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+"""Набор замеров горячих путей с сохранением в JSON и сравнением с базовой линией.
+
+Каждый замер выполняется --repeat раз, в результат идет медиана времени на
+одну операцию. Результаты пишутся в JSON (--output) и сравниваются с
+сохраненной базовой линией benchmarks/baseline.json: замер, ставший медленнее
+в --threshold раз, считается регрессией, и скрипт завершается с кодом 1.
+
+Запуск:
+    python benchmarks/run_benchmarks.py                    # замер и сравнение
+    python benchmarks/run_benchmarks.py --only database    # только замеры с "database" в имени
+    python benchmarks/run_benchmarks.py --save-baseline    # обновить базовую линию
+
+Базовая линия зависит от машины: сравнивать имеет смысл замеры, сделанные на
+том же оборудовании, поэтому при смене машины ее нужно пересохранить.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from database import GeometryDatabase
+from geometry_package import Parallelepiped, Tetrahedron, Sphere, Steel, Copper, ShapeStore, CompositeShape, deduplicate
+from geometry_package import TriangleMesh, write_stl
+from geometry_package import instrumentation
+from reports import export_xlsx, export_docx
+from bench_export import generate_calculations
+from bench_mesh import sphere_triangles
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+# Реестр замеров: имя -> функция, которая готовит данные и возвращает
+# (операция, число элементарных операций в одном ее вызове)
+BENCHMARKS = {}
+
+# Базы, открытые замерами; закрываются перед удалением временного каталога
+_databases = []
+
+def benchmark(name):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+@benchmark('shapes.scalar_properties')
+def scalar_properties(tmp, scale):
+    count = 10000 * scale
+    radii = [0.5 + i / count for i in range(count)]
+    steel = Steel()
+    
+    def operation():
+        for radius in radii:
+            shape = Sphere(radius, steel)
+            shape.volume
+            shape.surface_area
+            shape.mass
+    return operation, count
+
+@benchmark('shapes.cached_property_access')
+def cached_property_access(tmp, scale):
+    shape = Parallelepiped(1.0, 2.0, 3.0, Steel())
+    count = 100000 * scale
+    
+    def operation():
+        for _ in range(count):
+            shape.volume
+    return operation, count
+
+@benchmark('shapes.cached_property_access_metrics')
+def cached_property_access_metrics(tmp, scale):
+    # То же, что cached_property_access, но со включенным сбором метрик
+    shape = Parallelepiped(1.0, 2.0, 3.0, Steel())
+    count = 100000 * scale
+    
+    def operation():
+        instrumentation.enable()
+        try:
+            for _ in range(count):
+                shape.volume
+        finally:
+            instrumentation.disable()
+            instrumentation.metrics.reset()
+    return operation, count
+
+@benchmark('shapes.to_dict')
+def to_dict(tmp, scale):
+    count = 10000 * scale
+    shapes = [Tetrahedron(0.5 + i / count, Copper()) for i in range(count)]
+    
+    def operation():
+        for shape in shapes:
+            shape.to_dict()
+    return operation, count
+
+@benchmark('shapes.bulk_create')
+def bulk_create(tmp, scale):
+    count = 10000 * scale
+    steel = Steel()
+    
+    def operation():
+        [Parallelepiped(1.0, 2.0, 3.0 + i, steel) for i in range(count)]
+    return operation, count
+
+@benchmark('shapes.bulk_create_store')
+def bulk_create_store(tmp, scale):
+    count = 100000 * scale
+    radius = np.linspace(0.1, 2.0, count)
+    material_ids = np.zeros(count, dtype=np.int32)
+    
+    def operation():
+        store = ShapeStore.from_columns('Sphere', material_ids, [Steel()], radius=radius)
+        store.batch().mass
+    return operation, count
+
+@benchmark('shapes.composite_material_change')
+def composite_material_change(tmp, scale):
+    # Смена материала детали в сборке из 10000 деталей и чтение массы сборки
+    assembly = CompositeShape()
+    parts = assembly.add_parameters('Sphere', Steel(), radius=np.linspace(0.1, 2.0, 10000 * scale))
+    materials = [Steel(), Copper()]
+    count = 10000
+    
+    def operation():
+        for i in range(count):
+            parts[i % len(parts)].material = materials[i % 2]
+            assembly.mass
+    return operation, count
+
+@benchmark('shapes.deduplicate')
+def deduplicate_parts(tmp, scale):
+    # 100000 деталей из каталога в 1000 позиций
+    count = 100000 * scale
+    steel = Steel()
+    shapes = [Sphere(0.1 + (i * 7919 % 1000) / 1000, steel) for i in range(count)]
+    
+    def operation():
+        for _ in deduplicate(shapes):
+            pass
+    return operation, count
+
+@benchmark('shapes.mesh_volume')
+def mesh_volume(tmp, scale):
+    # Объем и площадь сетки из STL, отображенного в память; операция - треугольник
+    path = os.path.join(tmp, 'sphere.stl')
+    write_stl(path, sphere_triangles(1.0, 200000 * scale))
+    steel = Steel()
+    count = len(TriangleMesh.from_stl(path))
+    
+    def operation():
+        mesh = TriangleMesh.from_stl(path, steel)
+        mesh.volume
+        mesh.surface_area
+    return operation, count
+
+def _filled_database(tmp, name, rows):
+    db = GeometryDatabase(os.path.join(tmp, name))
+    _databases.append(db)
+    if rows:
+        db.save_calculations(generate_calculations(rows), chunk_size=10000)
+    return db
+
+@benchmark('database.save_calculation')
+def save_calculation(tmp, scale):
+    db = _filled_database(tmp, 'save.db', 0)
+    count = 200 * scale
+    calculations = list(generate_calculations(count))
+    
+    def operation():
+        for shape_data, parameters in calculations:
+            db.save_calculation(shape_data, parameters)
+    return operation, count
+
+@benchmark('database.save_calculations')
+def save_calculations(tmp, scale):
+    db = _filled_database(tmp, 'bulk.db', 0)
+    count = 10000 * scale
+    calculations = list(generate_calculations(count))
+    
+    def operation():
+        db.save_calculations(calculations)
+    return operation, count
+
+@benchmark('database.history_page')
+def history_page(tmp, scale):
+    db = _filled_database(tmp, 'history.db', 10000 * scale)
+    count = 200
+    
+    def operation():
+        after_id = None
+        for _ in range(count):
+            page = db.get_calculations_page(after_id, 20)
+            after_id = page[-1]['id']
+    return operation, count
+
+@benchmark('database.iter_calculations')
+def iter_calculations(tmp, scale):
+    count = 10000 * scale
+    db = _filled_database(tmp, 'iter.db', count)
+    
+    def operation():
+        for _ in db.iter_calculations(batch_size=1000):
+            pass
+    return operation, count
+
+@benchmark('database.query_top_k')
+def query_top_k(tmp, scale):
+    db = _filled_database(tmp, 'query.db', 20000 * scale)
+    count = 100
+    
+    def operation():
+        for _ in range(count):
+            db.query_calculations(material='Медь', created_after='2000-01-01', order_by='mass', limit=50)
+    return operation, count
+
+def _statistics_benchmark(rows):
+    def setup(tmp, scale):
+        db = _filled_database(tmp, f'statistics_{rows}.db', rows * scale)
+        count = 100
+        
+        def operation():
+            for _ in range(count):
+                db.get_statistics()
+        return operation, count
+    return setup
+
+# Время get_statistics не должно расти вместе с таблицей
+for _rows in (1000, 10000, 100000):
+    benchmark(f'database.get_statistics_{_rows}')(_statistics_benchmark(_rows))
+
+@benchmark('reports.export_xlsx')
+def report_xlsx(tmp, scale):
+    count = 5000 * scale
+    db = _filled_database(tmp, 'xlsx.db', count)
+    path = os.path.join(tmp, 'history.xlsx')
+    return lambda: export_xlsx(db, path), count
+
+@benchmark('reports.export_docx')
+def report_docx(tmp, scale):
+    count = 5000 * scale
+    db = _filled_database(tmp, 'docx.db', count)
+    path = os.path.join(tmp, 'history.docx')
+    return lambda: export_docx(db, path), count
+
+def measure(name, tmp, repeat, scale):
+    operation, count = BENCHMARKS[name](tmp, scale)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        operation()
+        timings.append(time.perf_counter() - start)
+    seconds = statistics.median(timings)
+    print(f"{name:<36}{seconds / count * 1e6:>14.3f} мкс/оп")
+    return {
+        'seconds_per_op': seconds / count,
+        'ops': count,
+        'repeat': repeat,
+        'median_seconds': seconds
+    }
+
+def run(names, repeat, scale):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            for name in names:
+                results[name] = measure(name, tmp, repeat, scale)
+        finally:
+            while _databases:
+                _databases.pop().close()
+    return results
+
+def compare(results, baseline, threshold):
+    # Возвращает имена замеров, ставших медленнее базовой линии в threshold раз
+    regressions = []
+    print(f"\n{'замер':<36}{'база, мкс':>12}{'сейчас, мкс':>14}{'отношение':>11}")
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"{name:<36}{'-':>12}{result['seconds_per_op'] * 1e6:>14.3f}{'новый':>11}")
+            continue
+        base = baseline[name]['seconds_per_op']
+        ratio = result['seconds_per_op'] / base
+        mark = '  РЕГРЕССИЯ' if ratio > threshold else ''
+        print(f"{name:<36}{base * 1e6:>12.3f}{result['seconds_per_op'] * 1e6:>14.3f}{ratio:>11.2f}{mark}")
+        if ratio > threshold:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', default='', help='Подстрока имени замера')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--scale', type=int, default=1, help='Множитель объема данных')
+    parser.add_argument('--output', default=None, help='Файл для результатов в JSON')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--threshold', type=float, default=1.5,
+                        help='Во сколько раз замер может быть медленнее базы (по умолчанию 1.5)')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Записать результаты как новую базовую линию')
+    args = parser.parse_args()
+    
+    names = [name for name in BENCHMARKS if args.only in name]
+    if not names:
+        parser.error(f"Нет замеров с '{args.only}' в имени")
+    
+    report = {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'scale': args.scale
+        },
+        'results': run(names, args.repeat, args.scale)
+    }
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    
+    if args.save_baseline:
+        baseline = {'meta': report['meta'], 'results': {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding='utf-8') as f:
+                baseline['results'] = json.load(f)['results']
+        baseline['results'].update(report['results'])
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+        print(f"\nБазовая линия сохранена: {args.baseline}")
+        return
+    
+    if not os.path.exists(args.baseline):
+        print("\nБазовой линии нет; сохраните ее флагом --save-baseline")
+        return
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline['meta'].get('scale') != args.scale:
+        print(f"\nВнимание: базовая линия снята с --scale {baseline['meta'].get('scale')}")
+    regressions = compare(report['results'], baseline['results'], args.threshold)
+    if regressions:
+        print(f"\nРегрессии: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
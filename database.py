@@ -1,121 +1,1077 @@
+import ast
+import atexit
+import json
+import queue
 import sqlite3
 import os
+import threading
+import time
 from datetime import datetime
-from typing import List, Dict, Any
+from itertools import islice
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple, Union
+
+import numpy as np
+
+from geometry_package.cache import content_hash
+from geometry_package.instrumentation import instrumented
+from geometry_package.materials import Material, Steel, Aluminum, Copper
+from geometry_package.resultfile import RESULT_DTYPE, ResultFile, ResultFileWriter
+
+# Версия схемы хранится в PRAGMA user_version; миграции в GeometryDatabase._migrate
+SCHEMA_VERSION = 3
+
+# Параметры фигур дублируются в типизированных столбцах для индексных запросов
+PARAMETER_COLUMNS = ('length', 'width', 'height', 'edge', 'radius')
+
+INSERT_COLUMNS = ('shape_type', 'volume', 'surface_area', 'mass', 'material_id', 'parameters',
+                  *PARAMETER_COLUMNS, 'content_key')
+
+INSERT_CALCULATION = f'''
+    INSERT INTO calculations ({', '.join(INSERT_COLUMNS)})
+    VALUES ({', '.join('?' * len(INSERT_COLUMNS))})
+'''
+
+# Вставка, пропускающая строку, если расчет с тем же content_key уже сохранен
+INSERT_CALCULATION_UNIQUE = f'''
+    INSERT INTO calculations ({', '.join(INSERT_COLUMNS)})
+    SELECT {', '.join('?' * len(INSERT_COLUMNS))}
+    WHERE NOT EXISTS (SELECT 1 FROM calculations WHERE content_key = ?)
+'''
+
+CALCULATION_COLUMNS = ('id', 'shape_type', 'volume', 'surface_area', 'mass',
+                       'material', 'parameters', 'created_at')
+# Материал хранится как material_id; название подставляется в _row_to_dict
+SELECT_CALCULATIONS = "SELECT {} FROM calculations".format(
+    ', '.join('material_id' if name == 'material' else name for name in CALCULATION_COLUMNS))
+
+# Столбцы, по которым query_calculations может сортировать выборку
+ORDER_COLUMNS = ('created_at', 'volume', 'mass', 'surface_area', 'id')
+
+# Индексы выборок query_calculations: фильтр по фигуре или материалу с
+# сортировкой по массе или объему читает индекс уже в нужном порядке, поэтому
+# top-k останавливается после k строк вместо сортировки всей таблицы
+QUERY_INDEXES = {
+    'idx_calculations_created_at': ('created_at',),
+    'idx_calculations_shape_volume': ('shape_type', 'volume'),
+    'idx_calculations_shape_mass': ('shape_type', 'mass'),
+    'idx_calculations_material_volume': ('material_id', 'volume'),
+    'idx_calculations_material_mass': ('material_id', 'mass')
+}
+
+STATISTICS_GROUP_COLUMNS = ('calculations', 'total_volume', 'total_mass')
+
+# Плотность NULL - материал перенесен миграцией из истории, где у него нет
+# расчета с положительными объемом и массой: плотность неизвестна, пока ее не задаст
+# MaterialRegistry.register или первый сохраненный расчет
+MATERIALS_TABLE = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT UNIQUE NOT NULL,
+        density REAL
+    )
+'''
+
+CALCULATIONS_TABLE = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        shape_type TEXT NOT NULL,
+        volume REAL NOT NULL,
+        surface_area REAL NOT NULL,
+        mass REAL NOT NULL,
+        material_id INTEGER NOT NULL REFERENCES materials (id),
+        parameters TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        length REAL,
+        width REAL,
+        height REAL,
+        edge REAL,
+        radius REAL,
+        content_key TEXT
+    )
+'''
+
+# Сводная статистика поддерживается триггерами на calculations: каждая вставка,
+# удаление или изменение строки переносит свою дельту в сводные таблицы
+STATISTICS_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS statistics_summary (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        total_calculations INTEGER NOT NULL,
+        total_volume REAL NOT NULL,
+        total_mass REAL NOT NULL,
+        last_calculation TIMESTAMP
+    );
+    
+    CREATE TABLE IF NOT EXISTS statistics_by_shape (
+        shape_type TEXT PRIMARY KEY,
+        calculations INTEGER NOT NULL,
+        total_volume REAL NOT NULL,
+        total_mass REAL NOT NULL
+    );
+    
+    CREATE TABLE IF NOT EXISTS statistics_by_material (
+        material_id INTEGER PRIMARY KEY,
+        calculations INTEGER NOT NULL,
+        total_volume REAL NOT NULL,
+        total_mass REAL NOT NULL
+    );
+    
+    CREATE TRIGGER IF NOT EXISTS statistics_after_insert AFTER INSERT ON calculations
+    BEGIN
+        UPDATE statistics_summary SET
+            total_calculations = total_calculations + 1,
+            total_volume = total_volume + NEW.volume,
+            total_mass = total_mass + NEW.mass,
+            last_calculation = MAX(COALESCE(last_calculation, NEW.created_at), NEW.created_at)
+        WHERE id = 1;
+        
+        INSERT INTO statistics_by_shape (shape_type, calculations, total_volume, total_mass)
+        VALUES (NEW.shape_type, 1, NEW.volume, NEW.mass)
+        ON CONFLICT(shape_type) DO UPDATE SET
+            calculations = calculations + 1,
+            total_volume = total_volume + excluded.total_volume,
+            total_mass = total_mass + excluded.total_mass;
+        
+        INSERT INTO statistics_by_material (material_id, calculations, total_volume, total_mass)
+        VALUES (NEW.material_id, 1, NEW.volume, NEW.mass)
+        ON CONFLICT(material_id) DO UPDATE SET
+            calculations = calculations + 1,
+            total_volume = total_volume + excluded.total_volume,
+            total_mass = total_mass + excluded.total_mass;
+    END;
+    
+    CREATE TRIGGER IF NOT EXISTS statistics_after_delete AFTER DELETE ON calculations
+    BEGIN
+        UPDATE statistics_summary SET
+            total_calculations = total_calculations - 1,
+            total_volume = total_volume - OLD.volume,
+            total_mass = total_mass - OLD.mass,
+            last_calculation = (SELECT MAX(created_at) FROM calculations)
+        WHERE id = 1;
+        
+        UPDATE statistics_by_shape SET
+            calculations = calculations - 1,
+            total_volume = total_volume - OLD.volume,
+            total_mass = total_mass - OLD.mass
+        WHERE shape_type = OLD.shape_type;
+        DELETE FROM statistics_by_shape WHERE shape_type = OLD.shape_type AND calculations <= 0;
+        
+        UPDATE statistics_by_material SET
+            calculations = calculations - 1,
+            total_volume = total_volume - OLD.volume,
+            total_mass = total_mass - OLD.mass
+        WHERE material_id = OLD.material_id;
+        DELETE FROM statistics_by_material WHERE material_id = OLD.material_id AND calculations <= 0;
+    END;
+    
+    CREATE TRIGGER IF NOT EXISTS statistics_after_update
+    AFTER UPDATE OF shape_type, volume, mass, material_id, created_at ON calculations
+    BEGIN
+        UPDATE statistics_summary SET
+            total_volume = total_volume - OLD.volume + NEW.volume,
+            total_mass = total_mass - OLD.mass + NEW.mass,
+            last_calculation = (SELECT MAX(created_at) FROM calculations)
+        WHERE id = 1;
+        
+        UPDATE statistics_by_shape SET
+            calculations = calculations - 1,
+            total_volume = total_volume - OLD.volume,
+            total_mass = total_mass - OLD.mass
+        WHERE shape_type = OLD.shape_type;
+        DELETE FROM statistics_by_shape WHERE shape_type = OLD.shape_type AND calculations <= 0;
+        INSERT INTO statistics_by_shape (shape_type, calculations, total_volume, total_mass)
+        VALUES (NEW.shape_type, 1, NEW.volume, NEW.mass)
+        ON CONFLICT(shape_type) DO UPDATE SET
+            calculations = calculations + 1,
+            total_volume = total_volume + excluded.total_volume,
+            total_mass = total_mass + excluded.total_mass;
+        
+        UPDATE statistics_by_material SET
+            calculations = calculations - 1,
+            total_volume = total_volume - OLD.volume,
+            total_mass = total_mass - OLD.mass
+        WHERE material_id = OLD.material_id;
+        DELETE FROM statistics_by_material WHERE material_id = OLD.material_id AND calculations <= 0;
+        INSERT INTO statistics_by_material (material_id, calculations, total_volume, total_mass)
+        VALUES (NEW.material_id, 1, NEW.volume, NEW.mass)
+        ON CONFLICT(material_id) DO UPDATE SET
+            calculations = calculations + 1,
+            total_volume = total_volume + excluded.total_volume,
+            total_mass = total_mass + excluded.total_mass;
+    END;
+'''
+
+def _decode_parameters(text: str) -> Any:
+    """Параметры из JSON; нераспознанная строка возвращается как есть"""
+    try:
+        return json.loads(text)
+    except (TypeError, ValueError):
+        return text
+
+class MaterialRegistry:
+    """Справочник материалов из таблицы materials.
+    
+    Материалы читаются из базы один раз и хранятся как общие объекты: поиск
+    по названию или id - обращение к словарю, и все расчеты с одним
+    материалом получают один и тот же объект. Базовые материалы представлены
+    классами Steel, Aluminum и Copper. Новые материалы добавляются через
+    register() и сохраняются в базе.
+    
+    Материал с неизвестной плотностью (NULL, см. MATERIALS_TABLE) находится
+    по id и названию, но не перечисляется при обходе справочника и не
+    предлагается для расчетов; register() с положительной плотностью
+    задает ее.
+    """
+    
+    BUILTIN = {material.name: material.__class__ for material in (Steel(), Aluminum(), Copper())}
+    
+    def __init__(self, db: 'GeometryDatabase'):
+        self._db = db
+        self._by_id: Dict[int, Material] = {}
+        self._by_name: Dict[str, Material] = {}
+        self._ids: Dict[str, int] = {}
+        self.reload()
+    
+    def _intern(self, material_id: int, name: str, density: float) -> Material:
+        material = self._by_name.get(name)
+        if material is None or material.density != density:
+            builtin = self.BUILTIN.get(name)
+            material = builtin() if builtin is not None else Material(name, density)
+            if material.density != density:
+                material = Material(name, density)
+        self._by_id[material_id] = material
+        self._by_name[name] = material
+        self._ids[name] = material_id
+        return material
+    
+    def reload(self):
+        """Перечитывание справочника; уже выданные объекты сохраняются"""
+        with self._db._lock:
+            rows = self._db.connection.execute('SELECT id, name, density FROM materials ORDER BY id').fetchall()
+            for material_id, name, density in rows:
+                self._intern(material_id, name, density)
+    
+    def get(self, key: Union[int, str]) -> Material:
+        """Материал по id или названию; KeyError, если его нет и в базе"""
+        material = self._by_id.get(key) or self._by_name.get(key)
+        if material is None:
+            # Материал мог добавить другой процесс
+            self.reload()
+            material = self._by_id.get(key) or self._by_name.get(key)
+            if material is None:
+                raise KeyError(f"Неизвестный материал: {key}")
+        return material
+    
+    __getitem__ = get
+    
+    def id_of(self, material: Union[Material, str]) -> int:
+        """id материала в таблице materials"""
+        name = material.name if isinstance(material, Material) else material
+        return self._ids[self.get(name).name]
+    
+    def register(self, name: str, density: float) -> Material:
+        """Материал с названием name; новый сохраняется в базе.
+        
+        Повторная регистрация с той же плотностью возвращает уже известный
+        объект, с другой - ValueError.
+        """
+        name = name.strip()
+        if not name:
+            raise ValueError("Название материала не может быть пустым")
+        if not density > 0:
+            raise ValueError("Плотность должна быть положительной")
+        
+        with self._db._lock:
+            conn = self._db.connection
+            if name in self:
+                material = self._by_name[name]
+                if material.density is None:
+                    conn.execute('UPDATE materials SET density = ? WHERE id = ?', (float(density), self._ids[name]))
+                    conn.commit()
+                    return self._intern(self._ids[name], name, float(density))
+                if material.density != density:
+                    raise ValueError(f"Материал {name} уже есть с плотностью {material.density}")
+                return material
+            cursor = conn.execute('INSERT INTO materials (name, density) VALUES (?, ?)', (name, float(density)))
+            conn.commit()
+            return self._intern(cursor.lastrowid, name, float(density))
+    
+    def intern(self, material: Material) -> Material:
+        """Общий объект для материала, при необходимости зарегистрированного"""
+        return self.register(material.name, material.density)
+    
+    def __contains__(self, key: Union[int, str, Material]) -> bool:
+        if isinstance(key, Material):
+            key = key.name
+        try:
+            self.get(key)
+        except KeyError:
+            return False
+        return True
+    
+    def __iter__(self) -> Iterator[Material]:
+        return iter([self._by_id[material_id] for material_id in sorted(self._by_id)
+                     if self._by_id[material_id].density is not None])
+    
+    def __len__(self) -> int:
+        return sum(1 for material in self._by_id.values() if material.density is not None)
 
 class GeometryDatabase:
-    def __init__(self, db_path: str = "geometry_calculations.db"):
+    """Доступ к базе расчетов через одно долгоживущее соединение.
+    
+    Соединение открывается при первом обращении и закрывается методом close()
+    или при выходе из блока with. Подготовленные выражения кэшируются самим
+    sqlite3 (cached_statements), поэтому тексты запросов держим постоянными.
+    Настройки wal, cache_size_kib и mmap_size по умолчанию выключены.
+    
+    С skip_duplicates=True расчет, совпадающий с уже сохраненным по типу,
+    параметрам и материалу (content_key), повторно не записывается.
+    """
+    
+    def __init__(self, db_path: str = "geometry_calculations.db", wal: bool = False,
+                 cache_size_kib: int = 0, mmap_size: int = 0, cached_statements: int = 128,
+                 skip_duplicates: bool = False):
         self.db_path = db_path
+        self.skip_duplicates = skip_duplicates
+        self.wal = wal
+        self.cache_size_kib = cache_size_kib
+        self.mmap_size = mmap_size
+        self.cached_statements = cached_statements
+        self._conn = None
+        self._lock = threading.RLock()
         self.init_database()
+        self.materials = MaterialRegistry(self)
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Открытие соединения и применение PRAGMA"""
+        conn = sqlite3.connect(self.db_path, cached_statements=self.cached_statements,
+                               check_same_thread=False)
+        if self.wal:
+            # С WAL режим synchronous=NORMAL сохраняет целостность базы, но при
+            # сбое питания могут потеряться последние зафиксированные транзакции
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+        if self.cache_size_kib:
+            conn.execute(f'PRAGMA cache_size=-{int(self.cache_size_kib)}')
+        if self.mmap_size:
+            conn.execute(f'PRAGMA mmap_size={int(self.mmap_size)}')
+        return conn
+    
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Долгоживущее соединение с базой"""
+        if self._conn is None:
+            self._conn = self._connect()
+        return self._conn
+    
+    def close(self):
+        """Закрытие соединения; следующий запрос откроет его заново"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+    
+    def __enter__(self) -> 'GeometryDatabase':
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
     
     def init_database(self):
         """Инициализация базы данных и создание таблиц"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self._lock:
+            conn = self.connection
+            cursor = conn.cursor()
+            
+            cursor.execute(MATERIALS_TABLE.format(table='materials'))
+            
+            # Добавляем базовые материалы если их нет
+            base_materials = [
+                ('Сталь', 7850.0),
+                ('Алюминий', 2700.0),
+                ('Медь', 8960.0)
+            ]
+            
+            cursor.executemany('''
+                INSERT OR IGNORE INTO materials (name, density) VALUES (?, ?)
+            ''', base_materials)
+            
+            cursor.execute(CALCULATIONS_TABLE.format(table='calculations'))
+            conn.commit()
+            
+            self._migrate(cursor)
+            self._init_statistics(cursor)
+    
+    def _migrate(self, cursor: sqlite3.Cursor):
+        """Приведение схемы существующей базы к SCHEMA_VERSION"""
+        version = cursor.execute('PRAGMA user_version').fetchone()[0]
         
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS calculations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                shape_type TEXT NOT NULL,
-                volume REAL NOT NULL,
-                surface_area REAL NOT NULL,
-                mass REAL NOT NULL,
-                material TEXT NOT NULL,
-                parameters TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        if version < 1:
+            self._migrate_typed_parameters(cursor)
+        if version < 2:
+            self._migrate_content_keys(cursor)
+        if version < 3:
+            self._migrate_material_ids(cursor)
         
+        for name in PARAMETER_COLUMNS:
+            cursor.execute(f'''
+                CREATE INDEX IF NOT EXISTS idx_calculations_{name}
+                ON calculations (shape_type, {name})
+            ''')
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS materials (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT UNIQUE NOT NULL,
-                density REAL NOT NULL
-            )
+            CREATE INDEX IF NOT EXISTS idx_calculations_content_key ON calculations (content_key)
         ''')
+        for index, columns in QUERY_INDEXES.items():
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS {index} ON calculations ({", ".join(columns)})')
         
-        # Добавляем базовые материалы если их нет
-        base_materials = [
-            ('Сталь', 7850.0),
-            ('Алюминий', 2700.0),
-            ('Медь', 8960.0)
-        ]
+        cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        cursor.connection.commit()
+    
+    def _migrate_typed_parameters(self, cursor: sqlite3.Cursor, chunk_size: int = 1000):
+        """Версия 1: параметры в JSON и типизированных столбцах вместо str(dict)"""
+        existing = {row[1] for row in cursor.execute('PRAGMA table_info(calculations)')}
+        for name in PARAMETER_COLUMNS:
+            if name not in existing:
+                cursor.execute(f'ALTER TABLE calculations ADD COLUMN {name} REAL')
         
-        cursor.executemany('''
-            INSERT OR IGNORE INTO materials (name, density) VALUES (?, ?)
-        ''', base_materials)
+        assignments = ', '.join(f'{name} = ?' for name in PARAMETER_COLUMNS)
+        last_id = 0
+        while True:
+            rows = cursor.execute('''
+                SELECT id, parameters FROM calculations WHERE id > ? ORDER BY id LIMIT ?
+            ''', (last_id, chunk_size)).fetchall()
+            if not rows:
+                break
+            
+            updates = []
+            for row_id, text in rows:
+                try:
+                    # Старые строки записаны через str(dict), поэтому читаем их
+                    # ast.literal_eval, а не eval
+                    parameters = ast.literal_eval(text)
+                except (ValueError, SyntaxError):
+                    continue
+                if not isinstance(parameters, dict):
+                    continue
+                updates.append((
+                    json.dumps(parameters, ensure_ascii=False, sort_keys=True),
+                    *(parameters.get(name) for name in PARAMETER_COLUMNS),
+                    row_id
+                ))
+            
+            cursor.executemany(
+                f'UPDATE calculations SET parameters = ?, {assignments} WHERE id = ?', updates)
+            last_id = rows[-1][0]
         
-        conn.commit()
-        conn.close()
+        cursor.connection.commit()
     
-    def save_calculation(self, shape_data: Dict[str, Any], parameters: Dict[str, float]):
-        """Сохранение расчета в базу данных"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def _migrate_content_keys(self, cursor: sqlite3.Cursor, chunk_size: int = 1000):
+        """Версия 2: адрес содержимого расчета для поиска повторов"""
+        existing = {row[1] for row in cursor.execute('PRAGMA table_info(calculations)')}
+        if 'material' not in existing:
+            # Таблица создана сразу по схеме версии 3, переносить нечего
+            return
+        if 'content_key' not in existing:
+            cursor.execute('ALTER TABLE calculations ADD COLUMN content_key TEXT')
         
+        last_id = 0
+        while True:
+            rows = cursor.execute('''
+                SELECT id, shape_type, material, parameters FROM calculations
+                WHERE id > ? ORDER BY id LIMIT ?
+            ''', (last_id, chunk_size)).fetchall()
+            if not rows:
+                break
+            
+            updates = []
+            for row_id, shape_type, material, text in rows:
+                parameters = _decode_parameters(text)
+                if isinstance(parameters, dict):
+                    updates.append((content_hash(shape_type, parameters, material), row_id))
+            
+            cursor.executemany('UPDATE calculations SET content_key = ? WHERE id = ?', updates)
+            last_id = rows[-1][0]
+        
+        cursor.connection.commit()
+    
+    def _migrate_material_ids(self, cursor: sqlite3.Cursor):
+        """Версия 3: id материала из справочника materials вместо названия.
+        
+        SQLite не меняет тип столбца на месте, поэтому таблица пересоздается:
+        строки переносятся одним INSERT ... SELECT с теми же id и created_at.
+        Сводная статистика пересчитывается заново в _init_statistics.
+        """
+        existing = {row[1] for row in cursor.execute('PRAGMA table_info(calculations)')}
+        if 'material' not in existing:
+            return
+        
+        # В старых базах плотность NOT NULL: справочник пересоздается по MATERIALS_TABLE
+        notnull = {row[1]: row[3] for row in cursor.execute('PRAGMA table_info(materials)')}
+        if notnull.get('density'):
+            cursor.execute('DROP TABLE IF EXISTS materials_v3')
+            cursor.execute(MATERIALS_TABLE.format(table='materials_v3'))
+            cursor.execute('INSERT INTO materials_v3 (id, name, density) SELECT id, name, density FROM materials')
+            cursor.execute('DROP TABLE materials')
+            cursor.execute('ALTER TABLE materials_v3 RENAME TO materials')
+        
+        # Материалы, которых нет в справочнике, получают плотность mass / volume.
+        # Если у материала нет расчета с положительными объемом и массой,
+        # плотность неизвестна и остается NULL, а не заведомо неверным нулем
         cursor.execute('''
-            INSERT INTO calculations 
-            (shape_type, volume, surface_area, mass, material, parameters)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (
+            INSERT OR IGNORE INTO materials (name, density)
+            SELECT material, MAX(CASE WHEN volume > 0 AND mass > 0 THEN mass / volume END)
+            FROM calculations GROUP BY material
+        ''')
+        cursor.connection.commit()
+        cursor.executescript('''
+            DROP TRIGGER IF EXISTS statistics_after_insert;
+            DROP TRIGGER IF EXISTS statistics_after_delete;
+            DROP TRIGGER IF EXISTS statistics_after_update;
+            DROP TABLE IF EXISTS statistics_summary;
+            DROP TABLE IF EXISTS statistics_by_shape;
+            DROP TABLE IF EXISTS statistics_by_material;
+            DROP TABLE IF EXISTS calculations_v3;
+        ''')
+        
+        cursor.execute(CALCULATIONS_TABLE.format(table='calculations_v3'))
+        columns = ('id', 'shape_type', 'volume', 'surface_area', 'mass', 'parameters', 'created_at',
+                   *PARAMETER_COLUMNS, 'content_key')
+        cursor.execute(f'''
+            INSERT INTO calculations_v3 (material_id, {', '.join(columns)})
+            SELECT m.id, {', '.join('c.' + name for name in columns)}
+            FROM calculations c JOIN materials m ON m.name = c.material
+        ''')
+        cursor.execute('DROP TABLE calculations')
+        cursor.execute('ALTER TABLE calculations_v3 RENAME TO calculations')
+        cursor.connection.commit()
+    
+    def _init_statistics(self, cursor: sqlite3.Cursor):
+        """Таблицы сводной статистики и триггеры, поддерживающие их в актуальном виде"""
+        cursor.executescript(STATISTICS_SCHEMA)
+        
+        # База, созданная до появления сводки, заполняется один раз целиком
+        cursor.execute('SELECT 1 FROM statistics_summary WHERE id = 1')
+        if cursor.fetchone() is None:
+            self._rebuild_statistics(cursor)
+        cursor.connection.commit()
+    
+    def _rebuild_statistics(self, cursor: sqlite3.Cursor):
+        cursor.execute('DELETE FROM statistics_summary')
+        cursor.execute('DELETE FROM statistics_by_shape')
+        cursor.execute('DELETE FROM statistics_by_material')
+        cursor.execute('''
+            INSERT INTO statistics_summary
+            (id, total_calculations, total_volume, total_mass, last_calculation)
+            SELECT 1, COUNT(*), COALESCE(SUM(volume), 0), COALESCE(SUM(mass), 0), MAX(created_at)
+            FROM calculations
+        ''')
+        cursor.execute('''
+            INSERT INTO statistics_by_shape (shape_type, calculations, total_volume, total_mass)
+            SELECT shape_type, COUNT(*), SUM(volume), SUM(mass)
+            FROM calculations GROUP BY shape_type
+        ''')
+        cursor.execute('''
+            INSERT INTO statistics_by_material (material_id, calculations, total_volume, total_mass)
+            SELECT material_id, COUNT(*), SUM(volume), SUM(mass)
+            FROM calculations GROUP BY material_id
+        ''')
+    
+    @instrumented('database.rebuild_statistics')
+    def rebuild_statistics(self):
+        """Пересчет сводной статистики с нуля по таблице calculations"""
+        with self._lock:
+            conn = self.connection
+            try:
+                self._rebuild_statistics(conn.cursor())
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    
+    def _material_id(self, shape_data: Dict[str, Any]) -> int:
+        """id материала расчета; новый материал заносится в справочник"""
+        name = shape_data['material']
+        if name is None:
+            raise ValueError("Материал не задан")
+        if name in self.materials:
+            if self.materials[name].density is not None or not shape_data['volume']:
+                return self.materials.id_of(name)
+        # Материала нет в справочнике или его плотность неизвестна:
+        # плотность восстанавливается по результату
+        elif not shape_data['volume']:
+            raise ValueError(f"Неизвестный материал: {name}")
+        material = self.materials.register(name, shape_data['mass'] / shape_data['volume'])
+        return self.materials.id_of(material)
+    
+    def _calculation_row(self, shape_data: Dict[str, Any], parameters: Dict[str, float]) -> Tuple:
+        """Строка таблицы calculations для результата расчета"""
+        return (
             shape_data['type'],
             shape_data['volume'],
             shape_data['surface_area'],
             shape_data['mass'],
-            shape_data['material'],
-            str(parameters)
-        ))
+            self._material_id(shape_data),
+            json.dumps(parameters, ensure_ascii=False, sort_keys=True),
+            *(parameters.get(name) for name in PARAMETER_COLUMNS),
+            content_hash(shape_data['type'], parameters, shape_data['material'], shape_data.get('digest'))
+        )
+    
+    def _insert_statement(self, row: Tuple) -> Tuple[str, Tuple]:
+        """Запрос вставки и его аргументы с учетом skip_duplicates"""
+        if self.skip_duplicates:
+            return INSERT_CALCULATION_UNIQUE, row + (row[-1],)
+        return INSERT_CALCULATION, row
+    
+    @instrumented('database.save_calculation', rows=int)
+    def save_calculation(self, shape_data: Dict[str, Any], parameters: Dict[str, float]) -> bool:
+        """Сохранение расчета в базу данных; False - повтор пропущен"""
+        with self._lock:
+            conn = self.connection
+            cursor = conn.execute(*self._insert_statement(self._calculation_row(shape_data, parameters)))
+            conn.commit()
+        return cursor.rowcount > 0
+    
+    @instrumented('database.save_calculations', rows=lambda result: result['rows'])
+    def save_calculations(self, calculations: Iterable[Tuple[Dict[str, Any], Dict[str, float]]],
+                          chunk_size: int = 1000) -> Dict[str, float]:
+        """Пакетное сохранение потока пар (shape_data, parameters).
+        
+        Строки пишутся через executemany частями по chunk_size, каждая часть -
+        отдельная транзакция. Возвращает число строк, время и скорость записи.
+        """
+        if chunk_size < 1:
+            raise ValueError("Размер части должен быть положительным")
+        return self._save_rows((self._calculation_row(shape_data, parameters)
+                                for shape_data, parameters in calculations), chunk_size)
+    
+    def _save_rows(self, rows: Iterable[Tuple], chunk_size: int) -> Dict[str, float]:
+        """Запись готовых строк _calculation_row частями по chunk_size"""
+        start = time.perf_counter()
+        rows_saved = 0
+        rows_skipped = 0
+        statement = INSERT_CALCULATION_UNIQUE if self.skip_duplicates else INSERT_CALCULATION
+        rows = (self._insert_statement(row)[1] for row in rows)
+        
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            with self._lock:
+                conn = self.connection
+                try:
+                    cursor = conn.executemany(statement, chunk)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+            rows_saved += cursor.rowcount
+            rows_skipped += len(chunk) - cursor.rowcount
         
-        conn.commit()
-        conn.close()
+        elapsed = time.perf_counter() - start
+        return {
+            'rows': rows_saved,
+            'skipped': rows_skipped,
+            'seconds': elapsed,
+            'rows_per_second': rows_saved / elapsed if elapsed > 0 else 0.0
+        }
+    
+    def _row_to_dict(self, row: Tuple) -> Dict[str, Any]:
+        """Строка выборки SELECT_CALCULATIONS в виде словаря"""
+        calculation = dict(zip(CALCULATION_COLUMNS, row))
+        calculation['material'] = self.materials[calculation['material']].name
+        calculation['parameters'] = _decode_parameters(calculation['parameters'])
+        return calculation
     
+    @instrumented('database.get_all_calculations', rows=len)
     def get_all_calculations(self) -> List[Dict[str, Any]]:
         """Получение всех расчетов из базы данных"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self._lock:
+            cursor = self.connection.execute(SELECT_CALCULATIONS + ' ORDER BY created_at DESC')
+            rows = cursor.fetchall()
         
-        cursor.execute('''
-            SELECT * FROM calculations ORDER BY created_at DESC
-        ''')
+        return [self._row_to_dict(row) for row in rows]
+    
+    def _filter_clause(self, shape_type: Optional[str] = None, material: Optional[str] = None,
+                       created_after: Optional[str] = None, created_before: Optional[str] = None,
+                       min_volume: Optional[float] = None, max_volume: Optional[float] = None,
+                       min_mass: Optional[float] = None,
+                       max_mass: Optional[float] = None) -> Tuple[str, List[Any]]:
+        """Условие WHERE и его аргументы для фильтров выборки расчетов"""
+        conditions = []
+        args: List[Any] = []
+        if shape_type is not None:
+            conditions.append('shape_type = ?')
+            args.append(shape_type)
+        if material is not None:
+            # Материала нет в справочнике - нет и расчетов с ним (id -1 не встречается)
+            conditions.append('material_id = ?')
+            args.append(self.materials.id_of(material) if material in self.materials else -1)
+        if created_after is not None:
+            conditions.append('created_at >= ?')
+            args.append(created_after)
+        if created_before is not None:
+            conditions.append('created_at < ?')
+            args.append(created_before)
+        # Границы диапазонов объема и массы включительные
+        for column, bound, value in (('volume', '>=', min_volume), ('volume', '<=', max_volume),
+                                     ('mass', '>=', min_mass), ('mass', '<=', max_mass)):
+            if value is not None:
+                conditions.append(f'{column} {bound} ?')
+                args.append(value)
+        if not conditions:
+            return '', args
+        return ' WHERE ' + ' AND '.join(conditions), args
+    
+    @instrumented('database.iter_calculations')
+    def iter_calculations(self, batch_size: int = 500, shape_type: Optional[str] = None,
+                          material: Optional[str] = None, created_after: Optional[str] = None,
+                          created_before: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Потоковое чтение расчетов в порядке добавления.
         
-        calculations = []
-        for row in cursor.fetchall():
-            calculations.append({
-                'id': row[0],
-                'shape_type': row[1],
-                'volume': row[2],
-                'surface_area': row[3],
-                'mass': row[4],
-                'material': row[5],
-                'parameters': row[6],
-                'created_at': row[7]
-            })
-        
-        conn.close()
-        return calculations
+        Строки читаются через fetchmany по batch_size, поэтому в памяти
+        одновременно находится не больше одной порции. Фильтры необязательны;
+        created_after и created_before - границы created_at в формате
+        'ГГГГ-ММ-ДД ЧЧ:ММ:СС' (нижняя включительно, верхняя нет).
+        """
+        if batch_size < 1:
+            raise ValueError("Размер порции должен быть положительным")
+        
+        where, args = self._filter_clause(shape_type, material, created_after, created_before)
+        with self._lock:
+            cursor = self.connection.execute(SELECT_CALCULATIONS + where + ' ORDER BY id', args)
+        try:
+            while True:
+                with self._lock:
+                    rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield self._row_to_dict(row)
+        finally:
+            cursor.close()
     
-    def get_statistics(self) -> Dict[str, Any]:
-        """Получение статистики по расчетам"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    @instrumented('database.export_results', rows=int)
+    def export_results(self, path: str, batch_size: int = 10000, **filters) -> int:
+        """Выгрузка расчетов в двоичный файл результатов (см. ResultFile).
         
-        cursor.execute('SELECT COUNT(*) FROM calculations')
-        total_calculations = cursor.fetchone()[0]
+        Строки читаются из типизированных столбцов порциями по batch_size и
+        пишутся массивами записей; filters - те же, что у iter_calculations.
+        Возвращает число выгруженных расчетов.
+        """
+        if batch_size < 1:
+            raise ValueError("Размер порции должен быть положительным")
         
-        cursor.execute('SELECT COUNT(DISTINCT shape_type) FROM calculations')
-        unique_shapes = cursor.fetchone()[0]
+        where, args = self._filter_clause(**filters)
+        with self._lock:
+            cursor = self.connection.execute(f'''
+                SELECT id, shape_type, material_id, {', '.join(PARAMETER_COLUMNS)},
+                       volume, surface_area, mass
+                FROM calculations{where} ORDER BY id
+            ''', args)
         
-        cursor.execute('SELECT COUNT(DISTINCT material) FROM calculations')
-        unique_materials = cursor.fetchone()[0]
+        try:
+            with ResultFileWriter(path) as writer:
+                while True:
+                    with self._lock:
+                        rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    
+                    ids, shape_types, materials, *values = zip(*rows)
+                    records = np.zeros(len(rows), dtype=RESULT_DTYPE)
+                    records['id'] = ids
+                    records['shape_type'] = [writer.shape_code(shape_type) for shape_type in shape_types]
+                    records['material_id'] = [writer.material_id(material.name, material.density)
+                                              for material in map(self.materials.get, materials)]
+                    # NULL в типизированных столбцах превращается в NaN
+                    for name, column in zip((*PARAMETER_COLUMNS, 'volume', 'surface_area', 'mass'), values):
+                        records[name] = np.array(column, dtype=float)
+                    writer.write_records(records)
+                return writer.count
+        finally:
+            cursor.close()
+    
+    @instrumented('database.import_results', rows=lambda result: result['rows'])
+    def import_results(self, path: str, chunk_size: int = 1000) -> Dict[str, float]:
+        """Загрузка расчетов из двоичного файла результатов через save_calculations.
         
-        cursor.execute('SELECT MAX(created_at) FROM calculations')
-        last_calculation = cursor.fetchone()[0]
+        Идентификаторы строк из файла не переносятся: расчеты получают новые id.
+        """
+        with ResultFile(path) as results:
+            return self.save_calculations(results.iter_calculations(), chunk_size)
+    
+    def _query(self, order_by: str, descending: bool, limit: Optional[int],
+               filters: Dict[str, Any]) -> Tuple[str, List[Any]]:
+        """Текст и аргументы запроса query_calculations"""
+        if order_by not in ORDER_COLUMNS:
+            raise ValueError(f"Сортировка по {order_by} не поддерживается")
+        if limit is not None and limit < 1:
+            raise ValueError("Размер выборки должен быть положительным")
         
-        conn.close()
+        where, args = self._filter_clause(**filters)
+        direction = 'DESC' if descending else 'ASC'
+        # id в конце делает порядок однозначным; индекс хранит rowid последним
+        # столбцом, поэтому дополнительной сортировки это не требует
+        query = SELECT_CALCULATIONS + where + f' ORDER BY {order_by} {direction}'
+        if order_by != 'id':
+            query += f', id {direction}'
+        if limit is not None:
+            query += ' LIMIT ?'
+            args.append(limit)
+        return query, args
+    
+    @instrumented('database.query_calculations', rows=len)
+    def query_calculations(self, order_by: str = 'created_at', descending: bool = True,
+                           limit: Optional[int] = None, **filters) -> List[Dict[str, Any]]:
+        """Выборка расчетов с фильтрами, сортировкой и ограничением числа строк.
+        
+        filters: shape_type, material, created_after, created_before (как у
+        iter_calculations), min_volume, max_volume, min_mass, max_mass.
+        order_by - один из ORDER_COLUMNS. Например, 50 самых тяжелых медных
+        деталей за неделю:
+        
+            db.query_calculations(material='Медь', created_after='2024-05-06',
+                                  order_by='mass', limit=50)
+        """
+        query, args = self._query(order_by, descending, limit, filters)
+        with self._lock:
+            rows = self.connection.execute(query, args).fetchall()
+        
+        return [self._row_to_dict(row) for row in rows]
+    
+    def explain_query(self, order_by: str = 'created_at', descending: bool = True,
+                      limit: Optional[int] = None, **filters) -> List[str]:
+        """План выполнения (EXPLAIN QUERY PLAN) запроса query_calculations"""
+        query, args = self._query(order_by, descending, limit, filters)
+        with self._lock:
+            rows = self.connection.execute('EXPLAIN QUERY PLAN ' + query, args).fetchall()
+        return [row[3] for row in rows]
+    
+    @instrumented('database.get_calculations_page', rows=len)
+    def get_calculations_page(self, after_id: Optional[int] = None,
+                              limit: int = 20) -> List[Dict[str, Any]]:
+        """Страница истории от новых расчетов к старым.
+        
+        Пагинация по ключу: следующая страница запрашивается с after_id, равным
+        id последней строки предыдущей. Каждый запрос - поиск по первичному
+        ключу, без OFFSET и без чтения пропущенных строк.
+        """
+        if limit < 1:
+            # LIMIT -1 в SQLite означает всю таблицу
+            raise ValueError("Размер страницы должен быть положительным")
+        with self._lock:
+            if after_id is None:
+                cursor = self.connection.execute(
+                    SELECT_CALCULATIONS + ' ORDER BY id DESC LIMIT ?', (limit,))
+            else:
+                cursor = self.connection.execute(
+                    SELECT_CALCULATIONS + ' WHERE id < ? ORDER BY id DESC LIMIT ?',
+                    (after_id, limit))
+            rows = cursor.fetchall()
+        
+        return [self._row_to_dict(row) for row in rows]
+    
+    @instrumented('database.get_calculations_by_parameter', rows=len)
+    def get_calculations_by_parameter(self, shape_type: str, parameter: str,
+                                      min_value: Optional[float] = None,
+                                      max_value: Optional[float] = None,
+                                      limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Расчеты фигуры с параметром в диапазоне [min_value, max_value].
+        
+        Запрос идет по индексу (shape_type, parameter), например все шары
+        с радиусом от 0.5 до 0.8 м - это поиск диапазона в idx_calculations_radius.
+        """
+        if parameter not in PARAMETER_COLUMNS:
+            raise ValueError(f"Неизвестный параметр: {parameter}")
+        
+        query = SELECT_CALCULATIONS + ' WHERE shape_type = ?'
+        args: List[Any] = [shape_type]
+        if min_value is not None:
+            query += f' AND {parameter} >= ?'
+            args.append(min_value)
+        if max_value is not None:
+            query += f' AND {parameter} <= ?'
+            args.append(max_value)
+        if min_value is None and max_value is None:
+            query += f' AND {parameter} IS NOT NULL'
+        query += f' ORDER BY {parameter}'
+        if limit is not None:
+            query += ' LIMIT ?'
+            args.append(limit)
+        
+        with self._lock:
+            rows = self.connection.execute(query, args).fetchall()
+        
+        return [self._row_to_dict(row) for row in rows]
+    
+    @instrumented('database.get_statistics')
+    def get_statistics(self) -> Dict[str, Any]:
+        """Получение статистики по расчетам.
+        
+        Читает сводные таблицы, которые обновляются триггерами при записи,
+        поэтому время не зависит от размера таблицы calculations.
+        """
+        with self._lock:
+            cursor = self.connection.cursor()
+            
+            cursor.execute('''
+                SELECT total_calculations, total_volume, total_mass, last_calculation
+                FROM statistics_summary WHERE id = 1
+            ''')
+            total_calculations, total_volume, total_mass, last_calculation = cursor.fetchone()
+            
+            cursor.execute('''
+                SELECT shape_type, calculations, total_volume, total_mass
+                FROM statistics_by_shape ORDER BY shape_type
+            ''')
+            by_shape = {row[0]: dict(zip(STATISTICS_GROUP_COLUMNS, row[1:]))
+                        for row in cursor.fetchall()}
+            
+            cursor.execute('''
+                SELECT material_id, calculations, total_volume, total_mass
+                FROM statistics_by_material
+            ''')
+            by_material = dict(sorted((self.materials[row[0]].name, dict(zip(STATISTICS_GROUP_COLUMNS, row[1:])))
+                                      for row in cursor.fetchall()))
         
         return {
             'total_calculations': total_calculations,
-            'unique_shapes': unique_shapes,
-            'unique_materials': unique_materials,
-            'last_calculation': last_calculation
-        }
\ No newline at end of file
+            'unique_shapes': len(by_shape),
+            'unique_materials': len(by_material),
+            'last_calculation': last_calculation,
+            'total_volume': total_volume,
+            'total_mass': total_mass,
+            'by_shape': by_shape,
+            'by_material': by_material
+        }
+
+# Служебные элементы очереди WriteBehindWriter
+_STOP = object()
+
+class WriteBehindWriter:
+    """Отложенная запись расчетов в GeometryDatabase из фонового потока.
+    
+    put() проверяет расчет, собирая строку таблицы, ставит ее в очередь и сразу
+    возвращается: некорректный расчет отклоняется в put(). Фоновый поток
+    копит записи и сохраняет их одной транзакцией, когда набралось max_batch
+    записей или с первой несохраненной записи прошло max_delay секунд.
+    
+    Гарантии: расчет, принятый put(), сохранен в базе после возврата flush()
+    или close(). При аварийном завершении процесса теряются записи, еще не
+    дошедшие до фиксации (не больше max_batch или max_delay секунд работы).
+    При обычном завершении close() вызывается через atexit. Очередь ограничена
+    queue_size записями: если поток записи не успевает, put() ждет места.
+    Ошибка записи (например, базы) сохраняется и выбрасывается из следующего
+    flush() или close(); расчеты из транзакции, завершившейся ошибкой, в базу
+    не попадают.
+    """
+    
+    def __init__(self, db: GeometryDatabase, max_batch: int = 500, max_delay: float = 0.5,
+                 queue_size: int = 10000):
+        if max_batch < 1 or queue_size < 1:
+            raise ValueError("Размер пакета и очереди должны быть положительными")
+        if max_delay <= 0:
+            raise ValueError("Задержка записи должна быть положительной")
+        self.db = db
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.committed = 0
+        self._queue: 'queue.Queue' = queue.Queue(maxsize=queue_size)
+        self._error: Optional[BaseException] = None
+        self._closed = False
+        self._close_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='WriteBehindWriter', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+    
+    def put(self, shape_data: Dict[str, Any], parameters: Dict[str, float],
+            timeout: Optional[float] = None):
+        """Постановка расчета в очередь; при полной очереди ждет до timeout (queue.Full).
+        
+        Строка таблицы собирается сразу, поэтому некорректный расчет отклоняется
+        здесь же (ValueError, KeyError) и не срывает фиксацию остальных.
+        """
+        if self._closed:
+            raise RuntimeError("Отложенная запись уже закрыта")
+        row = self.db._calculation_row(shape_data, parameters)
+        self._queue.put(row, timeout=timeout)
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Ожидание фиксации всех принятых расчетов; False - не успели за timeout"""
+        if self._closed:
+            return not self._thread.is_alive()
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        if not done.wait(timeout):
+            return False
+        self._raise_error()
+        return True
+    
+    def close(self):
+        """Дозапись очереди и остановка фонового потока"""
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+        atexit.unregister(self.close)
+        self._raise_error()
+    
+    def __enter__(self) -> 'WriteBehindWriter':
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    @property
+    def pending(self) -> int:
+        """Примерное число расчетов в очереди"""
+        return self._queue.qsize()
+    
+    def _raise_error(self):
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+    
+    def _commit(self, pending: List[Tuple]):
+        if not pending:
+            return
+        try:
+            self.committed += self.db._save_rows(pending, self.max_batch)['rows']
+        except Exception as e:
+            self._error = e
+    
+    def _run(self):
+        """Цикл фонового потока: групповая фиксация по размеру или по времени"""
+        pending: List[Tuple] = []
+        deadline = 0.0
+        while True:
+            try:
+                if pending:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                else:
+                    item = self._queue.get()
+            except queue.Empty:
+                # Истекла задержка: фиксируем то, что успело накопиться
+                self._commit(pending)
+                pending = []
+                continue
+            
+            if item is _STOP:
+                self._commit(pending)
+                break
+            if isinstance(item, threading.Event):
+                self._commit(pending)
+                pending = []
+                item.set()
+                continue
+            
+            if not pending:
+                deadline = time.monotonic() + self.max_delay
+            pending.append(item)
+            if len(pending) >= self.max_batch:
+                self._commit(pending)
+                pending = []
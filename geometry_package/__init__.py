@@ -1,6 +1,15 @@
 from .base import Shape3D
 from .shapes import Parallelepiped, Tetrahedron, Sphere
 from .materials import Material, Steel, Aluminum, Copper
+from .batch import ShapeBatch
+from .store import ShapeStore
+from .cache import ResultCache
+from .resultfile import ResultFile, ResultFileWriter
+from .composite import CompositeShape
+from .dedup import deduplicate
+from .mesh import TriangleMesh, read_stl, write_stl
 
 __all__ = ['Shape3D', 'Parallelepiped', 'Tetrahedron', 'Sphere', 
-           'Material', 'Steel', 'Aluminum', 'Copper']
\ No newline at end of file
+           'Material', 'Steel', 'Aluminum', 'Copper', 'ShapeBatch',
+           'ShapeStore', 'ResultCache', 'ResultFile', 'ResultFileWriter',
+           'CompositeShape', 'deduplicate', 'TriangleMesh', 'read_stl', 'write_stl']
\ No newline at end of file
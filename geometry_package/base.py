@@ -1,14 +1,47 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
 from .materials import Material
+from .instrumentation import metrics
 
 class Shape3D(ABC):
     #Абстрактный базовый класс для 3D фигур
     
+    __slots__ = ('_material', '_volume', '_surface_area', '_parent')
+    
+    #Можно ли запоминать to_dict() фигуры в ResultCache: False у изменяемых
+    #фигур, результат которых не определяется canonical_key и материалом
+    cacheable = True
+    
     def __init__(self, material: Material = None):
         self._material = material
         self._volume = None
         self._surface_area = None
+        #Сборка (CompositeShape), в которую входит фигура
+        self._parent = None
+    
+    @property
+    def shape_type(self) -> str:
+        #Имя типа фигуры, под которым она сохраняется и группируется в пакеты
+        return self.__class__.__name__
+    
+    @property
+    def parameters(self) -> Dict[str, float]:
+        #Размеры фигуры по именам; по ним фигура сохраняется и кэшируется
+        return {}
+    
+    def canonical_key(self, tolerance: float = 0.0) -> Tuple:
+        #Тип фигуры и отсортированные параметры. С tolerance > 0 параметры
+        #квантуются до ближайшего кратного tolerance, и почти равные размеры
+        #дают один ключ (значения у границы шага могут попасть в соседние)
+        items = sorted(self.parameters.items())
+        if tolerance > 0:
+            return (self.shape_type, tuple((name, round(value / tolerance)) for name, value in items))
+        return (self.shape_type, tuple((name, float(value)) for name, value in items))
+    
+    def __hash__(self) -> int:
+        #Согласован с __eq__ подклассов: равные фигуры имеют равные параметры.
+        #Подкласс, определяющий __eq__, должен вернуть __hash__ = Shape3D.__hash__
+        return hash(self.canonical_key())
     
     @property
     def material(self) -> Material:
@@ -18,18 +51,29 @@ class Shape3D(ABC):
     def material(self, value: Material):
         if not isinstance(value, Material):
             raise TypeError("Материал класса не найден.")
+        old = self._material
         self._material = value
+        if self._parent is not None:
+            self._parent._material_changed(self, old)
     
     @property
     def volume(self) -> float:
         if self._volume is None:
             self._volume = self._calculate_volume()
+            if metrics.enabled:
+                metrics.increment(f'shape.{self.shape_type}.volume.computed')
+        elif metrics.enabled:
+            metrics.increment(f'shape.{self.shape_type}.volume.cached')
         return self._volume
     
     @property
     def surface_area(self) -> float:
         if self._surface_area is None:
             self._surface_area = self._calculate_surface_area()
+            if metrics.enabled:
+                metrics.increment(f'shape.{self.shape_type}.surface_area.computed')
+        elif metrics.enabled:
+            metrics.increment(f'shape.{self.shape_type}.surface_area.cached')
         return self._surface_area
     
     @property
@@ -55,7 +99,7 @@ class Shape3D(ABC):
     def to_dict(self) -> Dict[str, Any]:
         #Возвращает словарь с параметрами фигуры
         return {
-            'type': self.__class__.__name__,
+            'type': self.shape_type,
             'volume': round(self.volume, 4),
             'surface_area': round(self.surface_area, 4),
             'mass': round(self.mass, 4) if self.material else None,
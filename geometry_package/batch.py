@@ -0,0 +1,146 @@
+import math
+from typing import Dict, Any, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from .base import Shape3D
+
+# Формулы повторяют _calculate_volume/_calculate_surface_area скалярных классов,
+# включая порядок операций, поэтому результаты совпадают с ними с точностью
+# до последнего разряда (возведение в степень в NumPy и libm округляет по-разному)
+
+def _parallelepiped_volume(c: Dict[str, np.ndarray]) -> np.ndarray:
+    return c['length'] * c['width'] * c['height']
+
+def _parallelepiped_surface_area(c: Dict[str, np.ndarray]) -> np.ndarray:
+    return 2 * (c['length'] * c['width'] +
+                c['length'] * c['height'] +
+                c['width'] * c['height'])
+
+def _tetrahedron_volume(c: Dict[str, np.ndarray]) -> np.ndarray:
+    return (c['edge'] ** 3) * math.sqrt(2) / 12
+
+def _tetrahedron_surface_area(c: Dict[str, np.ndarray]) -> np.ndarray:
+    return math.sqrt(3) * (c['edge'] ** 2)
+
+def _sphere_volume(c: Dict[str, np.ndarray]) -> np.ndarray:
+    return (4/3) * math.pi * (c['radius'] ** 3)
+
+def _sphere_surface_area(c: Dict[str, np.ndarray]) -> np.ndarray:
+    return 4 * math.pi * (c['radius'] ** 2)
+
+class ShapeBatch:
+    #Пакет однотипных фигур, заданных столбцами параметров
+    
+    PARAMETERS = {
+        'Parallelepiped': ('length', 'width', 'height'),
+        'Tetrahedron': ('edge',),
+        'Sphere': ('radius',),
+    }
+    
+    _KERNELS = {
+        'Parallelepiped': (_parallelepiped_volume, _parallelepiped_surface_area),
+        'Tetrahedron': (_tetrahedron_volume, _tetrahedron_surface_area),
+        'Sphere': (_sphere_volume, _sphere_surface_area),
+    }
+    
+    def __init__(self, shape_type: str, density: Optional[Sequence[float]] = None,
+                 **columns: Sequence[float]):
+        if shape_type not in self.PARAMETERS:
+            raise ValueError(f"Неизвестный тип фигуры: {shape_type}")
+        names = self.PARAMETERS[shape_type]
+        if set(columns) != set(names):
+            raise ValueError(f"Для {shape_type} нужны столбцы: {', '.join(names)}")
+        
+        self._shape_type = shape_type
+        self._columns = {name: np.asarray(columns[name], dtype=np.float64) for name in names}
+        size = len(self._columns[names[0]])
+        if any(len(column) != size for column in self._columns.values()):
+            raise ValueError("Столбцы параметров должны быть одной длины")
+        
+        if density is not None:
+            density = np.asarray(density, dtype=np.float64)
+            if density.ndim == 0:
+                density = np.full(size, float(density))
+            if len(density) != size:
+                raise ValueError("Столбец плотности должен совпадать по длине с параметрами")
+        self._density = density
+        self._size = size
+        self._volume = None
+        self._surface_area = None
+    
+    @classmethod
+    def from_shapes(cls, shapes: Iterable[Shape3D]) -> 'ShapeBatch':
+        #Собирает пакет из однотипных объектов фигур
+        shapes = list(shapes)
+        if not shapes:
+            raise ValueError("Пустой список фигур")
+        shape_type = shapes[0].shape_type
+        if any(shape.shape_type != shape_type for shape in shapes):
+            raise TypeError("Все фигуры пакета должны быть одного типа")
+        if shape_type not in cls.PARAMETERS:
+            raise ValueError(f"Неизвестный тип фигуры: {shape_type}")
+        
+        columns = {name: [getattr(shape, name) for shape in shapes]
+                   for name in cls.PARAMETERS[shape_type]}
+        density = None
+        if any(shape.material is not None for shape in shapes):
+            density = [shape.material.density if shape.material is not None else math.nan
+                       for shape in shapes]
+        return cls(shape_type, density=density, **columns)
+    
+    @property
+    def shape_type(self) -> str:
+        return self._shape_type
+    
+    @property
+    def columns(self) -> Dict[str, np.ndarray]:
+        return dict(self._columns)
+    
+    @property
+    def density(self) -> Optional[np.ndarray]:
+        return self._density
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    @property
+    def volume(self) -> np.ndarray:
+        if self._volume is None:
+            self._volume = self._KERNELS[self._shape_type][0](self._columns)
+        return self._volume
+    
+    @property
+    def surface_area(self) -> np.ndarray:
+        if self._surface_area is None:
+            self._surface_area = self._KERNELS[self._shape_type][1](self._columns)
+        return self._surface_area
+    
+    @property
+    def mass(self) -> np.ndarray:
+        #Для строк без материала (плотность NaN) масса равна NaN
+        if self._density is None:
+            raise ValueError("Материал не задан")
+        return self.volume * self._density
+    
+    def to_dicts(self, material_names: Optional[Sequence[Optional[str]]] = None) -> List[Dict[str, Any]]:
+        #Результаты в формате Shape3D.to_dict() для каждой строки
+        volume = self.volume.tolist()
+        surface_area = self.surface_area.tolist()
+        mass = self.mass.tolist() if self._density is not None else [math.nan] * self._size
+        if material_names is None:
+            material_names = [None] * self._size
+        
+        results = []
+        for v, s, m, name in zip(volume, surface_area, mass, material_names):
+            results.append({
+                'type': self._shape_type,
+                'volume': round(v, 4),
+                'surface_area': round(s, 4),
+                'mass': round(m, 4) if not math.isnan(m) else None,
+                'material': name
+            })
+        return results
+    
+    def __repr__(self) -> str:
+        return f"ShapeBatch('{self._shape_type}', size={self._size})"
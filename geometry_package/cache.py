@@ -0,0 +1,127 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Hashable, Iterable, List, Mapping, Optional, Tuple
+
+from .base import Shape3D
+from .batch import ShapeBatch
+from .dedup import dedup_key
+
+def content_hash(shape_type: str, parameters: Mapping[str, float],
+                 material_name: Optional[str], digest: Optional[str] = None) -> str:
+    #Адрес содержимого расчета для хранения в базе (плотность задаётся именем материала).
+    #digest - хеш геометрии фигур, которую не описывают параметры (TriangleMesh);
+    #без него адрес совпадает с прежним
+    key = [shape_type, sorted((name, float(value)) for name, value in parameters.items()), material_name]
+    if digest is not None:
+        key.append(digest)
+    payload = json.dumps(key, ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+class ResultCache:
+    #Общий ограниченный LRU-кэш результатов to_dict() по содержимому фигуры
+    
+    def __init__(self, maxsize: int = 65536):
+        if maxsize < 1:
+            raise ValueError("Размер кэша должен быть положительным")
+        self._maxsize = maxsize
+        self._data: 'OrderedDict[Hashable, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+    
+    @staticmethod
+    def key_for(shape: Shape3D) -> Tuple:
+        #Тот же ключ, что у deduplicate: геометрия по Shape3D.canonical_key,
+        #поэтому сетки различаются по вершинам, а не по числу треугольников
+        return dedup_key(shape)
+    
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self._misses += 1
+                return None
+            self._data.move_to_end(key)
+            self._hits += 1
+            return dict(value)
+    
+    def put(self, key: Hashable, value: Dict[str, Any]):
+        with self._lock:
+            self._data[key] = dict(value)
+            self._data.move_to_end(key)
+            while len(self._data) > self._maxsize:
+                self._data.popitem(last=False)
+                self._evictions += 1
+    
+    def calculate(self, shape: Shape3D) -> Dict[str, Any]:
+        #shape.to_dict() с запоминанием результата для одинаковых фигур
+        if not shape.cacheable:
+            return shape.to_dict()
+        key = self.key_for(shape)
+        result = self.get(key)
+        if result is None:
+            result = shape.to_dict()
+            self.put(key, result)
+        return result
+    
+    def calculate_many(self, shapes: Iterable[Shape3D]) -> List[Dict[str, Any]]:
+        #Пакетный вариант calculate: промахи одного типа считаются через ShapeBatch
+        shapes = list(shapes)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(shapes)
+        pending: Dict[str, Dict[Tuple, List[int]]] = {}
+        
+        for index, shape in enumerate(shapes):
+            if not shape.cacheable:
+                results[index] = shape.to_dict()
+                continue
+            key = self.key_for(shape)
+            result = self.get(key)
+            if result is not None:
+                results[index] = result
+            else:
+                # Повторы внутри одного вызова считаются один раз
+                pending.setdefault(shape.shape_type, {}).setdefault(key, []).append(index)
+        
+        for shape_type, groups in pending.items():
+            representatives = [shapes[indexes[0]] for indexes in groups.values()]
+            if shape_type in ShapeBatch.PARAMETERS:
+                batch = ShapeBatch.from_shapes(representatives)
+                names = [shape.material.name if shape.material is not None else None
+                         for shape in representatives]
+                computed = batch.to_dicts(names)
+            else:
+                computed = [shape.to_dict() for shape in representatives]
+            
+            for (key, indexes), result in zip(groups.items(), computed):
+                self.put(key, result)
+                for index in indexes:
+                    results[index] = dict(result)
+        
+        return results
+    
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'size': len(self._data),
+                'maxsize': self._maxsize
+            }
+    
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+    
+    def __len__(self) -> int:
+        return len(self._data)
+
+# Общий экземпляр для консольного калькулятора и пакетных расчетов
+default_cache = ResultCache()
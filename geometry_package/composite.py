@@ -0,0 +1,213 @@
+import math
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .base import Shape3D
+from .batch import ShapeBatch
+from .materials import Material
+from .shapes import Parallelepiped, Tetrahedron, Sphere
+
+_SHAPE_CLASSES = {
+    'Parallelepiped': Parallelepiped,
+    'Tetrahedron': Tetrahedron,
+    'Sphere': Sphere,
+}
+
+class CompositeShape(Shape3D):
+    #Сборка из фигур, в том числе из вложенных сборок
+    #
+    #Объем, площадь поверхности и масса сборки - суммы по деталям. Они хранятся
+    #как накопленные итоги: добавление, удаление детали или смена ее материала
+    #переносит дельту детали вверх по цепочке сборок, то есть стоит O(глубины)
+    #независимо от числа деталей. Перекрытия деталей не учитываются, площадь -
+    #сумма площадей деталей. Из-за округлений итоги могут расходиться с точной
+    #суммой в последних разрядах; recalculate() пересчитывает их заново.
+    
+    __slots__ = ('_children', '_mass', '_unassigned', '_name')
+    
+    #Сборки сравниваются по тождеству, а не по параметрам
+    __hash__ = object.__hash__
+    
+    #Состав сборки меняется, поэтому ее результат не кэшируется
+    cacheable = False
+    
+    def canonical_key(self, tolerance: float = 0.0) -> Tuple:
+        #Согласован с __hash__: разные сборки не совпадают при равных итогах
+        return (self.shape_type, (('id', id(self)),))
+    
+    def __init__(self, children: Iterable[Shape3D] = (), name: str = "Сборка"):
+        super().__init__(None)
+        self._volume = 0.0
+        self._surface_area = 0.0
+        self._mass = 0.0
+        #Число деталей без материала; пока оно не ноль, масса не определена
+        self._unassigned = 0
+        self._children: Dict[int, Shape3D] = {}
+        self._name = name
+        self.extend(children)
+    
+    @property
+    def name(self) -> str:
+        return self._name
+    
+    @property
+    def children(self) -> List[Shape3D]:
+        return list(self._children.values())
+    
+    def __len__(self) -> int:
+        return len(self._children)
+    
+    def __iter__(self) -> Iterator[Shape3D]:
+        return iter(list(self._children.values()))
+    
+    def __contains__(self, shape: Shape3D) -> bool:
+        return self._children.get(id(shape)) is shape
+    
+    @property
+    def material(self) -> Optional[Material]:
+        #У сборки нет своего материала: он задается деталям
+        return None
+    
+    @material.setter
+    def material(self, value: Material):
+        raise TypeError("У сборки нет собственного материала")
+    
+    @property
+    def mass(self) -> float:
+        if self._unassigned:
+            raise ValueError("Материал задан не у всех деталей сборки")
+        return self._mass
+    
+    @staticmethod
+    def _contribution(shape: Shape3D) -> Tuple[float, float, float, int]:
+        #Вклад детали в итоги: объем, площадь, масса, деталей без материала
+        if isinstance(shape, CompositeShape):
+            return shape._volume, shape._surface_area, shape._mass, shape._unassigned
+        if shape.material is None:
+            return shape.volume, shape.surface_area, 0.0, 1
+        return shape.volume, shape.surface_area, shape.mass, 0
+    
+    def _propagate(self, volume: float, surface_area: float, mass: float, unassigned: int):
+        node = self
+        while node is not None:
+            node._volume += volume
+            node._surface_area += surface_area
+            node._mass += mass
+            node._unassigned += unassigned
+            node = node._parent
+    
+    def _material_changed(self, shape: Shape3D, old: Optional[Material]):
+        #Вызывается сеттером material детали после смены материала
+        volume = shape.volume
+        old_mass = volume * old.density if old is not None else 0.0
+        new_mass = volume * shape.material.density
+        self._propagate(0.0, 0.0, new_mass - old_mass, -1 if old is None else 0)
+    
+    def _attach(self, shape: Shape3D):
+        if not isinstance(shape, Shape3D):
+            raise TypeError("Деталью сборки может быть только фигура")
+        if shape._parent is not None:
+            raise ValueError("Фигура уже входит в сборку")
+        node = self
+        while node is not None:
+            if node is shape:
+                raise ValueError("Сборка не может входить сама в себя")
+            node = node._parent
+        shape._parent = self
+        self._children[id(shape)] = shape
+    
+    def add(self, shape: Shape3D) -> Shape3D:
+        self._attach(shape)
+        self._propagate(*self._contribution(shape))
+        return shape
+    
+    def extend(self, shapes: Iterable[Shape3D]):
+        #Добавление нескольких деталей с одним проходом вверх по сборкам.
+        #Если какую-то деталь добавить нельзя, уже присоединенные отсоединяются
+        #и сборка остается прежней
+        attached = []
+        totals = [0.0, 0.0, 0.0, 0]
+        try:
+            for shape in shapes:
+                self._attach(shape)
+                attached.append(shape)
+                for i, value in enumerate(self._contribution(shape)):
+                    totals[i] += value
+        except Exception:
+            for shape in attached:
+                del self._children[id(shape)]
+                shape._parent = None
+            raise
+        self._propagate(*totals)
+    
+    def remove(self, shape: Shape3D):
+        if shape not in self:
+            raise ValueError("Фигура не входит в эту сборку")
+        volume, surface_area, mass, unassigned = self._contribution(shape)
+        del self._children[id(shape)]
+        shape._parent = None
+        self._propagate(-volume, -surface_area, -mass, -unassigned)
+    
+    def add_batch(self, batch: ShapeBatch, material: Optional[Material] = None) -> List[Shape3D]:
+        #Добавление фигур пакета с общим материалом. Объем и площадь считаются
+        #векторно и сразу кладутся в кэш созданных фигур
+        shape_class = _SHAPE_CLASSES[batch.shape_type]
+        columns = batch.columns
+        parameters = [columns[name].tolist() for name in ShapeBatch.PARAMETERS[batch.shape_type]]
+        volumes = batch.volume.tolist()
+        surface_areas = batch.surface_area.tolist()
+        
+        shapes = []
+        for volume, surface_area, *values in zip(volumes, surface_areas, *parameters):
+            shape = shape_class(*values, material)
+            shape._volume = volume
+            shape._surface_area = surface_area
+            shape._parent = self
+            self._children[id(shape)] = shape
+            shapes.append(shape)
+        
+        if material is None:
+            mass, unassigned = 0.0, len(shapes)
+        else:
+            mass, unassigned = math.fsum(volume * material.density for volume in volumes), 0
+        self._propagate(math.fsum(volumes), math.fsum(surface_areas), mass, unassigned)
+        return shapes
+    
+    def add_parameters(self, shape_type: str, material: Optional[Material] = None,
+                       **columns: Iterable[float]) -> List[Shape3D]:
+        #Добавление однотипных деталей по столбцам параметров, как у ShapeBatch
+        return self.add_batch(ShapeBatch(shape_type, **columns), material)
+    
+    def _calculate_volume(self) -> float:
+        return math.fsum(shape.volume for shape in self._children.values())
+    
+    def _calculate_surface_area(self) -> float:
+        return math.fsum(shape.surface_area for shape in self._children.values())
+    
+    def recalculate(self):
+        #Полный пересчет итогов по всему дереву деталей
+        totals = [[], [], [], 0]
+        for shape in self._children.values():
+            if isinstance(shape, CompositeShape):
+                shape.recalculate()
+            volume, surface_area, mass, unassigned = self._contribution(shape)
+            totals[0].append(volume)
+            totals[1].append(surface_area)
+            totals[2].append(mass)
+            totals[3] += unassigned
+        self._volume = math.fsum(totals[0])
+        self._surface_area = math.fsum(totals[1])
+        self._mass = math.fsum(totals[2])
+        self._unassigned = totals[3]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'type': self.shape_type,
+            'volume': round(self._volume, 4),
+            'surface_area': round(self._surface_area, 4),
+            'mass': round(self._mass, 4) if not self._unassigned else None,
+            'material': None,
+            'parts': len(self._children)
+        }
+    
+    def __repr__(self) -> str:
+        return f"CompositeShape('{self._name}', parts={len(self._children)})"
@@ -0,0 +1,36 @@
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .base import Shape3D
+
+def dedup_key(shape: Shape3D, tolerance: float = 0.0) -> Tuple:
+    #Ключ одинаковых деталей: геометрия (см. Shape3D.canonical_key) и материал
+    material = shape.material
+    return (shape.canonical_key(tolerance),
+            (material.name, material.density) if material is not None else None)
+
+def deduplicate(items: Iterable[Any], tolerance: float = 0.0, window: Optional[int] = None,
+                shape_of: Optional[Callable[[Any], Shape3D]] = None) -> Iterator[Tuple[Any, int]]:
+    #Схлопывание потока одинаковых деталей в пары (первое вхождение, число повторов)
+    #
+    #Пары выдаются в порядке первого появления детали. Без window поток
+    #читается целиком и в памяти хранятся только уникальные детали; с window
+    #пары выдаются после каждых window элементов, так что память ограничена,
+    #но повторы из разных окон не объединяются. shape_of достает фигуру из
+    #элемента, если поток состоит не из фигур, а, например, из кортежей
+    if window is not None and window < 1:
+        raise ValueError("Размер окна должен быть положительным")
+    if tolerance < 0:
+        raise ValueError("Допуск не может быть отрицательным")
+    
+    counts: Dict[Tuple, List] = {}
+    for index, item in enumerate(items, 1):
+        key = dedup_key(shape_of(item) if shape_of is not None else item, tolerance)
+        entry = counts.get(key)
+        if entry is None:
+            counts[key] = [item, 1]
+        else:
+            entry[1] += 1
+        if window is not None and index % window == 0:
+            yield from ((item, count) for item, count in counts.values())
+            counts = {}
+    yield from ((item, count) for item, count in counts.values())
@@ -0,0 +1,278 @@
+import bisect
+import cProfile
+import functools
+import inspect
+import io
+import json
+import logging
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+# Необязательный сбор метрик горячих путей. По умолчанию выключен: проверка
+# metrics.enabled - единственная цена инструментирования в обычной работе.
+#
+#   счетчики      - число событий (вычисление/попадание в кэш свойств фигур,
+#                   вызовы, ошибки и затронутые строки методов базы)
+#   гистограммы   - время вызовов инструментированных функций
+#   приемники     - вызываемые объекты, получающие событие каждого вызова
+#                   (например, LoggingSink или JsonLinesSink)
+#   профилирование - cProfile для каждого N-го вызова и снимки tracemalloc
+
+# Границы корзин гистограммы времени, секунды
+LATENCY_BUCKETS = (1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1.0, 10.0)
+
+class Histogram:
+    #Гистограмма времени с фиксированными логарифмическими корзинами
+    
+    __slots__ = ('buckets', 'count', 'total', 'min', 'max')
+    
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+    
+    def observe(self, value: float):
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+    
+    def quantile(self, q: float) -> float:
+        #Квантиль q с линейной интерполяцией внутри корзины. Границы корзины
+        #сужаются до наблюдавшихся min и max, поэтому оценка не выходит за них
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, bucket in enumerate(self.buckets):
+            if bucket and seen + bucket >= rank:
+                lower = max(LATENCY_BUCKETS[index - 1] if index else 0.0, self.min)
+                upper = min(LATENCY_BUCKETS[index] if index < len(LATENCY_BUCKETS) else self.max, self.max)
+                return lower + (upper - lower) * max(rank - seen, 0.0) / bucket
+            seen += bucket
+        return self.max
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'min': self.min if self.count else 0.0,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99),
+            'buckets': dict(zip([*map(str, LATENCY_BUCKETS), 'inf'], self.buckets))
+        }
+
+class Profiler:
+    #Выборочное профилирование: каждый sample_every-й инструментированный
+    #вызов выполняется под общим cProfile.Profile
+    
+    def __init__(self):
+        self.sample_every = 0
+        self._profile: Optional[cProfile.Profile] = None
+        self._calls = 0
+        self._active = False
+        self._lock = threading.Lock()
+    
+    @property
+    def running(self) -> bool:
+        return self._profile is not None
+    
+    def start(self, sample_every: int = 100):
+        if sample_every < 1:
+            raise ValueError("Шаг выборки должен быть положительным")
+        self.sample_every = sample_every
+        self._calls = 0
+        self._profile = cProfile.Profile()
+    
+    def stop(self, limit: int = 20, sort: str = 'cumulative') -> str:
+        #Остановка и текстовый отчет pstats о выбранных вызовах
+        profile, self._profile = self._profile, None
+        if profile is None:
+            return ''
+        stream = io.StringIO()
+        try:
+            pstats.Stats(profile, stream=stream).sort_stats(sort).print_stats(limit)
+        except TypeError:
+            # Ни один вызов не попал в выборку
+            return 'Нет данных профилирования'
+        return stream.getvalue()
+    
+    def call(self, func: Callable, args, kwargs):
+        profile = self._profile
+        if profile is None:
+            return func(*args, **kwargs)
+        with self._lock:
+            self._calls += 1
+            sampled = not self._active and self._calls % self.sample_every == 0
+            if sampled:
+                self._active = True
+        if not sampled:
+            return func(*args, **kwargs)
+        try:
+            return profile.runcall(func, *args, **kwargs)
+        finally:
+            self._active = False
+
+class Metrics:
+    #Реестр счетчиков и гистограмм с подключаемыми приемниками событий
+    
+    def __init__(self):
+        self.enabled = False
+        self.profiler = Profiler()
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = defaultdict(int)
+        self._histograms: Dict[str, Histogram] = {}
+        self._sinks: List[Callable[[Dict[str, Any]], None]] = []
+    
+    def increment(self, name: str, value: int = 1):
+        with self._lock:
+            self._counters[name] += value
+    
+    def record_call(self, name: str, seconds: float, rows: Optional[int] = None,
+                    error: Optional[BaseException] = None):
+        #Учет одного вызова инструментированной функции
+        with self._lock:
+            self._counters[f'{name}.calls'] += 1
+            if rows is not None:
+                self._counters[f'{name}.rows'] += rows
+            if error is not None:
+                self._counters[f'{name}.errors'] += 1
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(seconds)
+            sinks = list(self._sinks)
+        
+        if sinks:
+            event = {'name': name, 'seconds': seconds, 'rows': rows,
+                     'error': repr(error) if error is not None else None}
+            for sink in sinks:
+                sink(event)
+    
+    def add_sink(self, sink: Callable[[Dict[str, Any]], None]):
+        with self._lock:
+            self._sinks.append(sink)
+    
+    def remove_sink(self, sink: Callable[[Dict[str, Any]], None]):
+        with self._lock:
+            self._sinks.remove(sink)
+    
+    def counter(self, name: str) -> int:
+        with self._lock:
+            return self._counters.get(name, 0)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'counters': dict(sorted(self._counters.items())),
+                'latency': {name: histogram.to_dict()
+                            for name, histogram in sorted(self._histograms.items())}
+            }
+    
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+# Общий реестр; фигуры, база и отчеты пишут сюда
+metrics = Metrics()
+
+def enable(*sinks: Callable[[Dict[str, Any]], None]):
+    #Включение сбора метрик; sinks дополнительно получают события вызовов
+    for sink in sinks:
+        metrics.add_sink(sink)
+    metrics.enabled = True
+
+def disable():
+    metrics.enabled = False
+
+def instrumented(name: str, rows: Optional[Callable[[Any], int]] = None):
+    #Декоратор: число вызовов, время, ошибки и, если задано rows(результат),
+    #затронутые строки. Для генераторов время считается до конца перебора,
+    #а строками считаются выданные элементы
+    def decorate(func):
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                if not metrics.enabled:
+                    yield from func(*args, **kwargs)
+                    return
+                start = time.perf_counter()
+                produced = 0
+                error = None
+                try:
+                    for item in func(*args, **kwargs):
+                        produced += 1
+                        yield item
+                except Exception as e:
+                    error = e
+                    raise
+                finally:
+                    metrics.record_call(name, time.perf_counter() - start, produced, error)
+            return generator_wrapper
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                result = metrics.profiler.call(func, args, kwargs)
+            except Exception as e:
+                metrics.record_call(name, time.perf_counter() - start, None, e)
+                raise
+            metrics.record_call(name, time.perf_counter() - start,
+                                rows(result) if rows is not None else None)
+            return result
+        return wrapper
+    return decorate
+
+def start_memory_tracing(frames: int = 1):
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+def stop_memory_tracing():
+    tracemalloc.stop()
+
+def memory_top(limit: int = 10) -> List[str]:
+    #Строки кода с наибольшим объемом живых выделений памяти
+    if not tracemalloc.is_tracing():
+        return []
+    statistics = tracemalloc.take_snapshot().statistics('lineno')
+    return [str(stat) for stat in statistics[:limit]]
+
+class LoggingSink:
+    #Приемник, пишущий события вызовов в logging
+    
+    def __init__(self, logger: Optional[logging.Logger] = None, level: int = logging.DEBUG):
+        self.logger = logger or logging.getLogger('geometry.instrumentation')
+        self.level = level
+    
+    def __call__(self, event: Dict[str, Any]):
+        self.logger.log(self.level, "%s %.6f с, строк: %s", event['name'], event['seconds'], event['rows'])
+
+class JsonLinesSink:
+    #Приемник, дописывающий события вызовов в файл JSON Lines
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+    
+    def __call__(self, event: Dict[str, Any]):
+        line = json.dumps(dict(event, time=time.time()), ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+    
+    def close(self):
+        self._file.close()
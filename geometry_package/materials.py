@@ -1,4 +1,6 @@
 class Material:
+    __slots__ = ('_name', '_density')
+    
     def __init__(self, name: str, density: float):
         self._name = name
         self._density = density
@@ -18,13 +20,19 @@ class Material:
         return f"Material('{self._name}', {self._density})"
 
 class Steel(Material):
+    __slots__ = ()
+    
     def __init__(self):
         super().__init__("Сталь", 7850.0)
 
 class Aluminum(Material):
+    __slots__ = ()
+    
     def __init__(self):
         super().__init__("Алюминий", 2700.0)
 
 class Copper(Material):
+    __slots__ = ()
+    
     def __init__(self):
         super().__init__("Медь", 8960.0)
\ No newline at end of file
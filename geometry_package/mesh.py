@@ -0,0 +1,151 @@
+import hashlib
+import os
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+from .base import Shape3D
+from .materials import Material
+
+# Двоичный STL (все числа little-endian):
+#
+#   заголовок   STL_HEADER_SIZE байт произвольного текста
+#   число       uint32 - количество треугольников
+#   записи      по STL_DTYPE.itemsize = 50 байт: нормаль, три вершины (float32)
+#               и 2 байта атрибутов
+#
+# Записи читаются через numpy.memmap как структурированный массив, поэтому
+# вершины сетки - представление файла без копирования и без разбора.
+
+STL_HEADER_SIZE = 80
+STL_COUNT_SIZE = 4
+STL_DTYPE = np.dtype([
+    ('normal', '<f4', (3,)),
+    ('vertices', '<f4', (3, 3)),
+    ('attributes', '<u2')
+])
+
+# Треугольников в одной порции при расчете в float64: ограничивает
+# временные массивы, не копируя всю сетку
+CHUNK_TRIANGLES = 1 << 18
+
+def read_stl(path: str) -> np.ndarray:
+    #Записи двоичного STL, отображенные в память только для чтения
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        header = f.read(STL_HEADER_SIZE + STL_COUNT_SIZE)
+    if len(header) < STL_HEADER_SIZE + STL_COUNT_SIZE:
+        raise ValueError("Файл STL поврежден: нет заголовка")
+    count = int(np.frombuffer(header, dtype='<u4', count=1, offset=STL_HEADER_SIZE)[0])
+    
+    offset = STL_HEADER_SIZE + STL_COUNT_SIZE
+    if size != offset + count * STL_DTYPE.itemsize:
+        if header.lstrip().startswith(b'solid'):
+            raise ValueError("Текстовый (ASCII) STL не поддерживается")
+        raise ValueError(f"Размер файла STL не соответствует числу треугольников: {count}")
+    if not count:
+        return np.zeros(0, dtype=STL_DTYPE)
+    return np.memmap(path, dtype=STL_DTYPE, mode='r', offset=offset, shape=(count,))
+
+def write_stl(path: str, vertices: np.ndarray, header: bytes = b''):
+    #Запись треугольников (n, 3, 3) в двоичный STL; нормали считаются по вершинам
+    vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 3, 3)
+    normals = np.cross(vertices[:, 1] - vertices[:, 0], vertices[:, 2] - vertices[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    np.divide(normals, lengths, out=normals, where=lengths > 0)
+    
+    records = np.zeros(len(vertices), dtype=STL_DTYPE)
+    records['normal'] = normals
+    records['vertices'] = vertices
+    with open(path, 'wb') as f:
+        f.write(header[:STL_HEADER_SIZE].ljust(STL_HEADER_SIZE, b'\0'))
+        f.write(np.uint32(len(records)).astype('<u4').tobytes())
+        records.tofile(f)
+
+class TriangleMesh(Shape3D):
+    #Фигура, заданная замкнутой треугольной сеткой
+    #
+    #Вершины - массив (n, 3, 3) любого вещественного типа, в том числе
+    #представление отображенного в память STL; он не копируется. scale
+    #переводит единицы сетки в метры (0.001 для STL в миллиметрах). Объем
+    #считается по теореме о дивергенции как сумма объемов тетраэдров
+    #(начало координат, треугольник), площадь - по векторным произведениям;
+    #для незамкнутой или самопересекающейся сетки объем не имеет смысла.
+    
+    __slots__ = ('_vertices', '_scale', '_digest')
+    
+    def __init__(self, vertices: np.ndarray, material: Material = None, scale: float = 1.0):
+        super().__init__(material)
+        vertices = np.asarray(vertices)
+        if vertices.ndim != 3 or vertices.shape[1:] != (3, 3):
+            raise ValueError("Вершины сетки должны иметь форму (n, 3, 3)")
+        if scale <= 0:
+            raise ValueError("Масштаб должен быть положительным")
+        self._vertices = vertices
+        self._scale = float(scale)
+        self._digest = None
+    
+    @classmethod
+    def from_stl(cls, path: str, material: Material = None, scale: float = 1.0) -> 'TriangleMesh':
+        #Сетка из двоичного STL без чтения файла в память
+        return cls(read_stl(path)['vertices'], material, scale)
+    
+    @property
+    def vertices(self) -> np.ndarray:
+        return self._vertices
+    
+    @property
+    def scale(self) -> float:
+        return self._scale
+    
+    def __len__(self) -> int:
+        return len(self._vertices)
+    
+    @property
+    def parameters(self) -> Dict[str, float]:
+        return {'triangles': float(len(self._vertices)), 'scale': self._scale}
+    
+    @property
+    def digest(self) -> str:
+        #SHA-1 вершин в float64, считается один раз порциями без копии всей сетки
+        if self._digest is None:
+            digest = hashlib.sha1()
+            for chunk in self._chunks():
+                digest.update(chunk)
+            self._digest = digest.hexdigest()
+        return self._digest
+    
+    def canonical_key(self, tolerance: float = 0.0) -> Tuple:
+        #Сетки различаются по содержимому: ключ - хеш вершин и масштаб.
+        #tolerance для сеток не применяется
+        return (self.shape_type, (('scale', self._scale), ('sha1', self.digest)))
+    
+    __hash__ = Shape3D.__hash__
+    
+    def _chunks(self):
+        #Непрерывные порции вершин в float64: у float32 из STL не хватает
+        #точности на сумму, а вершины из memmap идут с шагом записи STL
+        for start in range(0, len(self._vertices), CHUNK_TRIANGLES):
+            yield np.ascontiguousarray(self._vertices[start:start + CHUNK_TRIANGLES], dtype=np.float64)
+    
+    def _calculate_volume(self) -> float:
+        total = 0.0
+        for chunk in self._chunks():
+            a, b, c = chunk[:, 0], chunk[:, 1], chunk[:, 2]
+            total += float(np.einsum('ij,ij->', a, np.cross(b, c)))
+        # Знак зависит от ориентации граней; объем - его модуль
+        return abs(total) / 6 * self._scale ** 3
+    
+    def _calculate_surface_area(self) -> float:
+        total = 0.0
+        for chunk in self._chunks():
+            a, b, c = chunk[:, 0], chunk[:, 1], chunk[:, 2]
+            total += float(np.linalg.norm(np.cross(b - a, c - a), axis=1).sum())
+        return total / 2 * self._scale ** 2
+    
+    def to_dict(self) -> Dict[str, Any]:
+        #digest нужен базе: по нему различаются сетки с равным числом треугольников
+        return dict(super().to_dict(), digest=self.digest)
+    
+    def __repr__(self) -> str:
+        return f"TriangleMesh(triangles={len(self._vertices)})"
@@ -0,0 +1,224 @@
+import json
+import math
+import os
+import struct
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .batch import ShapeBatch
+
+# Формат файла результатов (все числа little-endian):
+#
+#   заголовок HEADER_SIZE байт: сигнатура, версия, размер записи, число записей,
+#                               смещение и длина таблиц
+#   записи    count * RESULT_DTYPE.itemsize байт, фиксированного размера
+#   таблицы   JSON: {"shape_types": [...], "materials": [{"name", "density"}]}
+#
+# Записи хранят коды типа фигуры и материала (индексы в таблицах); параметр,
+# не относящийся к фигуре, равен NaN, material_id = -1 - материал не задан.
+# Записи читаются через numpy.memmap, поэтому столбец или срез файла любого
+# размера - представление без копирования.
+
+MAGIC = b'GEOMRES\0'
+VERSION = 1
+HEADER = struct.Struct('<8sIIQQQ')
+HEADER_SIZE = 64
+
+PARAMETER_FIELDS = ('length', 'width', 'height', 'edge', 'radius')
+RESULT_FIELDS = ('volume', 'surface_area', 'mass')
+
+RESULT_DTYPE = np.dtype([
+    ('id', '<i8'),
+    ('shape_type', '<i4'),
+    ('material_id', '<i4'),
+    *((name, '<f8') for name in PARAMETER_FIELDS + RESULT_FIELDS)
+])
+
+class ResultFileWriter:
+    #Потоковая запись файла результатов частями по chunk_size записей
+    #
+    #Заголовок с итоговым числом записей и таблицы дописываются в close(),
+    #до этого файл читать нельзя. Если блок with завершился исключением,
+    #недописанный файл удаляется (abort), а не закрывается как полный.
+    
+    def __init__(self, path: str, chunk_size: int = 65536):
+        if chunk_size < 1:
+            raise ValueError("Размер части должен быть положительным")
+        self.path = path
+        self.count = 0
+        self._file = open(path, 'wb')
+        self._file.write(b'\0' * HEADER_SIZE)
+        self._shape_types: Dict[str, int] = {name: code for code, name in enumerate(ShapeBatch.PARAMETERS)}
+        self._materials: Dict[str, int] = {}
+        self._densities: List[Optional[float]] = []
+        self._buffer = np.zeros(chunk_size, dtype=RESULT_DTYPE)
+        self._buffered = 0
+    
+    def shape_code(self, shape_type: str) -> int:
+        return self._shape_types.setdefault(shape_type, len(self._shape_types))
+    
+    def material_id(self, name: Optional[str], density: Optional[float] = None) -> int:
+        #Код материала; плотность запоминается при первом упоминании, в котором она известна
+        if name is None:
+            return -1
+        code = self._materials.get(name)
+        if code is None:
+            code = self._materials[name] = len(self._densities)
+            self._densities.append(density)
+        elif self._densities[code] is None:
+            self._densities[code] = density
+        return code
+    
+    def append(self, shape_data: Dict[str, Any], parameters: Dict[str, float], id: int = 0,
+               density: Optional[float] = None):
+        #Добавление одного расчета в формате to_dict() и его параметров. Плотность
+        #материала, если не задана, восстанавливается как масса / объем
+        if density is None and shape_data.get('mass') and shape_data['volume']:
+            density = shape_data['mass'] / shape_data['volume']
+        record = self._buffer[self._buffered]
+        record['id'] = id
+        record['shape_type'] = self.shape_code(shape_data['type'])
+        record['material_id'] = self.material_id(shape_data['material'], density)
+        for name in PARAMETER_FIELDS:
+            value = parameters.get(name)
+            record[name] = np.nan if value is None else value
+        for name in RESULT_FIELDS:
+            value = shape_data[name]
+            record[name] = np.nan if value is None else value
+        self._buffered += 1
+        if self._buffered == len(self._buffer):
+            self._flush_buffer()
+    
+    def write_records(self, records: np.ndarray):
+        #Запись готового массива записей RESULT_DTYPE (коды должны быть заданы
+        #через shape_code и material_id этого же writer)
+        if records.dtype != RESULT_DTYPE:
+            raise ValueError("Массив записей должен иметь тип RESULT_DTYPE")
+        self._flush_buffer()
+        np.ascontiguousarray(records).tofile(self._file)
+        self.count += len(records)
+    
+    def _flush_buffer(self):
+        if self._buffered:
+            self._buffer[:self._buffered].tofile(self._file)
+            self.count += self._buffered
+            self._buffered = 0
+    
+    def close(self):
+        if self._file.closed:
+            return
+        self._flush_buffer()
+        tables = json.dumps({
+            'shape_types': sorted(self._shape_types, key=self._shape_types.get),
+            'materials': [{'name': name, 'density': self._densities[material_id]}
+                          for name, material_id in self._materials.items()]
+        }, ensure_ascii=False).encode('utf-8')
+        tables_offset = self._file.tell()
+        self._file.write(tables)
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, VERSION, RESULT_DTYPE.itemsize, self.count,
+                                     tables_offset, len(tables)))
+        self._file.close()
+    
+    def abort(self):
+        #Закрытие без заголовка и удаление недописанного файла
+        if self._file.closed:
+            return
+        self._file.close()
+        os.remove(self.path)
+    
+    def __enter__(self) -> 'ResultFileWriter':
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+class ResultFile:
+    #Файл результатов, отображенный в память только для чтения
+    #
+    #records - numpy.memmap с записями; column() и срезы его не копируют,
+    #поэтому просмотр многогигабайтного файла не требует его загрузки.
+    
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.read(HEADER_SIZE)
+            if len(header) < HEADER.size:
+                raise ValueError("Файл результатов поврежден: нет заголовка")
+            magic, version, record_size, count, tables_offset, tables_length = HEADER.unpack_from(header)
+            if magic != MAGIC:
+                raise ValueError("Это не файл результатов")
+            if version != VERSION or record_size != RESULT_DTYPE.itemsize:
+                raise ValueError(f"Неподдерживаемая версия файла результатов: {version}")
+            f.seek(tables_offset)
+            tables = json.loads(f.read(tables_length).decode('utf-8'))
+        
+        self.shape_types: List[str] = tables['shape_types']
+        self.materials: List[Dict[str, Any]] = tables['materials']
+        if count:
+            self.records = np.memmap(path, dtype=RESULT_DTYPE, mode='r',
+                                     offset=HEADER_SIZE, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=RESULT_DTYPE)
+    
+    def __len__(self) -> int:
+        return len(self.records)
+    
+    def __getitem__(self, index):
+        return self.records[index]
+    
+    def column(self, name: str) -> np.ndarray:
+        #Столбец записей - представление с шагом в размер записи
+        return self.records[name]
+    
+    def shape_code(self, shape_type: str) -> int:
+        return self.shape_types.index(shape_type) if shape_type in self.shape_types else -1
+    
+    def mask(self, shape_type: Optional[str] = None, material: Optional[str] = None) -> np.ndarray:
+        #Логическая маска записей с заданными типом фигуры и материалом
+        selected = np.ones(len(self.records), dtype=bool)
+        if shape_type is not None:
+            selected &= self.records['shape_type'] == self.shape_code(shape_type)
+        if material is not None:
+            names = [m['name'] for m in self.materials]
+            material_id = names.index(material) if material in names else -2
+            selected &= self.records['material_id'] == material_id
+        return selected
+    
+    def iter_calculations(self, batch_size: int = 10000
+                          ) -> Iterator[Tuple[Dict[str, Any], Dict[str, float]]]:
+        #Пары (shape_data, parameters) в формате save_calculations;
+        #в память одновременно читается не больше batch_size записей
+        material_names = [m['name'] for m in self.materials]
+        for start in range(0, len(self.records), batch_size):
+            chunk = self.records[start:start + batch_size]
+            columns = {name: chunk[name].tolist() for name in RESULT_DTYPE.names}
+            for i in range(len(chunk)):
+                shape_type = self.shape_types[columns['shape_type'][i]]
+                material_id = columns['material_id'][i]
+                names = ShapeBatch.PARAMETERS.get(shape_type, PARAMETER_FIELDS)
+                parameters = {name: columns[name][i] for name in names
+                              if not math.isnan(columns[name][i])}
+                mass = columns['mass'][i]
+                yield {
+                    'type': shape_type,
+                    'volume': columns['volume'][i],
+                    'surface_area': columns['surface_area'][i],
+                    'mass': None if math.isnan(mass) else mass,
+                    'material': material_names[material_id] if material_id >= 0 else None
+                }, parameters
+    
+    def close(self):
+        #Освобождение отображения; открытые ранее представления остаются валидны,
+        #пока на них есть ссылки
+        self.records = np.zeros(0, dtype=RESULT_DTYPE)
+    
+    def __enter__(self) -> 'ResultFile':
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
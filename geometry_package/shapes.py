@@ -1,9 +1,12 @@
 import math
+from typing import Dict
 from .base import Shape3D
 
 class Parallelepiped(Shape3D):
     #Класс параллелепипеда
     
+    __slots__ = ('_length', '_width', '_height')
+    
     def __init__(self, length: float, width: float, height: float, material=None):
         super().__init__(material)
         self._length = length
@@ -22,6 +25,10 @@ class Parallelepiped(Shape3D):
     def height(self) -> float:
         return self._height
     
+    @property
+    def parameters(self) -> Dict[str, float]:
+        return {'length': self._length, 'width': self._width, 'height': self._height}
+    
     def _calculate_volume(self) -> float:
         return self._length * self._width * self._height
     
@@ -37,6 +44,8 @@ class Parallelepiped(Shape3D):
                 self._width == other._width and 
                 self._height == other._height)
     
+    __hash__ = Shape3D.__hash__
+    
     def __add__(self, other):
         #Сложение объёмов двух параллелепипедов
         if not isinstance(other, Parallelepiped):
@@ -46,6 +55,8 @@ class Parallelepiped(Shape3D):
 class Tetrahedron(Shape3D):
     #Класс правильного тетраэдра
     
+    __slots__ = ('_edge',)
+    
     def __init__(self, edge: float, material=None):
         super().__init__(material)
         self._edge = edge
@@ -54,6 +65,10 @@ class Tetrahedron(Shape3D):
     def edge(self) -> float:
         return self._edge
     
+    @property
+    def parameters(self) -> Dict[str, float]:
+        return {'edge': self._edge}
+    
     def _calculate_volume(self) -> float:
         return (self._edge ** 3) * math.sqrt(2) / 12
     
@@ -65,6 +80,8 @@ class Tetrahedron(Shape3D):
             return False
         return self._edge == other._edge
     
+    __hash__ = Shape3D.__hash__
+    
     def __lt__(self, other):
         #Сравнение по объёму
         if not isinstance(other, Tetrahedron):
@@ -74,6 +91,8 @@ class Tetrahedron(Shape3D):
 class Sphere(Shape3D):
     #Класс сферы
     
+    __slots__ = ('_radius',)
+    
     def __init__(self, radius: float, material=None):
         super().__init__(material)
         self._radius = radius
@@ -82,6 +101,10 @@ class Sphere(Shape3D):
     def radius(self) -> float:
         return self._radius
     
+    @property
+    def parameters(self) -> Dict[str, float]:
+        return {'radius': self._radius}
+    
     def _calculate_volume(self) -> float:
         return (4/3) * math.pi * (self._radius ** 3)
     
@@ -93,6 +116,8 @@ class Sphere(Shape3D):
             return False
         return self._radius == other._radius
     
+    __hash__ = Shape3D.__hash__
+    
     def __mul__(self, factor):
         #Умножение радиуса на коэффициент
         if not isinstance(factor, (int, float)):
@@ -0,0 +1,245 @@
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .base import Shape3D
+from .batch import ShapeBatch
+from .materials import Material
+from .shapes import Parallelepiped, Tetrahedron, Sphere
+
+def _column_property(name: str) -> property:
+    #Атрибут параметра фигуры, читаемый напрямую из столбца хранилища
+    def getter(self):
+        return float(self._store._columns[name][self._index])
+    return property(getter)
+
+class _ShapeView:
+    #Общая часть представлений строки ShapeStore; данные не копируются
+    
+    __slots__ = ()
+    
+    def __init__(self, store: 'ShapeStore', index: int):
+        self._store = store
+        self._index = index
+    
+    @property
+    def shape_type(self) -> str:
+        return self._store.shape_type
+    
+    @property
+    def _material(self) -> Optional[Material]:
+        material_id = self._store._material_ids[self._index]
+        return self._store._materials[material_id] if material_id >= 0 else None
+    
+    @_material.setter
+    def _material(self, value: Optional[Material]):
+        self._store._material_ids[self._index] = self._store.material_id(value)
+    
+    @property
+    def _parent(self) -> None:
+        return None
+    
+    @_parent.setter
+    def _parent(self, value):
+        raise TypeError("Строка хранилища не может входить в сборку")
+    
+    @property
+    def volume(self) -> float:
+        return self._calculate_volume()
+    
+    @property
+    def surface_area(self) -> float:
+        return self._calculate_surface_area()
+    
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(index={self._index})"
+
+class ParallelepipedView(_ShapeView, Parallelepiped):
+    __slots__ = ('_store', '_index')
+    _length = _column_property('length')
+    _width = _column_property('width')
+    _height = _column_property('height')
+
+class TetrahedronView(_ShapeView, Tetrahedron):
+    __slots__ = ('_store', '_index')
+    _edge = _column_property('edge')
+
+class SphereView(_ShapeView, Sphere):
+    __slots__ = ('_store', '_index')
+    _radius = _column_property('radius')
+
+class ShapeStore:
+    #Хранилище однотипных фигур в виде непрерывных столбцов (struct-of-arrays)
+    #
+    #Параметры лежат в столбцах float64, материал - в столбце int32 с индексом
+    #в общем списке материалов (-1 - материал не задан). Срез хранилища
+    #разделяет память с исходным и доступен только для чтения структуры:
+    #после роста исходного хранилища ранее взятые срезы от него отвязываются.
+    
+    _VIEWS = {
+        'Parallelepiped': ParallelepipedView,
+        'Tetrahedron': TetrahedronView,
+        'Sphere': SphereView,
+    }
+    
+    def __init__(self, shape_type: str, capacity: int = 16,
+                 materials: Optional[List[Material]] = None):
+        if shape_type not in ShapeBatch.PARAMETERS:
+            raise ValueError(f"Неизвестный тип фигуры: {shape_type}")
+        capacity = max(capacity, 1)
+        self._shape_type = shape_type
+        self._columns = {name: np.empty(capacity, dtype=np.float64)
+                         for name in ShapeBatch.PARAMETERS[shape_type]}
+        self._material_ids = np.full(capacity, -1, dtype=np.int32)
+        self._materials: List[Material] = []
+        self._material_index: Dict[Tuple[str, float], int] = {}
+        self._size = 0
+        self._is_view = False
+        for material in materials or ():
+            self.material_id(material)
+    
+    @classmethod
+    def from_columns(cls, shape_type: str, material_ids: Optional[Sequence[int]] = None,
+                     materials: Optional[List[Material]] = None,
+                     **columns: Sequence[float]) -> 'ShapeStore':
+        #Оборачивает готовые столбцы; массивы float64 используются без копирования
+        store = cls(shape_type, capacity=1, materials=materials)
+        names = ShapeBatch.PARAMETERS[shape_type]
+        if set(columns) != set(names):
+            raise ValueError(f"Для {shape_type} нужны столбцы: {', '.join(names)}")
+        store._columns = {name: np.asarray(columns[name], dtype=np.float64) for name in names}
+        size = len(store._columns[names[0]])
+        if any(len(column) != size for column in store._columns.values()):
+            raise ValueError("Столбцы параметров должны быть одной длины")
+        if material_ids is None:
+            store._material_ids = np.full(size, -1, dtype=np.int32)
+        else:
+            store._material_ids = np.asarray(material_ids, dtype=np.int32)
+            if len(store._material_ids) != size:
+                raise ValueError("Столбец материалов должен совпадать по длине с параметрами")
+        store._size = size
+        return store
+    
+    @classmethod
+    def from_shapes(cls, shapes: Sequence[Shape3D]) -> 'ShapeStore':
+        #Переносит объекты фигур в столбцы
+        batch = ShapeBatch.from_shapes(shapes)
+        store = cls.from_columns(batch.shape_type, **batch.columns)
+        store._material_ids[:] = [store.material_id(shape.material) for shape in shapes]
+        return store
+    
+    @property
+    def shape_type(self) -> str:
+        return self._shape_type
+    
+    @property
+    def materials(self) -> Tuple[Material, ...]:
+        return tuple(self._materials)
+    
+    @property
+    def material_ids(self) -> np.ndarray:
+        return self._material_ids[:self._size]
+    
+    def column(self, name: str) -> np.ndarray:
+        #Представление столбца параметра без копирования
+        return self._columns[name][:self._size]
+    
+    def material_id(self, material: Optional[Material]) -> int:
+        #Индекс материала в списке хранилища; новый материал добавляется в конец
+        if material is None:
+            return -1
+        if not isinstance(material, Material):
+            raise TypeError("Материал класса не найден.")
+        key = (material.name, material.density)
+        material_id = self._material_index.get(key)
+        if material_id is None:
+            material_id = len(self._materials)
+            self._materials.append(material)
+            self._material_index[key] = material_id
+        return material_id
+    
+    def _reserve(self, size: int):
+        capacity = len(self._material_ids)
+        if size <= capacity:
+            return
+        if self._is_view:
+            raise ValueError("Срез хранилища нельзя расширять")
+        new_capacity = max(size, capacity * 2)
+        for name, column in self._columns.items():
+            grown = np.empty(new_capacity, dtype=np.float64)
+            grown[:self._size] = column[:self._size]
+            self._columns[name] = grown
+        grown_ids = np.full(new_capacity, -1, dtype=np.int32)
+        grown_ids[:self._size] = self._material_ids[:self._size]
+        self._material_ids = grown_ids
+    
+    def append(self, *parameters: float, material: Optional[Material] = None) -> int:
+        #Добавляет фигуру по параметрам в порядке ShapeBatch.PARAMETERS
+        names = ShapeBatch.PARAMETERS[self._shape_type]
+        if len(parameters) != len(names):
+            raise ValueError(f"Для {self._shape_type} нужны параметры: {', '.join(names)}")
+        self._reserve(self._size + 1)
+        for name, value in zip(names, parameters):
+            self._columns[name][self._size] = value
+        self._material_ids[self._size] = self.material_id(material)
+        self._size += 1
+        return self._size - 1
+    
+    def extend(self, material: Optional[Material] = None, **columns: Sequence[float]):
+        #Добавляет столбцы параметров целиком
+        names = ShapeBatch.PARAMETERS[self._shape_type]
+        if set(columns) != set(names):
+            raise ValueError(f"Для {self._shape_type} нужны столбцы: {', '.join(names)}")
+        arrays = {name: np.asarray(columns[name], dtype=np.float64) for name in names}
+        count = len(arrays[names[0]])
+        if any(len(array) != count for array in arrays.values()):
+            raise ValueError("Столбцы параметров должны быть одной длины")
+        self._reserve(self._size + count)
+        end = self._size + count
+        for name, array in arrays.items():
+            self._columns[name][self._size:end] = array
+        self._material_ids[self._size:end] = self.material_id(material)
+        self._size = end
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def __getitem__(self, key: Union[int, slice]) -> Union[Shape3D, 'ShapeStore']:
+        if isinstance(key, slice):
+            return self._slice(key)
+        index = key.__index__()
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("Индекс вне хранилища")
+        return self._VIEWS[self._shape_type](self, index)
+    
+    def __iter__(self) -> Iterator[Shape3D]:
+        view_class = self._VIEWS[self._shape_type]
+        for index in range(self._size):
+            yield view_class(self, index)
+    
+    def _slice(self, key: slice) -> 'ShapeStore':
+        sub = ShapeStore.__new__(ShapeStore)
+        sub._shape_type = self._shape_type
+        sub._columns = {name: column[:self._size][key] for name, column in self._columns.items()}
+        sub._material_ids = self._material_ids[:self._size][key]
+        sub._materials = self._materials
+        sub._material_index = self._material_index
+        sub._size = len(sub._material_ids)
+        sub._is_view = True
+        return sub
+    
+    def batch(self) -> ShapeBatch:
+        #Пакет для векторизованных расчётов поверх столбцов хранилища
+        columns = {name: self.column(name) for name in self._columns}
+        density = None
+        ids = self.material_ids
+        if self._materials and (ids >= 0).any():
+            # Последний элемент таблицы (NaN) выбирается индексом -1
+            table = np.array([m.density for m in self._materials] + [np.nan])
+            density = table[ids]
+        return ShapeBatch(self._shape_type, density=density, **columns)
+    
+    def __repr__(self) -> str:
+        return f"ShapeStore('{self._shape_type}', size={self._size})"
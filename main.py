@@ -1,7 +1,16 @@
-from geometry_package import Parallelepiped, Tetrahedron, Sphere, Steel, Aluminum, Copper
-from database import GeometryDatabase
+from geometry_package import Parallelepiped, Tetrahedron, Sphere
+from geometry_package.cache import default_cache
+from geometry_package import instrumentation
+from geometry_package.instrumentation import instrumented, metrics
+from database import GeometryDatabase, WriteBehindWriter
+from batch_runner import run_batch, check_input
+from service import serve, MAX_BATCH_PARTS
+from reports import export_xlsx, export_docx
+import argparse
+import asyncio
 import os
 import json
+import tracemalloc
 
 class ConsoleGeometryCalculator:
     def __init__(self):
@@ -11,16 +20,19 @@ class ConsoleGeometryCalculator:
             "3": {"name": "Шар", "class": Sphere}
         }
         
-        self.materials = {
-            "1": {"name": "Сталь", "obj": Steel()},
-            "2": {"name": "Алюминий", "obj": Aluminum()},
-            "3": {"name": "Медь", "obj": Copper()}
-        }
-        
         self.current_shape = None
         self.current_results = None
         self.current_parameters = None
+        self.history_page_size = 10
+        self.cache = default_cache
         self.db = GeometryDatabase()
+        self.writer = WriteBehindWriter(self.db)
+        self.materials = self.material_options()
+    
+    def material_options(self):
+        """Пункты выбора материала из справочника базы"""
+        return {str(number): {"name": material.name, "obj": material}
+                for number, material in enumerate(self.db.materials, 1)}
         
     def clear_screen(self):
         """Очистка экрана консоли"""
@@ -102,16 +114,32 @@ class ConsoleGeometryCalculator:
         print("ВЫБОР МАТЕРИАЛА")
         print("-" * 30)
         
-        choice = self.get_user_choice(self.materials, "Доступные материалы:")
-        material_info = self.materials[choice]
+        options = dict(self.materials)
+        new_choice = str(len(options) + 1)
+        options[new_choice] = {"name": "Новый материал", "obj": None}
+        choice = self.get_user_choice(options, "Доступные материалы:")
+        
+        if choice == new_choice:
+            while True:
+                name = input("\nНазвание материала: ").strip()
+                density = self.get_float_input("Плотность (кг/м³): ")
+                try:
+                    material = self.db.materials.register(name, density)
+                    break
+                except ValueError as e:
+                    print(f"Ошибка: {e}")
+            self.materials = self.material_options()
+            print(f"\nМатериал {material.name} сохранён в справочнике")
+            return material
         
+        material_info = self.materials[choice]
         print(f"\nВыбрано: {material_info['name']}")
         return material_info['obj']
     
     def calculate_properties(self, shape, material):
-        """Расчёт свойств фигуры"""
+        """Расчёт свойств фигуры (повторные расчёты берутся из общего кэша)"""
         shape.material = material
-        return shape.to_dict()
+        return self.cache.calculate(shape)
     
     def display_results(self, results, shape):
         """Отображение результатов"""
@@ -141,36 +169,62 @@ class ConsoleGeometryCalculator:
     def save_to_database(self, results, parameters):
         """Сохранение расчета в базу данных"""
         try:
-            self.db.save_calculation(results, parameters)
-            print("Расчет сохранен в базу данных")
+            self.writer.put(results, parameters)
+            # Некорректный расчет отклоняется в put(); ошибка фиксации будет показана при flush_writes
+            print("Расчет поставлен в очередь на сохранение в базу данных")
+        except Exception as e:
+            print(f"Ошибка при сохранении в базу данных: {str(e)}")
+    
+    def flush_writes(self):
+        """Дозапись отложенных расчетов с выводом ошибки записи"""
+        try:
+            self.writer.flush()
         except Exception as e:
             print(f"Ошибка при сохранении в базу данных: {str(e)}")
     
     def view_calculation_history(self):
-        """Просмотр истории расчетов"""
-        self.clear_screen()
-        self.display_header()
-        print("ИСТОРИЯ РАСЧЕТОВ")
-        print("-" * 30)
-        
-        calculations = self.db.get_all_calculations()
-        
-        if not calculations:
-            print("История расчетов пуста.")
-            input("\nНажмите Enter для продолжения...")
-            return
+        """Просмотр истории расчетов постранично, от новых к старым"""
+        after_id = None
+        shown = 0
+        # Отложенные записи должны попасть в выборку
+        self.flush_writes()
         
-        for calc in calculations:
-            print(f"\nID: {calc['id']}")
-            print(f"  Фигура: {calc['shape_type']}")
-            print(f"  Материал: {calc['material']}")
-            print(f"  Объём: {calc['volume']:.4f} м³")
-            print(f"  Масса: {calc['mass']:.2f} кг")
-            print(f"  Дата: {calc['created_at']}")
+        while True:
+            self.clear_screen()
+            self.display_header()
+            print("ИСТОРИЯ РАСЧЕТОВ")
             print("-" * 30)
-        
-        print(f"\nВсего расчетов: {len(calculations)}")
-        input("\nНажмите Enter для продолжения...")
+            
+            calculations = self.db.get_calculations_page(after_id, self.history_page_size)
+            
+            if not calculations:
+                if shown == 0:
+                    print("История расчетов пуста.")
+                else:
+                    print(f"Больше расчетов нет. Показано: {shown}")
+                input("\nНажмите Enter для продолжения...")
+                return
+            
+            for calc in calculations:
+                print(f"\nID: {calc['id']}")
+                print(f"  Фигура: {calc['shape_type']}")
+                print(f"  Материал: {calc['material']}")
+                print(f"  Объём: {calc['volume']:.4f} м³")
+                print(f"  Масса: {calc['mass']:.2f} кг")
+                print(f"  Дата: {calc['created_at']}")
+                print("-" * 30)
+            
+            shown += len(calculations)
+            after_id = calculations[-1]['id']
+            
+            if len(calculations) < self.history_page_size:
+                print(f"\nПоказано расчетов: {shown}")
+                input("\nНажмите Enter для продолжения...")
+                return
+            
+            choice = input(f"\nПоказано: {shown}. Enter - следующая страница, q - выход: ")
+            if choice.lower() in ['q', 'й']:
+                return
     
     def show_statistics(self):
         """Показать статистику"""
@@ -179,6 +233,7 @@ class ConsoleGeometryCalculator:
         print("СТАТИСТИКА")
         print("-" * 20)
         
+        self.flush_writes()
         stats = self.db.get_statistics()
         
         print(f"Всего расчетов: {stats['total_calculations']}")
@@ -186,6 +241,18 @@ class ConsoleGeometryCalculator:
         print(f"Уникальных материалов: {stats['unique_materials']}")
         print(f"Последний расчет: {stats['last_calculation'] or 'Нет данных'}")
         
+        if stats['total_calculations']:
+            print(f"Суммарный объём: {stats['total_volume']:.4f} м³")
+            print(f"Суммарная масса: {stats['total_mass']:.2f} кг")
+            
+            print("\nПо фигурам:")
+            for shape_type, group in stats['by_shape'].items():
+                print(f"  {shape_type}: {group['calculations']} расч., {group['total_mass']:.2f} кг")
+            
+            print("\nПо материалам:")
+            for material, group in stats['by_material'].items():
+                print(f"  {material}: {group['calculations']} расч., {group['total_mass']:.2f} кг")
+        
         input("\nНажмите Enter для продолжения...")
     
     def save_report(self, results, shape):
@@ -217,6 +284,7 @@ class ConsoleGeometryCalculator:
         else:
             print("Неверный выбор!")
     
+    @instrumented('reports.save_as_text')
     def save_as_text(self, results, shape, filename):
         """Сохранение в текстовом формате"""
         with open(filename, 'w', encoding='utf-8') as f:
@@ -237,6 +305,7 @@ class ConsoleGeometryCalculator:
             elif results['type'] == 'Sphere':
                 f.write(f"Радиус:         {shape.radius} м\n")
     
+    @instrumented('reports.save_as_csv')
     def save_as_csv(self, results, shape, filename):
         """Сохранение в CSV формате"""
         with open(filename, 'w', encoding='utf-8') as f:
@@ -258,6 +327,109 @@ class ConsoleGeometryCalculator:
             elif results['type'] == 'Sphere':
                 f.write(f"Радиус,{shape.radius},м\n")
     
+    def export_history(self):
+        """Выгрузка истории расчетов в XLSX или DOCX с необязательными фильтрами"""
+        self.clear_screen()
+        self.display_header()
+        print("ЭКСПОРТ ИСТОРИИ РАСЧЕТОВ")
+        print("-" * 30)
+        print("1. XLSX (все строки)")
+        print("2. DOCX (сводный отчёт)")
+        
+        choice = input("\nВведите ваш выбор (1-2): ")
+        if choice not in ("1", "2"):
+            print("Неверный выбор!")
+            input("\nНажмите Enter для продолжения...")
+            return
+        
+        print("\nФильтр по фигуре (Enter - все):")
+        for key, shape_info in self.shapes.items():
+            print(f"{key}. {shape_info['name']}")
+        shape_choice = input("Фигура: ").strip()
+        shape_type = self.shapes[shape_choice]["class"].__name__ if shape_choice in self.shapes else None
+        
+        print("\nФильтр по материалу (Enter - все):")
+        for key, material_info in self.materials.items():
+            print(f"{key}. {material_info['name']}")
+        material_choice = input("Материал: ").strip()
+        material = self.materials[material_choice]["name"] if material_choice in self.materials else None
+        
+        extension = "xlsx" if choice == "1" else "docx"
+        filename = input(f"\nИмя файла (Enter - geometry_history.{extension}): ").strip()
+        filename = filename or f"geometry_history.{extension}"
+        
+        try:
+            # Отложенные записи должны попасть в выгрузку
+            self.writer.flush()
+            export = export_xlsx if choice == "1" else export_docx
+            rows = export(self.db, filename, shape_type=shape_type, material=material)
+            print(f"Выгружено расчетов: {rows}, файл {filename}")
+        except Exception as e:
+            print(f"Ошибка при экспорте: {str(e)}")
+        input("\nНажмите Enter для продолжения...")
+    
+    def show_diagnostics(self):
+        """Диагностика: счетчики и время горячих путей, профилирование"""
+        while True:
+            self.clear_screen()
+            self.display_header()
+            print("ДИАГНОСТИКА")
+            print("-" * 30)
+            snapshot = metrics.snapshot()
+            print(f"Сбор метрик: {'включен' if metrics.enabled else 'выключен'}")
+            print(f"Профилирование: {'идет' if metrics.profiler.running else 'выключено'}")
+            print(f"Трассировка памяти: {'идет' if tracemalloc.is_tracing() else 'выключена'}")
+            
+            if snapshot['counters']:
+                print("\nСчетчики:")
+                for name, value in snapshot['counters'].items():
+                    print(f"  {name:<48}{value:>10}")
+            if snapshot['latency']:
+                print(f"\n{'Вызов':<36}{'число':>8}{'ср, мс':>10}{'p50, мс':>10}{'p99, мс':>10}")
+                for name, latency in snapshot['latency'].items():
+                    print(f"{name:<36}{latency['count']:>8}{latency['mean'] * 1e3:>10.3f}"
+                          f"{latency['p50'] * 1e3:>10.3f}{latency['p99'] * 1e3:>10.3f}")
+            
+            print("\n1. Включить/выключить сбор метрик")
+            print("2. Сбросить метрики")
+            print("3. Запустить/остановить профилирование (cProfile)")
+            print("4. Запустить/остановить трассировку памяти (tracemalloc)")
+            print("5. Назад")
+            choice = input("\nВведите ваш выбор (1-5): ")
+            
+            if choice == "1":
+                if metrics.enabled:
+                    instrumentation.disable()
+                else:
+                    instrumentation.enable()
+            elif choice == "2":
+                metrics.reset()
+            elif choice == "3":
+                if metrics.profiler.running:
+                    print(metrics.profiler.stop())
+                    input("\nНажмите Enter для продолжения...")
+                else:
+                    sample_every = input("Профилировать каждый N-й вызов (Enter - 100): ").strip()
+                    try:
+                        metrics.profiler.start(int(sample_every) if sample_every else 100)
+                        instrumentation.enable()
+                    except ValueError:
+                        print("Нужно положительное целое число!")
+                        input("\nНажмите Enter для продолжения...")
+            elif choice == "4":
+                if tracemalloc.is_tracing():
+                    for line in instrumentation.memory_top():
+                        print(line)
+                    instrumentation.stop_memory_tracing()
+                    input("\nНажмите Enter для продолжения...")
+                else:
+                    instrumentation.start_memory_tracing()
+            elif choice == "5":
+                return
+            else:
+                print("Неверный выбор!")
+                input("\nНажмите Enter для продолжения...")
+    
     def show_main_menu(self):
         """Главное меню"""
         while True:
@@ -270,9 +442,11 @@ class ConsoleGeometryCalculator:
             print("3. История расчетов")
             print("4. Статистика")
             print("5. Сохранить последний отчёт")
-            print("6. Выход")
+            print("6. Экспорт истории расчетов")
+            print("7. Диагностика")
+            print("8. Выход")
             
-            choice = input("\nВведите ваш выбор (1-6): ")
+            choice = input("\nВведите ваш выбор (1-8): ")
             
             if choice == "1":
                 self.run_calculation()
@@ -295,7 +469,17 @@ class ConsoleGeometryCalculator:
                     print("Нет результатов для сохранения!")
                     input("\nНажмите Enter для продолжения...")
             elif choice == "6":
+                self.export_history()
+            elif choice == "7":
+                self.show_diagnostics()
+            elif choice == "8":
                 print("\nСпасибо за использование калькулятора геометрических фигур!")
+                try:
+                    self.writer.close()
+                except Exception as e:
+                    print(f"Ошибка при сохранении в базу данных: {str(e)}")
+                finally:
+                    self.db.close()
                 break
             else:
                 print("Неверный выбор! Пожалуйста, попробуйте снова.")
@@ -332,6 +516,102 @@ class ConsoleGeometryCalculator:
             print(f"\nПроизошла ошибка: {str(e)}")
             input("\nНажмите Enter для продолжения...")
 
-if __name__ == "__main__":
+def positive_int(text):
+    """Тип аргумента argparse: целое больше нуля"""
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"ожидалось целое число: {text}")
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"значение должно быть положительным: {text}")
+    return value
+
+def non_negative_float(text):
+    """Тип аргумента argparse: неотрицательное число"""
+    try:
+        value = float(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"ожидалось число: {text}")
+    if not value >= 0:
+        raise argparse.ArgumentTypeError(f"значение не может быть отрицательным: {text}")
+    return value
+
+def build_parser():
+    """Аргументы командной строки; без подкоманды запускается интерактивное меню"""
+    parser = argparse.ArgumentParser(description="Калькулятор геометрических фигур")
+    parser.add_argument("--metrics", action="store_true",
+                        help="Включить сбор метрик горячих путей (см. меню Диагностика)")
+    parser.add_argument("--metrics-log", default=None,
+                        help="Писать события инструментированных вызовов в файл JSON Lines")
+    subparsers = parser.add_subparsers(dest="command")
+    
+    batch = subparsers.add_parser("batch", help="Пакетный расчет деталей из CSV/JSONL файла")
+    batch.add_argument("--in", dest="input", required=True, help="Входной файл .csv или .jsonl")
+    batch.add_argument("--out", dest="output", required=True, help="Выходной файл .csv или .jsonl")
+    batch.add_argument("--db", nargs="?", const="geometry_calculations.db", default=None,
+                       help="Дополнительно сохранить результаты в базу данных")
+    batch.add_argument("--chunk-size", type=positive_int, default=1000,
+                       help="Число строк, рассчитываемых и записываемых за раз")
+    batch.add_argument("--workers", type=positive_int, default=1,
+                       help="Число процессов для расчета (по умолчанию 1)")
+    batch.add_argument("--unordered", action="store_true",
+                       help="Писать результаты по мере готовности, а не в порядке входного файла")
+    batch.add_argument("--dedup", action="store_true",
+                       help="Схлопнуть одинаковые детали до расчета: одна строка со столбцом count")
+    batch.add_argument("--dedup-tolerance", type=non_negative_float, default=0.0,
+                       help="Шаг, с которым размеры считаются равными при --dedup (по умолчанию точно)")
+    
+    service = subparsers.add_parser("serve", help="HTTP/JSON сервис расчетов")
+    service.add_argument("--host", default="127.0.0.1", help="Адрес (по умолчанию 127.0.0.1)")
+    service.add_argument("--port", type=int, default=8080, help="Порт (по умолчанию 8080)")
+    service.add_argument("--db", default="geometry_calculations.db", help="Файл базы данных")
+    service.add_argument("--queue-size", type=positive_int, default=MAX_BATCH_PARTS,
+                         help="Сколько расчетов может ждать записи в базу")
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "batch":
+        if args.dedup and (args.workers > 1 or args.unordered):
+            # Схлопывание повторов идет в одном процессе и сохраняет порядок входа
+            parser.error("--workers и --unordered не сочетаются с --dedup")
+        if args.dedup_tolerance and not args.dedup:
+            parser.error("--dedup-tolerance задается только вместе с --dedup")
+        # До открытия выходного файла: иначе он был бы перезаписан впустую
+        try:
+            check_input(args.input)
+        except (ValueError, OSError) as e:
+            parser.error(str(e))
+    
+    if args.metrics or args.metrics_log:
+        sinks = [instrumentation.JsonLinesSink(args.metrics_log)] if args.metrics_log else []
+        instrumentation.enable(*sinks)
+    
+    if args.command == "batch":
+        db = GeometryDatabase(args.db) if args.db else None
+        try:
+            summary = run_batch(args.input, args.output, db, args.chunk_size,
+                                args.workers, not args.unordered, args.dedup, args.dedup_tolerance)
+        finally:
+            if db is not None:
+                db.close()
+        if args.dedup:
+            print(f"Деталей: {summary['parts']}, уникальных рассчитано: {summary['rows']}, "
+                  f"пропущено строк: {summary['errors']}")
+        else:
+            print(f"Рассчитано: {summary['rows']}, пропущено строк: {summary['errors']}")
+        return
+    
+    if args.command == "serve":
+        try:
+            asyncio.run(serve(args.host, args.port, args.db, args.queue_size))
+        except KeyboardInterrupt:
+            print("Сервис остановлен")
+        return
+    
     calculator = ConsoleGeometryCalculator()
-    calculator.show_main_menu()
\ No newline at end of file
+    calculator.show_main_menu()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
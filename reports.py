@@ -0,0 +1,178 @@
+"""Выгрузка истории расчетов в XLSX и DOCX.
+
+Обе выгрузки читают таблицу calculations курсором через
+GeometryDatabase.iter_calculations, поэтому память не растет с числом строк.
+XLSX пишется в потоковом режиме openpyxl (write_only): строка уходит во
+временный файл сразу после добавления. В DOCX вся история не помещается,
+поэтому туда попадают сводные таблицы, посчитанные на лету, и первые
+detail_rows расчетов.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+from docx import Document
+
+from database import GeometryDatabase, PARAMETER_COLUMNS
+from geometry_package.instrumentation import instrumented
+
+# Столбцы выгрузки: ключ расчета (или параметра) и заголовок
+EXPORT_COLUMNS = (
+    ('id', 'ID'),
+    ('created_at', 'Дата'),
+    ('shape_type', 'Тип фигуры'),
+    ('material', 'Материал'),
+    ('length', 'Длина, м'),
+    ('width', 'Ширина, м'),
+    ('height', 'Высота, м'),
+    ('edge', 'Ребро, м'),
+    ('radius', 'Радиус, м'),
+    ('volume', 'Объём, м³'),
+    ('surface_area', 'Площадь поверхности, м²'),
+    ('mass', 'Масса, кг')
+)
+
+# Ограничение Excel - 1 048 576 строк на лист, одна из них занята заголовком
+MAX_SHEET_ROWS = 1048575
+
+FILTER_TITLES = {
+    'shape_type': 'Тип фигуры',
+    'material': 'Материал',
+    'created_after': 'Не раньше',
+    'created_before': 'Раньше'
+}
+
+def export_row(calculation: Dict[str, Any]) -> list:
+    """Значения строки выгрузки в порядке EXPORT_COLUMNS"""
+    parameters = calculation['parameters'] if isinstance(calculation['parameters'], dict) else {}
+    return [parameters.get(key) if key in PARAMETER_COLUMNS else calculation[key]
+            for key, _ in EXPORT_COLUMNS]
+
+@instrumented('reports.export_xlsx', rows=int)
+def export_xlsx(db: GeometryDatabase, path: str, batch_size: int = 1000,
+                max_sheet_rows: int = MAX_SHEET_ROWS, **filters) -> int:
+    """Выгрузка расчетов в XLSX; возвращает число строк.
+    
+    filters - фильтры iter_calculations (shape_type, material, created_after,
+    created_before). Если строк больше max_sheet_rows, выгрузка продолжается
+    на следующих листах.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = None
+    sheet_rows = 0
+    total = 0
+    
+    for calculation in db.iter_calculations(batch_size, **filters):
+        if sheet is None or sheet_rows >= max_sheet_rows:
+            sheet = _create_sheet(workbook, len(workbook.worksheets) + 1)
+            sheet_rows = 0
+        sheet.append(export_row(calculation))
+        sheet_rows += 1
+        total += 1
+    
+    if sheet is None:
+        _create_sheet(workbook, 1)
+    workbook.save(path)
+    return total
+
+def _create_sheet(workbook: Workbook, number: int):
+    """Лист выгрузки с заголовком; в write_only режиме ширины задаются до строк"""
+    sheet = workbook.create_sheet('Расчеты' if number == 1 else f'Расчеты {number}')
+    for index, (_, title) in enumerate(EXPORT_COLUMNS, start=1):
+        sheet.column_dimensions[get_column_letter(index)].width = max(12, len(title) + 2)
+    sheet.freeze_panes = 'A2'
+    
+    header = []
+    for _, title in EXPORT_COLUMNS:
+        cell = WriteOnlyCell(sheet, value=title)
+        cell.font = Font(bold=True)
+        header.append(cell)
+    sheet.append(header)
+    return sheet
+
+class _Totals:
+    """Накопитель сводки по группе расчетов"""
+    
+    __slots__ = ('count', 'volume', 'mass')
+    
+    def __init__(self):
+        self.count = 0
+        self.volume = 0.0
+        self.mass = 0.0
+    
+    def add(self, calculation: Dict[str, Any]):
+        self.count += 1
+        self.volume += calculation['volume']
+        self.mass += calculation['mass']
+
+def _add_totals_table(document, title: str, groups: Dict[str, _Totals]):
+    document.add_heading(title, level=2)
+    table = document.add_table(rows=1, cols=5)
+    table.style = 'Table Grid'
+    for cell, text in zip(table.rows[0].cells,
+                          ('', 'Расчетов', 'Объём, м³', 'Масса, кг', 'Средняя масса, кг')):
+        cell.text = text
+    for name in sorted(groups):
+        totals = groups[name]
+        cells = table.add_row().cells
+        cells[0].text = name
+        cells[1].text = str(totals.count)
+        cells[2].text = f"{totals.volume:.6f}"
+        cells[3].text = f"{totals.mass:.2f}"
+        cells[4].text = f"{totals.mass / totals.count:.2f}"
+
+@instrumented('reports.export_docx', rows=int)
+def export_docx(db: GeometryDatabase, path: str, batch_size: int = 1000,
+                detail_rows: int = 100, **filters) -> int:
+    """Сводный отчет по расчетам в DOCX; возвращает число учтенных строк.
+    
+    Сводка по фигурам и материалам считается за один проход курсора,
+    подробная таблица содержит первые detail_rows расчетов выборки.
+    """
+    document = Document()
+    document.add_heading('ОТЧЁТ ПО РАСЧЁТАМ ГЕОМЕТРИЧЕСКИХ ФИГУР', level=1)
+    document.add_paragraph(f"Сформирован: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    for name, value in filters.items():
+        if value is not None:
+            document.add_paragraph(f"{FILTER_TITLES.get(name, name)}: {value}")
+    
+    overall = _Totals()
+    by_shape: Dict[str, _Totals] = {}
+    by_material: Dict[str, _Totals] = {}
+    detail: List[list] = []
+    
+    for calculation in db.iter_calculations(batch_size, **filters):
+        overall.add(calculation)
+        by_shape.setdefault(calculation['shape_type'], _Totals()).add(calculation)
+        by_material.setdefault(calculation['material'], _Totals()).add(calculation)
+        if len(detail) < detail_rows:
+            detail.append(export_row(calculation))
+    
+    document.add_paragraph(
+        f"Всего расчетов: {overall.count}, общий объём: {overall.volume:.6f} м³, "
+        f"общая масса: {overall.mass:.2f} кг")
+    if overall.count:
+        _add_totals_table(document, 'По типам фигур', by_shape)
+        _add_totals_table(document, 'По материалам', by_material)
+    if detail:
+        document.add_heading(f"Расчеты (первые {len(detail)} из {overall.count})", level=2)
+        table = document.add_table(rows=1, cols=len(EXPORT_COLUMNS))
+        table.style = 'Table Grid'
+        for cell, (_, title) in zip(table.rows[0].cells, EXPORT_COLUMNS):
+            cell.text = title
+        for row in detail:
+            for cell, value in zip(table.add_row().cells, row):
+                cell.text = _format_value(value)
+    
+    document.save(path)
+    return overall.count
+
+def _format_value(value: Optional[Any]) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        return f"{value:.6g}"
+    return str(value)
@@ -0,0 +1,304 @@
+"""HTTP/JSON сервис расчета фигур на asyncio без сторонних зависимостей.
+
+Точки входа:
+    POST /calculate        - расчет одной детали
+    POST /calculate/batch  - расчет списка деталей ({"parts": [...]} или список)
+    GET  /history          - страница истории (?after_id=&limit=)
+    GET  /statistics       - сводная статистика
+
+Деталь описывается так же, как в пакетном режиме: type, material и параметры;
+материал ищется и в справочнике базы (materials_for).
+Результаты не пишутся в базу в обработчике запроса: они по одному ставятся в
+ограниченную очередь, которую разбирает одна фоновая задача и сохраняет
+через save_calculations в отдельном потоке. Поэтому время ответа не зависит
+от фиксации транзакций SQLite, а при переполнении очереди запросы ждут
+места в ней (обратное давление) вместо неограниченного роста памяти.
+"""
+import asyncio
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from geometry_package.cache import ResultCache, default_cache
+from database import GeometryDatabase
+from batch_runner import part_to_shape, materials_for
+
+# Ограничения на размер запроса и число деталей в одном пакете
+MAX_HEADER_LINES = 100
+MAX_BODY_BYTES = 16 * 1024 * 1024
+MAX_BATCH_PARTS = 10000
+MAX_HISTORY_LIMIT = 500
+
+class HttpError(Exception):
+    """Ошибка запроса, которая возвращается клиенту с кодом status"""
+    
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+def _calculation(result: Dict[str, Any], parameters: Dict[str, float]) -> Dict[str, Any]:
+    """Ответ на расчет одной детали"""
+    calculation = dict(result)
+    calculation['parameters'] = parameters
+    return calculation
+
+class CalculationService:
+    """Сервис расчетов поверх geometry_package и GeometryDatabase.
+    
+    Запись в базу идет через очередь из queue_size расчетов, а не запросов:
+    пакет занимает в ней по месту на деталь, поэтому память ограничена при
+    любом размере пакетов. Фоновая задача забирает все накопившиеся записи
+    (но не больше write_chunk_size за раз) и сохраняет их одной транзакцией. flush() ждет, пока очередь опустеет,
+    stop() дописывает очередь до конца перед остановкой.
+    """
+    
+    def __init__(self, db: GeometryDatabase, cache: ResultCache = default_cache,
+                 queue_size: int = MAX_BATCH_PARTS, write_chunk_size: int = 1000):
+        if queue_size < 1 or write_chunk_size < 1:
+            raise ValueError("Размер очереди и части записи должны быть положительными")
+        self.db = db
+        self.cache = cache
+        self.queue_size = queue_size
+        self.write_chunk_size = write_chunk_size
+        self.saved = 0
+        self.write_errors = 0
+        self.materials = materials_for(db)
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        # Один поток записи: транзакции идут последовательно и не ждут друг друга на блокировке
+        self._write_executor = ThreadPoolExecutor(max_workers=1)
+        self._routes = {
+            '/calculate': ('POST', self.calculate),
+            '/calculate/batch': ('POST', self.calculate_batch),
+            '/history': ('GET', self.history),
+            '/statistics': ('GET', self.statistics)
+        }
+    
+    async def start(self, host: str = '127.0.0.1', port: int = 8080) -> Tuple[str, int]:
+        """Запуск сервера; возвращает фактические адрес и порт"""
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._writer_task = asyncio.ensure_future(self._write_loop())
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        return self._server.sockets[0].getsockname()[:2]
+    
+    async def serve_forever(self):
+        await self._server.serve_forever()
+    
+    async def flush(self):
+        """Ожидание записи в базу всех принятых расчетов"""
+        await self._queue.join()
+    
+    async def stop(self):
+        """Остановка приема соединений и дозапись очереди"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._queue is not None:
+            await self.flush()
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+            try:
+                await self._writer_task
+            except asyncio.CancelledError:
+                pass
+        self._write_executor.shutdown(wait=True)
+    
+    async def _enqueue(self, records: List[Tuple[Dict[str, Any], Dict[str, float]]]):
+        # Пакет больше свободного места ждет, пока фоновая задача разберет очередь
+        for record in records:
+            await self._queue.put(record)
+    
+    async def _write_loop(self):
+        """Фоновая запись очереди в базу частями"""
+        loop = asyncio.get_running_loop()
+        while True:
+            records = [await self._queue.get()]
+            while len(records) < self.write_chunk_size and not self._queue.empty():
+                records.append(self._queue.get_nowait())
+            try:
+                summary = await loop.run_in_executor(
+                    self._write_executor, self.db.save_calculations, records, self.write_chunk_size)
+                self.saved += summary['rows']
+            except Exception as e:
+                self.write_errors += 1
+                print(f"Ошибка записи в базу данных: {e}", file=sys.stderr)
+            finally:
+                for _ in records:
+                    self._queue.task_done()
+    
+    async def _refresh_materials(self, parts: List[Any]):
+        """Перечитывание справочника, если в деталях есть неизвестный материал:
+        его мог добавить другой процесс после запуска сервиса"""
+        names = {str(part.get('material', '')).lower() for part in parts if isinstance(part, dict)}
+        if not names <= self.materials.keys():
+            loop = asyncio.get_running_loop()
+            self.materials = await loop.run_in_executor(None, materials_for, self.db)
+    
+    async def calculate(self, body: Any, query: Dict[str, str]) -> Dict[str, Any]:
+        """POST /calculate"""
+        await self._refresh_materials([body])
+        try:
+            shape, parameters = part_to_shape(body, self.materials)
+        except (ValueError, TypeError) as e:
+            raise HttpError(400, str(e))
+        result = self.cache.calculate(shape)
+        await self._enqueue([(result, parameters)])
+        return _calculation(result, parameters)
+    
+    async def calculate_batch(self, body: Any, query: Dict[str, str]) -> Dict[str, Any]:
+        """POST /calculate/batch; некорректные детали перечисляются в errors"""
+        parts = body.get('parts') if isinstance(body, dict) else body
+        if not isinstance(parts, list):
+            raise HttpError(400, "Ожидается список деталей")
+        if len(parts) > MAX_BATCH_PARTS:
+            raise HttpError(413, f"Не больше {MAX_BATCH_PARTS} деталей в одном запросе")
+        
+        await self._refresh_materials(parts)
+        indexes, shapes, parameters, errors = [], [], [], []
+        for index, part in enumerate(parts):
+            try:
+                shape, shape_parameters = part_to_shape(part, self.materials)
+            except (ValueError, TypeError) as e:
+                errors.append({'index': index, 'error': str(e)})
+                continue
+            indexes.append(index)
+            shapes.append(shape)
+            parameters.append(shape_parameters)
+        
+        results = self.cache.calculate_many(shapes)
+        await self._enqueue(list(zip(results, parameters)))
+        return {
+            'results': [dict(_calculation(result, shape_parameters), index=index)
+                        for index, result, shape_parameters in zip(indexes, results, parameters)],
+            'errors': errors
+        }
+    
+    async def history(self, body: Any, query: Dict[str, str]) -> Dict[str, Any]:
+        """GET /history; next_after_id - курсор следующей страницы"""
+        try:
+            after_id = int(query['after_id']) if 'after_id' in query else None
+            limit = int(query.get('limit', 20))
+        except ValueError:
+            raise HttpError(400, "after_id и limit должны быть целыми числами")
+        if not 1 <= limit <= MAX_HISTORY_LIMIT:
+            raise HttpError(400, f"limit должен быть от 1 до {MAX_HISTORY_LIMIT}")
+        
+        loop = asyncio.get_running_loop()
+        page = await loop.run_in_executor(None, self.db.get_calculations_page, after_id, limit)
+        return {
+            'calculations': page,
+            'next_after_id': page[-1]['id'] if len(page) == limit else None
+        }
+    
+    async def statistics(self, body: Any, query: Dict[str, str]) -> Dict[str, Any]:
+        """GET /statistics; pending_writes - записи, еще не сохраненные в базу"""
+        loop = asyncio.get_running_loop()
+        statistics = await loop.run_in_executor(None, self.db.get_statistics)
+        statistics['pending_writes'] = self._queue.qsize()
+        return statistics
+    
+    async def _dispatch(self, method: str, target: str, body: bytes) -> Tuple[int, Any]:
+        url = urlsplit(target)
+        if url.path not in self._routes:
+            raise HttpError(404, f"Неизвестный путь: {url.path}")
+        expected_method, handler = self._routes[url.path]
+        if method != expected_method:
+            raise HttpError(405, f"Метод {method} не поддерживается для {url.path}")
+        
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        payload = None
+        if method == 'POST':
+            try:
+                payload = json.loads(body.decode('utf-8'))
+            except (UnicodeDecodeError, ValueError):
+                raise HttpError(400, "Тело запроса должно быть JSON")
+        return 200, await handler(payload, query)
+    
+    async def _read_request(self, reader: asyncio.StreamReader
+                            ) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        """Чтение одного запроса HTTP/1.1; None - клиент закрыл соединение"""
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, target, _ = request_line.decode('latin-1').split()
+        except ValueError:
+            raise HttpError(400, "Некорректная строка запроса")
+        
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise HttpError(400, "Слишком много заголовков")
+        
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise HttpError(400, "Некорректный Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HttpError(413, "Слишком большое тело запроса")
+        body = await reader.readexactly(length) if length > 0 else b''
+        return method.upper(), target, headers, body
+    
+    @staticmethod
+    def _write_response(writer: asyncio.StreamWriter, status: int, payload: Any, keep_alive: bool):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        head = (
+            f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode('latin-1') + body)
+    
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Обработка запросов одного соединения с поддержкой keep-alive"""
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HttpError as e:
+                    # После ошибки разбора граница следующего запроса неизвестна
+                    self._write_response(writer, e.status, {'error': str(e)}, False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                
+                method, target, headers, body = request
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                try:
+                    status, payload = await self._dispatch(method, target, body)
+                except HttpError as e:
+                    status, payload = e.status, {'error': str(e)}
+                except Exception as e:
+                    status, payload = 500, {'error': str(e)}
+                self._write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+async def serve(host: str = '127.0.0.1', port: int = 8080,
+                db_path: str = "geometry_calculations.db", queue_size: int = MAX_BATCH_PARTS):
+    """Запуск сервиса до прерывания; очередь записи дописывается при остановке"""
+    db = GeometryDatabase(db_path, wal=True)
+    service = CalculationService(db, queue_size=queue_size)
+    try:
+        host, port = await service.start(host, port)
+        print(f"Сервис расчетов запущен: http://{host}:{port}")
+        await service.serve_forever()
+    finally:
+        await service.stop()
+        db.close()
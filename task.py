@@ -1,3 +1,11 @@
+import math
+import sys
+
+import numpy as np
+
+# Машинная точность float: предел относительной точности метода Ньютона
+EPSILON = sys.float_info.epsilon
+
 def fast_multiply(m, n):
     result = 0
     while n > 0:
@@ -23,48 +31,235 @@ def fast_square(m):
     
     return result if m >= 0 else result
 
-def fast_power(base, exponent):
+# Размер окна по длине показателя в битах: больше окно - меньше умножений
+# при разборе показателя, но больше нечетных степеней в таблице
+WINDOW_SIZES = ((8, 1), (24, 2), (80, 3), (240, 4), (672, 5))
+MAX_WINDOW = 6
+
+def _window_size(exponent):
+    bits = exponent.bit_length()
+    for max_bits, window in WINDOW_SIZES:
+        if bits <= max_bits:
+            return window
+    return MAX_WINDOW
+
+def window_decomposition(exponent, window):
+    # Разбор показателя скользящим окном слева направо: список шагов
+    # (число возведений в квадрат, нечетная цифра окна или 0)
+    if exponent < 0:
+        raise ValueError("Показатель должен быть неотрицательным")
+    if window < 1:
+        raise ValueError("Размер окна должен быть положительным")
+    
+    bits = bin(exponent)[2:]
+    steps = []
+    squarings = 0
+    i = 0
+    while i < len(bits):
+        if bits[i] == '0':
+            squarings += 1
+            i += 1
+            continue
+        # Окно заканчивается на единице, поэтому его цифра нечетная
+        j = min(i + window, len(bits))
+        while bits[j - 1] == '0':
+            j -= 1
+        steps.append((squarings + j - i, int(bits[i:j], 2)))
+        squarings = 0
+        i = j
+    if squarings:
+        steps.append((squarings, 0))
+    return steps
+
+def _odd_powers(base, max_digit, mod):
+    # Таблица base, base**3, ..., base**max_digit (только нечетные степени)
+    table = [base % mod if mod is not None else base]
+    if max_digit > 1:
+        square = table[0] * table[0]
+        if mod is not None:
+            square %= mod
+        for _ in range(max_digit // 2):
+            value = table[-1] * square
+            table.append(value % mod if mod is not None else value)
+    return table
+
+def _apply_steps(table, steps, mod):
+    result = None
+    for squarings, digit in steps:
+        if result is None:
+            # Первый шаг начинается с единицы: возводить ее в квадрат незачем
+            result = table[digit // 2]
+            continue
+        for _ in range(squarings):
+            result *= result
+            if mod is not None:
+                result %= mod
+        if digit:
+            result *= table[digit // 2]
+            if mod is not None:
+                result %= mod
+    return result
+
+def _mod_inverse(base, mod):
+    # Обратный элемент по модулю расширенным алгоритмом Евклида
+    old_r, r = base % mod, mod
+    old_s, s = 1, 0
+    while r:
+        quotient = old_r // r
+        old_r, r = r, old_r - quotient * r
+        old_s, s = s, old_s - quotient * s
+    if old_r != 1:
+        raise ValueError("Основание необратимо по этому модулю")
+    return old_s % mod
+
+def _check_mod(mod):
+    if mod is not None and mod < 1:
+        raise ValueError("Модуль должен быть положительным")
+
+def fast_power(base, exponent, mod=None, window=None):
+    # Возведение в степень скользящим окном; с mod - по модулю на каждом шаге.
+    # window задает размер окна явно, по умолчанию он выбирается по длине показателя
+    _check_mod(mod)
+    if mod == 1:
+        return 0
     if exponent == 0:
         return 1
-    if exponent == 1:
-        return base
     
     # Для отрицательных степеней
     if exponent < 0:
-        return 1 / fast_power(base, -exponent)
+        if mod is not None:
+            return fast_power(_mod_inverse(base, mod), -exponent, mod, window)
+        return 1 / fast_power(base, -exponent, window=window)
     
-    result = 1
-    current = base
+    if exponent == 1:
+        return base % mod if mod is not None else base
     
-    while exponent > 0:
-        if exponent & 1:  # если степень нечетная
-            result *= current
-        current *= current  # возводим в квадрат
-        exponent >>= 1     # делим степень на 2
+    steps = window_decomposition(exponent, window or _window_size(exponent))
+    table = _odd_powers(base, max(digit for _, digit in steps), mod)
+    return _apply_steps(table, steps, mod)
+
+def fast_power_batch(bases, exponent, mod=None, window=None):
+    # Возведение многих оснований в одну степень: разбор показателя
+    # окнами выполняется один раз и используется для всех оснований
+    _check_mod(mod)
+    bases = list(bases)
+    if exponent <= 1 or mod == 1:
+        return [fast_power(base, exponent, mod, window) for base in bases]
     
-    return result
+    steps = window_decomposition(exponent, window or _window_size(exponent))
+    max_digit = max(digit for _, digit in steps)
+    return [_apply_steps(_odd_powers(base, max_digit, mod), steps, mod) for base in bases]
+
+def _root_seed(magnitude, n):
+    # Начальное приближение корня по двоичному порядку числа:
+    # log2(m * 2**e) ~ e + 2m - 2 для мантиссы m из [0.5, 1), ошибка не больше 0.09
+    mantissa, exponent = math.frexp(magnitude)
+    return 2.0 ** ((exponent + 2 * mantissa - 2) / n)
+
+def _integer_newton(number, n):
+    # Целочисленный метод Ньютона для number >= 2, n >= 2; возвращает корень
+    # и число итераций. Начальное приближение 2**ceil(bits / n) не меньше
+    # корня, поэтому последовательность убывает до нижней границы корня
+    x = 1 << -(-number.bit_length() // n)
+    iterations = 0
+    while True:
+        y = ((n - 1) * x + number // x ** (n - 1)) // n
+        iterations += 1
+        if y >= x:
+            return x, iterations
+        x = y
+
+def integer_nth_root(number, n):
+    # Точный целый корень: (floor(number ** (1/n)), корень извлекается нацело).
+    # Для отрицательных number при нечетном n корень округляется к нулю
+    if not isinstance(number, int) or not isinstance(n, int):
+        raise TypeError("Целочисленный корень определен только для целых чисел")
+    if n < 1:
+        raise ValueError("Степень корня должна быть положительной")
+    if number < 0:
+        if n % 2 == 0:
+            raise ValueError("Четный корень из отрицательного числа")
+        root, exact = integer_nth_root(-number, n)
+        return -root, exact
+    if number < 2 or n == 1:
+        return number, True
+    
+    root, _ = _integer_newton(number, n)
+    return root, root ** n == number
 
-def nth_root_newton(number, n, precision=1e-10):
+def nth_root_newton(number, n, precision=1e-10, exact=False):
+    # exact=True - точный режим для целых чисел любой длины, см. integer_nth_root
+    if exact:
+        return integer_nth_root(number, n)
     if number < 0 and n % 2 == 0:
         raise ValueError("Четный корень из отрицательного числа")
     if n == 0:
         raise ValueError("Нулевая степень корня")
+    if n < 0:
+        # Итерация для отрицательной степени переполняется: x ** (n - 1) уходит в 0
+        return 1 / nth_root_newton(number, -n, precision)
+    if number == 0:
+        return 0.0
     
-    if number >= 0:
-        x = number / n
-    else:
-        x = -abs(number) / n
+    # Приближение number / n для больших и малых чисел требовало сотен итераций
+    x = _root_seed(abs(number), n)
+    if number < 0:
+        x = -x
     
     while True:
         x_new = ((n - 1) * x + number / (x ** (n - 1))) / n
         
-        if abs(x_new - x) < precision:
+        # Точность относительная: абсолютная не подходит ни для корней порядка
+        # 1e100, ни для 1e-100; меньше погрешности float шаг не становится
+        if abs(x_new - x) <= max(precision, 4 * EPSILON) * abs(x_new):
             return x_new
         x = x_new
 
+def nth_root_newton_batch(numbers, n, precision=1e-10, max_iterations=100):
+    # Метод Ньютона сразу для массива чисел; возвращает корни и число итераций
+    # каждого элемента. Сошедшиеся элементы исключаются из дальнейших шагов маской
+    values = np.asarray(numbers, dtype=float)
+    if n == 0:
+        raise ValueError("Нулевая степень корня")
+    if n % 2 == 0 and np.any(values < 0):
+        raise ValueError("Четный корень из отрицательного числа")
+    if n < 0:
+        roots, iterations = nth_root_newton_batch(values, -n, precision, max_iterations)
+        with np.errstate(divide='ignore'):
+            return 1 / roots, iterations
+    
+    magnitude = np.abs(values)
+    mantissa, exponent = np.frexp(magnitude)
+    roots = np.copysign(np.exp2((exponent + 2 * mantissa - 2) / n), values)
+    iterations = np.zeros(values.shape, dtype=np.int64)
+    
+    # Ноль, бесконечность и NaN не уточняются: корень из них известен сразу
+    trivial = (magnitude == 0) | ~np.isfinite(values)
+    roots[trivial] = values[trivial]
+    active = np.flatnonzero(~trivial)
+    tolerance = max(precision, 4 * EPSILON)
+    
+    for _ in range(max_iterations):
+        if active.size == 0:
+            break
+        x = roots.flat[active]
+        x_new = ((n - 1) * x + values.flat[active] / (x ** (n - 1))) / n
+        step = np.abs(x_new - x)
+        roots.flat[active] = x_new
+        iterations.flat[active] += 1
+        converged = step <= tolerance * np.abs(x_new)
+        active = active[~converged]
+    
+    return roots, iterations
+
 
-print(fast_multiply(13, 17)) # 221
-print(fast_power(2, 10)) # 1024
-print(fast_power(3, 5)) # 243
-print(nth_root_newton(27, 3))
-print(nth_root_newton(16, 4))
\ No newline at end of file
+if __name__ == "__main__":
+    print(fast_multiply(13, 17)) # 221
+    print(fast_power(2, 10)) # 1024
+    print(fast_power(3, 5)) # 243
+    print(fast_power(3, 200, mod=1000)) # 1
+    print(fast_power_batch([2, 3, 5], 10)) # [1024, 59049, 9765625]
+    print(nth_root_newton(27, 3))
+    print(nth_root_newton(16, 4))
+    print(nth_root_newton_batch([27, 1e300, 1e-300], 3))
+    print(nth_root_newton(10 ** 600 + 1, 3, exact=True)) # (10**200, False)
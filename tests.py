@@ -1,11 +1,28 @@
 import pytest
+import asyncio
+import random
+import csv
+import json
 import math
+import sqlite3
+import numpy as np
 import sys
+import threading
+import time
 import os
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '.'))
 
-from geometry_package import Parallelepiped, Tetrahedron, Sphere, Steel, Aluminum, Copper
+from geometry_package import Parallelepiped, Tetrahedron, Sphere, Material, Steel, Aluminum, Copper, ShapeBatch, ShapeStore, ResultCache, ResultFile, ResultFileWriter, CompositeShape, deduplicate, TriangleMesh
+from geometry_package.mesh import read_stl, write_stl
+from database import GeometryDatabase, WriteBehindWriter
+from batch_runner import run_batch, part_to_shape
+from main import main
+from service import CalculationService
+from reports import export_xlsx, export_docx
+from geometry_package import instrumentation
+from geometry_package.instrumentation import metrics, instrumented, Histogram, JsonLinesSink
+from task import nth_root_newton, nth_root_newton_batch, fast_power, fast_power_batch, window_decomposition, integer_nth_root
 
 
 class TestShapeBasicProperties:
@@ -314,6 +331,1641 @@ class TestMaterialProperties:
             steel.density = 1000
 
 
+class TestShapeBatch:
+    """Тесты векторизованного пакета фигур"""
+    
+    def test_batch_matches_scalar_classes(self):
+        """Тест совпадения пакетных и скалярных расчетов"""
+        radii = [0.001, 0.5, 3, 1000]
+        batch = ShapeBatch('Sphere', radius=radii, density=Copper().density)
+        for i, r in enumerate(radii):
+            s = Sphere(r, Copper())
+            assert math.isclose(batch.volume[i], s.volume, rel_tol=1e-12)
+            assert math.isclose(batch.surface_area[i], s.surface_area, rel_tol=1e-12)
+            assert math.isclose(batch.mass[i], s.mass, rel_tol=1e-12)
+    
+    def test_batch_from_shapes(self):
+        """Тест сборки пакета из объектов фигур"""
+        shapes = [Parallelepiped(2, 3, 4, Steel()), Parallelepiped(1, 2, 3, Aluminum())]
+        batch = ShapeBatch.from_shapes(shapes)
+        assert len(batch) == 2
+        assert batch.volume.tolist() == [24.0, 6.0]
+        assert batch.surface_area.tolist() == [52.0, 22.0]
+        assert batch.mass.tolist() == [24.0 * 7850, 6.0 * 2700]
+    
+    def test_batch_to_dicts(self):
+        """Тест формата результатов пакета"""
+        t = Tetrahedron(3, Aluminum())
+        batch = ShapeBatch.from_shapes([t])
+        assert batch.to_dicts(['Алюминий']) == [t.to_dict()]
+    
+    def test_batch_without_density(self):
+        """Тест пакета без материала"""
+        batch = ShapeBatch('Tetrahedron', edge=[1, 2])
+        with pytest.raises(ValueError):
+            batch.mass
+        assert batch.to_dicts()[0]['mass'] is None
+    
+    def test_batch_validation(self):
+        """Тест проверки столбцов пакета"""
+        with pytest.raises(ValueError):
+            ShapeBatch('Cube', edge=[1])
+        with pytest.raises(ValueError):
+            ShapeBatch('Parallelepiped', length=[1], width=[1])
+        with pytest.raises(ValueError):
+            ShapeBatch('Parallelepiped', length=[1, 2], width=[1], height=[1])
+        with pytest.raises(TypeError):
+            ShapeBatch.from_shapes([Sphere(1), Tetrahedron(1)])
+
+
+class TestSlotsLayout:
+    """Тесты компактного представления объектов"""
+    
+    def test_shapes_have_no_instance_dict(self):
+        """Тест что фигуры и материалы не хранят __dict__"""
+        for obj in (Parallelepiped(1, 2, 3), Tetrahedron(1), Sphere(1), Steel(), Copper()):
+            assert not hasattr(obj, '__dict__')
+            with pytest.raises(AttributeError):
+                obj.extra = 1
+    
+    def test_lazy_cache_with_slots(self):
+        """Тест ленивого кэширования в слотах"""
+        s = Sphere(2, Steel())
+        assert s._volume is None
+        volume = s.volume
+        assert s._volume == volume
+        assert s.mass == volume * 7850.0
+
+
+class TestCompositeShape:
+    """Тесты сборок с накопленными итогами"""
+    
+    def test_totals_match_parts(self):
+        """Тест итогов сборки, вложенной сборки и удаления детали"""
+        ball = Sphere(0.5, Steel())
+        box = Parallelepiped(1, 2, 3, Aluminum())
+        inner = CompositeShape([Tetrahedron(2, Copper()), ball], name="Узел")
+        assembly = CompositeShape([box, inner])
+        
+        parts = [box, ball, *inner.children[:1]]
+        assert assembly.volume == pytest.approx(sum(part.volume for part in parts))
+        assert assembly.surface_area == pytest.approx(sum(part.surface_area for part in parts))
+        assert assembly.mass == pytest.approx(sum(part.mass for part in parts))
+        assert len(assembly) == 2 and ball in inner and ball not in assembly
+        
+        inner.remove(ball)
+        assert ball._parent is None
+        assert assembly.mass == pytest.approx(box.mass + inner.children[0].mass)
+        assert assembly.to_dict()['parts'] == 2
+    
+    def test_material_change_propagates(self):
+        """Тест пересчета массы всех сборок выше детали при смене материала"""
+        part = Sphere(1.0, Steel())
+        inner = CompositeShape([part])
+        assembly = CompositeShape([inner, Sphere(1.0, Steel())])
+        part.material = Copper()
+        assert inner.mass == pytest.approx(part.volume * 8960.0)
+        assert assembly.mass == pytest.approx(part.volume * (8960.0 + 7850.0))
+    
+    def test_parts_without_material(self):
+        """Тест сборки с деталями без материала"""
+        part = Sphere(1.0)
+        assembly = CompositeShape([part, Sphere(1.0, Steel())])
+        with pytest.raises(ValueError):
+            assembly.mass
+        assert assembly.to_dict()['mass'] is None
+        part.material = Steel()
+        assert assembly.mass == pytest.approx(2 * part.mass)
+    
+    def test_bulk_add(self):
+        """Тест добавления пакета деталей по столбцам параметров"""
+        radius = np.linspace(0.1, 1.0, 1000)
+        assembly = CompositeShape()
+        shapes = assembly.add_parameters('Sphere', Copper(), radius=radius)
+        assert len(assembly) == 1000 and shapes[0].radius == 0.1
+        assert assembly.volume == pytest.approx(math.fsum(Sphere(r).volume for r in radius))
+        assert assembly.mass == pytest.approx(math.fsum(Sphere(r, Copper()).mass for r in radius))
+        
+        assembly.remove(shapes[-1])
+        expected = assembly.mass
+        assembly.recalculate()
+        assert assembly.mass == pytest.approx(expected)
+    
+    def test_invalid_structure(self):
+        """Тест отказа для повторного добавления и циклов"""
+        part = Sphere(1.0, Steel())
+        inner = CompositeShape([part])
+        assembly = CompositeShape([inner])
+        with pytest.raises(ValueError):
+            CompositeShape([part])
+        with pytest.raises(ValueError):
+            inner.add(assembly)
+        with pytest.raises(ValueError):
+            assembly.remove(part)
+        with pytest.raises(TypeError):
+            assembly.material = Steel()
+        with pytest.raises(TypeError):
+            assembly.add(ShapeStore.from_columns('Sphere', np.zeros(1, dtype=np.int32), [Steel()],
+                                                 radius=[1.0])[0])
+    
+    def test_failed_extend_leaves_assembly_unchanged(self):
+        """Тест: при ошибке в конструкторе или extend детали не остаются присоединенными"""
+        taken = Sphere(1.0, Steel())
+        other = CompositeShape([taken])
+        first = Parallelepiped(1, 2, 3, Steel())
+        with pytest.raises(ValueError):
+            CompositeShape([first, taken])
+        assert CompositeShape([first]).volume == pytest.approx(6.0)
+        
+        assembly = CompositeShape([Sphere(0.5, Copper())])
+        volume = assembly.volume
+        extra = Tetrahedron(1.0, Steel())
+        with pytest.raises(ValueError):
+            assembly.extend([extra, taken])
+        with pytest.raises(ValueError):
+            assembly.extend([Sphere(2.0), assembly])
+        assert len(assembly) == 1 and extra not in assembly
+        assert assembly.volume == volume
+        assert taken in other
+        assembly.extend([extra])
+        assert assembly.volume == pytest.approx(volume + extra.volume)
+    
+    def test_assemblies_are_not_cached(self):
+        """Тест: разные сборки и изменения состава не берутся из кэша"""
+        cache = ResultCache()
+        assert cache.calculate(CompositeShape([Sphere(1, Steel())]))['volume'] == pytest.approx(4.1888)
+        assembly = CompositeShape([Parallelepiped(1, 2, 3, Steel())])
+        assert cache.calculate(assembly)['volume'] == pytest.approx(6.0)
+        assembly.add(Parallelepiped(1, 1, 1, Steel()))
+        assert [r['volume'] for r in cache.calculate_many([assembly, Sphere(1)])] == pytest.approx([7.0, 4.1888])
+        assert len(cache) == 1
+
+
+class TestShapeStore:
+    """Тесты столбцового хранилища фигур"""
+    
+    def test_store_views_behave_like_shapes(self):
+        """Тест что элементы хранилища ведут себя как фигуры"""
+        store = ShapeStore('Parallelepiped')
+        store.append(2, 3, 4, material=Steel())
+        view = store[0]
+        assert isinstance(view, Parallelepiped)
+        assert view == Parallelepiped(2, 3, 4)
+        assert view.to_dict() == Parallelepiped(2, 3, 4, Steel()).to_dict()
+    
+    def test_store_growth_and_extend(self):
+        """Тест роста хранилища"""
+        store = ShapeStore('Sphere', capacity=2)
+        for r in range(1, 6):
+            store.append(r)
+        store.extend(radius=[6, 7], material=Copper())
+        assert len(store) == 7
+        assert store.column('radius').tolist() == [1, 2, 3, 4, 5, 6, 7]
+        assert store[-1].material.name == "Медь"
+        assert store[0].material is None
+    
+    def test_store_slice_is_zero_copy(self):
+        """Тест что срез хранилища не копирует данные"""
+        store = ShapeStore.from_columns('Tetrahedron', edge=np.arange(1.0, 11.0))
+        sub = store[2:8:2]
+        assert len(sub) == 3
+        assert np.shares_memory(sub.column('edge'), store.column('edge'))
+        assert [t.edge for t in sub] == [3.0, 5.0, 7.0]
+        with pytest.raises(ValueError):
+            sub.append(1.0)
+    
+    def test_view_material_assignment_writes_to_store(self):
+        """Тест присвоения материала через представление"""
+        store = ShapeStore.from_shapes([Sphere(1), Sphere(2, Steel())])
+        store[0].material = Aluminum()
+        assert store[0].material.name == "Алюминий"
+        assert store.material_ids.tolist() == [1, 0]
+    
+    def test_store_batch_matches_views(self):
+        """Тест пакетного расчёта по столбцам хранилища"""
+        shapes = [Sphere(1, Steel()), Sphere(2), Sphere(3, Copper())]
+        batch = ShapeStore.from_shapes(shapes).batch()
+        assert batch.volume.tolist() == pytest.approx([s.volume for s in shapes])
+        assert batch.mass[0] == pytest.approx(shapes[0].mass)
+        assert math.isnan(batch.mass[1])
+
+
+class TestDatabaseBulkInsert:
+    """Тесты пакетной записи в базу данных"""
+    
+    def test_save_calculations_in_chunks(self, tmp_path):
+        """Тест записи потока расчетов частями"""
+        db = GeometryDatabase(str(tmp_path / "bulk.db"))
+        records = ((Sphere(r, Steel()).to_dict(), {'radius': r}) for r in range(1, 26))
+        report = db.save_calculations(records, chunk_size=10)
+        
+        assert report['rows'] == 25
+        assert report['rows_per_second'] > 0
+        assert db.get_statistics()['total_calculations'] == 25
+    
+    def test_save_calculations_empty_stream(self, tmp_path):
+        """Тест пустого потока"""
+        db = GeometryDatabase(str(tmp_path / "bulk.db"))
+        assert db.save_calculations([])['rows'] == 0
+        with pytest.raises(ValueError):
+            db.save_calculations([], chunk_size=0)
+
+
+class TestDatabaseConnection:
+    """Тесты долгоживущего соединения с базой"""
+    
+    def test_connection_is_reused(self, tmp_path):
+        """Тест повторного использования соединения"""
+        db = GeometryDatabase(str(tmp_path / "conn.db"))
+        conn = db.connection
+        db.save_calculation(Sphere(1, Steel()).to_dict(), {'radius': 1})
+        db.get_statistics()
+        assert db.connection is conn
+        db.close()
+    
+    def test_context_manager_closes_connection(self, tmp_path):
+        """Тест закрытия соединения при выходе из with"""
+        with GeometryDatabase(str(tmp_path / "conn.db")) as db:
+            db.save_calculation(Sphere(1, Steel()).to_dict(), {'radius': 1})
+        assert db._conn is None
+        # После закрытия соединение открывается заново по требованию
+        assert db.get_statistics()['total_calculations'] == 1
+        db.close()
+    
+    def test_tuned_pragmas(self, tmp_path):
+        """Тест включения WAL и настроек кэша"""
+        with GeometryDatabase(str(tmp_path / "wal.db"), wal=True,
+                              cache_size_kib=8192, mmap_size=1 << 20) as db:
+            conn = db.connection
+            assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+            assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1
+            assert conn.execute('PRAGMA cache_size').fetchone()[0] == -8192
+    
+    def test_default_journal_mode_unchanged(self, tmp_path):
+        """Тест что без настроек используется журнал по умолчанию"""
+        with GeometryDatabase(str(tmp_path / "plain.db")) as db:
+            assert db.connection.execute('PRAGMA journal_mode').fetchone()[0] == 'delete'
+
+
+class TestDatabaseStreamingReads:
+    """Тесты потокового и постраничного чтения истории"""
+    
+    @pytest.fixture
+    def db(self, tmp_path):
+        db = GeometryDatabase(str(tmp_path / "history.db"))
+        db.save_calculations((Sphere(r, Steel()).to_dict(), {'radius': r}) for r in range(1, 24))
+        yield db
+        db.close()
+    
+    def test_iter_calculations(self, db):
+        """Тест потокового чтения порциями"""
+        rows = list(db.iter_calculations(batch_size=5))
+        assert len(rows) == 23
+        assert [row['id'] for row in rows] == sorted(row['id'] for row in rows)
+        assert rows[0]['shape_type'] == 'Sphere'
+    
+    def test_keyset_pagination(self, db):
+        """Тест постраничного чтения по ключу"""
+        ids = []
+        after_id = None
+        while True:
+            page = db.get_calculations_page(after_id, limit=10)
+            if not page:
+                break
+            assert len(page) <= 10
+            ids.extend(row['id'] for row in page)
+            after_id = page[-1]['id']
+        
+        assert ids == sorted(ids, reverse=True)
+        assert len(ids) == 23
+        for limit in (0, -1):
+            with pytest.raises(ValueError):
+                db.get_calculations_page(limit=limit)
+    
+    def test_history_screen_pages(self, db, monkeypatch, capsys):
+        """Тест постраничного вывода истории в консоли"""
+        from main import ConsoleGeometryCalculator
+        
+        calculator = ConsoleGeometryCalculator.__new__(ConsoleGeometryCalculator)
+        calculator.db = db
+        calculator.writer = WriteBehindWriter(db)
+        calculator.history_page_size = 10
+        calculator.clear_screen = lambda: None
+        answers = iter(['', '', ''])
+        monkeypatch.setattr('builtins.input', lambda prompt='': next(answers))
+        
+        calculator.view_calculation_history()
+        calculator.writer.close()
+        
+        assert 'Показано расчетов: 23' in capsys.readouterr().out
+
+
+class TestDatabaseStatistics:
+    """Тесты сводной статистики"""
+    
+    def test_statistics_follow_inserts_and_deletes(self, tmp_path):
+        """Тест обновления статистики при записи и удалении"""
+        with GeometryDatabase(str(tmp_path / "stats.db")) as db:
+            db.save_calculation(Sphere(1, Steel()).to_dict(), {'radius': 1})
+            db.save_calculation(Sphere(2, Copper()).to_dict(), {'radius': 2})
+            db.save_calculation(Tetrahedron(1, Steel()).to_dict(), {'edge': 1})
+            
+            stats = db.get_statistics()
+            assert stats['total_calculations'] == 3
+            assert stats['unique_shapes'] == 2
+            assert stats['unique_materials'] == 2
+            assert stats['by_shape']['Sphere']['calculations'] == 2
+            assert stats['by_material']['Сталь']['calculations'] == 2
+            assert stats['last_calculation'] is not None
+            
+            db.connection.execute(
+                "DELETE FROM calculations WHERE material_id = (SELECT id FROM materials WHERE name = 'Медь')")
+            db.connection.commit()
+            
+            stats = db.get_statistics()
+            assert stats['total_calculations'] == 2
+            assert 'Медь' not in stats['by_material']
+            expected_mass = Sphere(1, Steel()).to_dict()['mass'] + Tetrahedron(1, Steel()).to_dict()['mass']
+            assert stats['total_mass'] == pytest.approx(expected_mass)
+    
+    def test_rebuild_statistics(self, tmp_path):
+        """Тест пересчета статистики с нуля"""
+        with GeometryDatabase(str(tmp_path / "stats.db")) as db:
+            db.save_calculations((Sphere(r, Steel()).to_dict(), {'radius': r}) for r in range(1, 6))
+            before = db.get_statistics()
+            db.connection.execute('DELETE FROM statistics_by_shape')
+            db.connection.commit()
+            
+            db.rebuild_statistics()
+            assert db.get_statistics() == before
+    
+    def test_statistics_for_existing_database(self, tmp_path):
+        """Тест заполнения статистики для базы, созданной без сводки"""
+        path = str(tmp_path / "old.db")
+        with GeometryDatabase(path) as db:
+            db.save_calculation(Sphere(1, Steel()).to_dict(), {'radius': 1})
+            db.connection.executescript('''
+                DROP TABLE statistics_summary;
+                DROP TABLE statistics_by_shape;
+                DROP TABLE statistics_by_material;
+            ''')
+        
+        with GeometryDatabase(path) as db:
+            stats = db.get_statistics()
+            assert stats['total_calculations'] == 1
+            assert stats['by_shape']['Sphere']['calculations'] == 1
+    
+    def test_empty_statistics(self, tmp_path):
+        """Тест статистики пустой базы"""
+        with GeometryDatabase(str(tmp_path / "empty.db")) as db:
+            stats = db.get_statistics()
+            assert stats['total_calculations'] == 0
+            assert stats['unique_shapes'] == 0
+            assert stats['last_calculation'] is None
+
+
+class TestTypedParameters:
+    """Тесты типизированного хранения параметров"""
+    
+    def test_parameters_stored_as_json(self, tmp_path):
+        """Тест хранения параметров в JSON и типизированных столбцах"""
+        with GeometryDatabase(str(tmp_path / "params.db")) as db:
+            db.save_calculation(Parallelepiped(2, 3, 4, Steel()).to_dict(),
+                                {'length': 2.0, 'width': 3.0, 'height': 4.0})
+            row = db.connection.execute(
+                'SELECT parameters, length, width, height, radius FROM calculations').fetchone()
+            assert json.loads(row[0]) == {'length': 2.0, 'width': 3.0, 'height': 4.0}
+            assert row[1:] == (2.0, 3.0, 4.0, None)
+            assert db.get_all_calculations()[0]['parameters']['height'] == 4.0
+    
+    def test_parameter_range_query_uses_index(self, tmp_path):
+        """Тест запроса по диапазону параметра через индекс"""
+        with GeometryDatabase(str(tmp_path / "params.db")) as db:
+            db.save_calculations((Sphere(r / 10, Steel()).to_dict(), {'radius': r / 10})
+                                 for r in range(1, 20))
+            db.save_calculation(Tetrahedron(0.6, Steel()).to_dict(), {'edge': 0.6})
+            
+            rows = db.get_calculations_by_parameter('Sphere', 'radius', 0.5, 0.8)
+            assert [row['parameters']['radius'] for row in rows] == [0.5, 0.6, 0.7, 0.8]
+            
+            plan = db.connection.execute(
+                'EXPLAIN QUERY PLAN SELECT id FROM calculations '
+                'WHERE shape_type = ? AND radius BETWEEN ? AND ?', ('Sphere', 0.5, 0.8)).fetchall()
+            assert 'idx_calculations_radius' in plan[0][3]
+            
+            with pytest.raises(ValueError):
+                db.get_calculations_by_parameter('Sphere', 'volume; DROP TABLE calculations')
+    
+    def test_migration_of_repr_parameters(self, tmp_path):
+        """Тест миграции базы со старым форматом str(dict)"""
+        path = str(tmp_path / "legacy.db")
+        conn = sqlite3.connect(path)
+        conn.execute('''
+            CREATE TABLE calculations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                shape_type TEXT NOT NULL,
+                volume REAL NOT NULL,
+                surface_area REAL NOT NULL,
+                mass REAL NOT NULL,
+                material TEXT NOT NULL,
+                parameters TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.execute(
+            'INSERT INTO calculations (shape_type, volume, surface_area, mass, material, parameters) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            ('Sphere', 0.5236, 3.1416, 4110.1767, 'Сталь', str({'radius': 0.5})))
+        conn.commit()
+        conn.close()
+        
+        with GeometryDatabase(path) as db:
+            calculation = db.get_all_calculations()[0]
+            assert calculation['parameters'] == {'radius': 0.5}
+            assert db.get_calculations_by_parameter('Sphere', 'radius', 0.4, 0.6)[0]['id'] == calculation['id']
+            assert db.get_statistics()['total_calculations'] == 1
+            assert db.connection.execute('PRAGMA user_version').fetchone()[0] >= 1
+            assert db.connection.execute('SELECT content_key FROM calculations').fetchone()[0]
+
+
+class TestQueryCalculations:
+    """Тесты выборки расчетов с фильтрами, сортировкой и top-k"""
+    
+    @pytest.fixture
+    def db(self, tmp_path):
+        db = GeometryDatabase(str(tmp_path / "query.db"))
+        materials = [Steel(), Aluminum(), Copper()]
+        calculations = []
+        for i in range(60):
+            size = 0.1 + i / 100
+            if i % 2:
+                shape, parameters = Sphere(size, materials[i % 3]), {'radius': size}
+            else:
+                shape = Parallelepiped(1, 1, size, materials[i % 3])
+                parameters = {'length': 1, 'width': 1, 'height': size}
+            calculations.append((shape.to_dict(), parameters))
+        db.save_calculations(calculations)
+        # Даты расчетов разносим по дням, чтобы проверить окно по created_at
+        db.connection.execute(
+            "UPDATE calculations SET created_at = datetime('2024-05-01', '+' || (id % 10) || ' days')")
+        db.connection.commit()
+        yield db
+        db.close()
+    
+    def test_top_k_heaviest(self, db):
+        """Тест top-k самых тяжелых медных деталей за период"""
+        rows = db.query_calculations(material='Медь', created_after='2024-05-04',
+                                     created_before='2024-05-09', order_by='mass', limit=5)
+        expected = sorted((row for row in db.get_all_calculations()
+                           if row['material'] == 'Медь' and '2024-05-04' <= row['created_at'] < '2024-05-09'),
+                          key=lambda row: (row['mass'], row['id']), reverse=True)[:5]
+        assert [row['id'] for row in rows] == [row['id'] for row in expected]
+        assert len(rows) == 5
+    
+    def test_range_filters_and_order(self, db):
+        """Тест диапазонов объема и массы и сортировки по возрастанию"""
+        rows = db.query_calculations(shape_type='Sphere', min_volume=0.1, max_volume=0.5,
+                                     min_mass=1000, order_by='volume', descending=False)
+        assert rows
+        assert all(row['shape_type'] == 'Sphere' and 0.1 <= row['volume'] <= 0.5
+                   and row['mass'] >= 1000 for row in rows)
+        assert [row['volume'] for row in rows] == sorted(row['volume'] for row in rows)
+        assert len(db.query_calculations()) == 60
+    
+    def test_invalid_arguments(self, db):
+        """Тест отказа для сортировки вне списка и неверного limit"""
+        with pytest.raises(ValueError):
+            db.query_calculations(order_by='mass; DROP TABLE calculations')
+        with pytest.raises(ValueError):
+            db.query_calculations(limit=0)
+        with pytest.raises(TypeError):
+            db.query_calculations(color='red')
+    
+    def test_query_plans_use_indexes(self, db):
+        """Тест планов запросов: поиск по индексу без сортировки во временном дереве"""
+        plan = db.explain_query(material='Медь', created_after='2024-05-04', order_by='mass', limit=50)
+        assert any('idx_calculations_material_mass' in step for step in plan)
+        assert not any('TEMP B-TREE' in step for step in plan)
+        
+        plan = db.explain_query(shape_type='Sphere', min_volume=0.1, order_by='volume')
+        assert any('idx_calculations_shape_volume' in step for step in plan)
+        assert not any('TEMP B-TREE' in step for step in plan)
+        
+        plan = db.explain_query(limit=20)
+        assert any('idx_calculations_created_at' in step for step in plan)
+        assert not any('TEMP B-TREE' in step for step in plan)
+
+
+class TestMaterialRegistry:
+    """Тесты справочника материалов"""
+    
+    def test_interned_lookup(self, tmp_path):
+        """Тест общих объектов материалов и поиска по названию и id"""
+        with GeometryDatabase(str(tmp_path / "materials.db")) as db:
+            steel = db.materials['Сталь']
+            assert isinstance(steel, Steel)
+            assert db.materials[db.materials.id_of(steel)] is steel
+            assert db.materials.id_of('Сталь') == db.materials.id_of(Steel())
+            assert [material.name for material in db.materials] == ['Сталь', 'Алюминий', 'Медь']
+            assert 'Титан' not in db.materials
+            with pytest.raises(KeyError):
+                db.materials['Титан']
+    
+    def test_custom_material_persisted(self, tmp_path):
+        """Тест сохранения нового материала в базе"""
+        path = str(tmp_path / "materials.db")
+        with GeometryDatabase(path) as db:
+            titanium = db.materials.register('Титан', 4500.0)
+            assert db.materials.register('Титан', 4500.0) is titanium
+            with pytest.raises(ValueError):
+                db.materials.register('Титан', 4000.0)
+            with pytest.raises(ValueError):
+                db.materials.register('Пена', 0)
+            db.save_calculation(Sphere(1, titanium).to_dict(), {'radius': 1})
+        
+        with GeometryDatabase(path) as db:
+            assert db.materials['Титан'].density == 4500.0
+            assert db.get_all_calculations()[0]['material'] == 'Титан'
+            assert db.get_statistics()['by_material']['Титан']['calculations'] == 1
+    
+    def test_calculations_store_material_id(self, tmp_path):
+        """Тест хранения id материала и фильтра по названию"""
+        with GeometryDatabase(str(tmp_path / "materials.db")) as db:
+            db.save_calculation(Sphere(1, Copper()).to_dict(), {'radius': 1})
+            db.save_calculation(Sphere(1, Material('Латунь', 8500.0)).to_dict(), {'radius': 1})
+            row = db.connection.execute('SELECT material_id FROM calculations ORDER BY id').fetchall()
+            assert row == [(db.materials.id_of('Медь'),), (db.materials.id_of('Латунь'),)]
+            assert db.materials['Латунь'].density == pytest.approx(8500.0, rel=1e-4)
+            assert [c['material'] for c in db.query_calculations(material='Медь')] == ['Медь']
+            assert db.query_calculations(material='Титан') == []
+            columns = {info[1] for info in db.connection.execute('PRAGMA table_info(calculations)')}
+            assert 'material' not in columns
+    
+    def test_migration_from_material_names(self, tmp_path):
+        """Тест переноса названий материалов в id, включая неизвестный справочнику"""
+        path = str(tmp_path / "legacy.db")
+        conn = sqlite3.connect(path)
+        conn.execute('''
+            CREATE TABLE calculations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                shape_type TEXT NOT NULL,
+                volume REAL NOT NULL,
+                surface_area REAL NOT NULL,
+                mass REAL NOT NULL,
+                material TEXT NOT NULL,
+                parameters TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.executemany(
+            'INSERT INTO calculations (shape_type, volume, surface_area, mass, material, parameters) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            [('Sphere', 2.0, 3.0, 9000.0, 'Титан', str({'radius': 0.78})),
+             ('Sphere', 1.0, 3.0, 7850.0, 'Сталь', str({'radius': 0.62}))])
+        conn.commit()
+        conn.close()
+        
+        with GeometryDatabase(path) as db:
+            assert db.connection.execute('PRAGMA user_version').fetchone()[0] == 3
+            assert db.materials['Титан'].density == 4500.0
+            assert sorted(c['material'] for c in db.get_all_calculations()) == ['Сталь', 'Титан']
+            stats = db.get_statistics()
+            assert stats['by_material']['Титан']['total_mass'] == 9000.0
+            assert stats['by_material']['Сталь']['calculations'] == 1
+            db.save_calculation(Sphere(1, Steel()).to_dict(), {'radius': 1})
+            assert db.get_statistics()['by_material']['Сталь']['calculations'] == 2
+            assert db.get_all_calculations()[0]['id'] == 3
+    
+    def test_migration_leaves_unknown_density_unset(self, tmp_path):
+        """Тест: материал только с нулевыми объемами переносится без плотности"""
+        path = str(tmp_path / "legacy.db")
+        conn = sqlite3.connect(path)
+        conn.executescript('''
+            CREATE TABLE materials (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT UNIQUE NOT NULL,
+                density REAL NOT NULL
+            );
+            INSERT INTO materials (name, density) VALUES ('Сталь', 7850.0);
+            CREATE TABLE calculations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                shape_type TEXT NOT NULL,
+                volume REAL NOT NULL,
+                surface_area REAL NOT NULL,
+                mass REAL NOT NULL,
+                material TEXT NOT NULL,
+                parameters TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            INSERT INTO calculations (shape_type, volume, surface_area, mass, material, parameters)
+            VALUES ('Sphere', 0.0, 0.0, 0.0, 'Пустота', '{}');
+        ''')
+        conn.close()
+        
+        with GeometryDatabase(path) as db:
+            assert db.materials['Пустота'].density is None
+            assert [material.name for material in db.materials] == ['Сталь', 'Алюминий', 'Медь']
+            assert db.get_all_calculations()[0]['material'] == 'Пустота'
+            assert db.get_statistics()['by_material']['Пустота']['calculations'] == 1
+            foam = db.materials.register('Пустота', 30.0)
+            assert foam.density == 30.0 and 'Пустота' in [material.name for material in db.materials]
+        
+        with GeometryDatabase(path) as db:
+            assert db.materials['Пустота'].density == 30.0
+
+
+class TestResultCache:
+    """Тесты общего кэша результатов"""
+    
+    def test_equal_shapes_share_result(self):
+        """Тест что одинаковые фигуры считаются один раз"""
+        cache = ResultCache()
+        first = cache.calculate(Sphere(0.5, Steel()))
+        second = cache.calculate(Sphere(0.5, Steel()))
+        third = cache.calculate(Sphere(0.5, Copper()))
+        
+        assert first == second == Sphere(0.5, Steel()).to_dict()
+        assert third['material'] == 'Медь'
+        assert cache.stats['hits'] == 1
+        assert cache.stats['misses'] == 2
+    
+    def test_lru_eviction(self):
+        """Тест вытеснения давно неиспользованных записей"""
+        cache = ResultCache(maxsize=2)
+        cache.calculate(Sphere(1))
+        cache.calculate(Sphere(2))
+        cache.calculate(Sphere(1))
+        cache.calculate(Sphere(3))
+        
+        assert cache.stats['evictions'] == 1
+        assert cache.get(ResultCache.key_for(Sphere(1))) is not None
+        assert cache.get(ResultCache.key_for(Sphere(2))) is None
+    
+    def test_calculate_many_matches_to_dict(self):
+        """Тест пакетного расчета через кэш"""
+        cache = ResultCache()
+        shapes = [Sphere(1, Steel()), Tetrahedron(2, Aluminum()), Sphere(1, Steel()),
+                  Parallelepiped(2, 3, 4, Copper()), Sphere(2)]
+        results = cache.calculate_many(shapes)
+        
+        assert results == [shape.to_dict() for shape in shapes]
+        assert len(cache) == 4
+        assert cache.calculate_many(shapes[:1]) == [shapes[0].to_dict()]
+        assert cache.stats['hits'] == 1
+    
+    def test_cached_result_is_not_shared_mutable(self):
+        """Тест что изменение результата не портит кэш"""
+        cache = ResultCache()
+        result = cache.calculate(Sphere(1, Steel()))
+        result['volume'] = -1
+        assert cache.calculate(Sphere(1, Steel()))['volume'] > 0
+    
+    def test_database_skip_duplicates(self, tmp_path):
+        """Тест пропуска повторных расчетов в базе"""
+        with GeometryDatabase(str(tmp_path / "dedup.db"), skip_duplicates=True) as db:
+            data = Sphere(1, Steel()).to_dict()
+            assert db.save_calculation(data, {'radius': 1.0}) is True
+            assert db.save_calculation(data, {'radius': 1}) is False
+            
+            records = [(data, {'radius': 1.0}), (Sphere(2, Steel()).to_dict(), {'radius': 2.0})] * 3
+            report = db.save_calculations(records)
+            assert report['rows'] == 1
+            assert report['skipped'] == 5
+            assert db.get_statistics()['total_calculations'] == 2
+        
+        with GeometryDatabase(str(tmp_path / "dedup.db")) as db:
+            db.save_calculation(data, {'radius': 1.0})
+            assert db.get_statistics()['total_calculations'] == 3
+
+
+class TestBatchMode:
+    """Тесты неинтерактивного пакетного режима"""
+    
+    def test_batch_jsonl_to_csv_with_database(self, tmp_path):
+        """Тест расчета JSONL файла с записью в CSV и базу"""
+        parts = tmp_path / "parts.jsonl"
+        parts.write_text(
+            '{"type": "Sphere", "radius": 0.5, "material": "steel"}\n'
+            '{"type": "Cube", "edge": 1, "material": "Сталь"}\n'
+            '{"type": "Parallelepiped", "length": 2, "width": 3, "height": 4, "material": "Медь"}\n',
+            encoding='utf-8')
+        output = tmp_path / "results.csv"
+        
+        with GeometryDatabase(str(tmp_path / "batch.db")) as db:
+            summary = run_batch(str(parts), str(output), db, chunk_size=2)
+            assert db.get_statistics()['total_calculations'] == 2
+        
+        assert summary == {'rows': 2, 'errors': 1}
+        with open(output, encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+        assert [row['line'] for row in rows] == ['1', '3']
+        assert float(rows[1]['mass']) == Parallelepiped(2, 3, 4, Copper()).to_dict()['mass']
+        assert rows[0]['material'] == 'Сталь'
+    
+    def test_batch_csv_to_jsonl(self, tmp_path):
+        """Тест расчета CSV файла с записью в JSONL"""
+        parts = tmp_path / "parts.csv"
+        parts.write_text('type,material,edge,radius\nTetrahedron,Aluminum,2,\nSphere,Медь,,1\n',
+                         encoding='utf-8')
+        output = tmp_path / "results.jsonl"
+        
+        main(['batch', '--in', str(parts), '--out', str(output)])
+        
+        results = [json.loads(line) for line in output.read_text(encoding='utf-8').splitlines()]
+        assert results[0]['volume'] == Tetrahedron(2, Aluminum()).to_dict()['volume']
+        assert results[1]['mass'] == Sphere(1, Copper()).to_dict()['mass']
+    
+    def test_part_validation(self):
+        """Тест проверки описания детали"""
+        with pytest.raises(ValueError):
+            part_to_shape({'type': 'Sphere', 'material': 'Сталь'})
+        with pytest.raises(ValueError):
+            part_to_shape({'type': 'Sphere', 'radius': -1, 'material': 'Сталь'})
+        with pytest.raises(ValueError):
+            part_to_shape({'type': 'Sphere', 'radius': 1, 'material': 'Золото'})
+    
+    def test_parallel_batch_matches_sequential(self, tmp_path):
+        """Тест расчета в пуле процессов"""
+        parts = tmp_path / "parts.jsonl"
+        lines = [json.dumps({'type': 'Sphere', 'radius': r / 10, 'material': 'Сталь'}) for r in range(1, 40)]
+        lines.insert(7, '{not json')
+        lines.insert(20, '[1, 2]')
+        parts.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+        
+        sequential = tmp_path / "sequential.jsonl"
+        ordered = tmp_path / "ordered.jsonl"
+        unordered = tmp_path / "unordered.jsonl"
+        assert run_batch(str(parts), str(sequential), chunk_size=5) == {'rows': 39, 'errors': 2}
+        assert run_batch(str(parts), str(ordered), chunk_size=5, workers=2) == {'rows': 39, 'errors': 2}
+        run_batch(str(parts), str(unordered), chunk_size=5, workers=2, ordered=False)
+        
+        expected = sequential.read_text(encoding='utf-8').splitlines()
+        assert ordered.read_text(encoding='utf-8').splitlines() == expected
+        assert sorted(unordered.read_text(encoding='utf-8').splitlines()) == sorted(expected)
+    
+    def test_batch_checks_before_writing_output(self, tmp_path):
+        """Тест: размер части и входной файл проверяются до перезаписи выходного"""
+        parts = tmp_path / "parts.jsonl"
+        parts.write_text('{"type": "Sphere", "radius": 0.5, "material": "steel"}\n', encoding='utf-8')
+        output = tmp_path / "results.csv"
+        output.write_text('старые результаты', encoding='utf-8')
+        
+        for chunk_size in ('0', '-5', 'x'):
+            with pytest.raises(SystemExit):
+                main(['batch', '--in', str(parts), '--out', str(output), '--chunk-size', chunk_size])
+        for workers in ('0', '-3'):
+            with pytest.raises(SystemExit):
+                main(['batch', '--in', str(parts), '--out', str(output), '--workers', workers])
+        with pytest.raises(ValueError):
+            run_batch(str(parts), str(output), workers=0)
+        for path in (tmp_path / "parts.txt", tmp_path / "missing.jsonl"):
+            with pytest.raises(SystemExit):
+                main(['batch', '--in', str(path), '--out', str(output)])
+        with pytest.raises(ValueError):
+            run_batch(str(parts), str(output), chunk_size=0)
+        with pytest.raises(ValueError):
+            run_batch(str(tmp_path / "parts.txt"), str(output))
+        with pytest.raises(FileNotFoundError):
+            run_batch(str(tmp_path / "missing.csv"), str(output))
+        assert output.read_text(encoding='utf-8') == 'старые результаты'
+    
+    def test_batch_uses_database_materials(self, tmp_path):
+        """Тест: с базой детали могут ссылаться на материалы справочника"""
+        parts = tmp_path / "parts.jsonl"
+        parts.write_text(''.join(json.dumps({'type': 'Sphere', 'radius': radius, 'material': 'титан'}) + '\n'
+                                 for radius in (1, 2, 3)), encoding='utf-8')
+        output = tmp_path / "results.jsonl"
+        
+        assert run_batch(str(parts), str(output)) == {'rows': 0, 'errors': 3}
+        with GeometryDatabase(str(tmp_path / "batch.db")) as db:
+            titanium = db.materials.register("Титан", 4500.0)
+            for workers in (1, 2):
+                assert run_batch(str(parts), str(output), db, workers=workers) == {'rows': 3, 'errors': 0}
+                results = [json.loads(line) for line in output.read_text(encoding='utf-8').splitlines()]
+                assert [row['mass'] for row in results] == [Sphere(r, titanium).to_dict()['mass'] for r in (1, 2, 3)]
+            assert db.get_statistics()['by_material'].keys() == {'Титан'}
+
+
+class TestShapeHashing:
+    """Тесты хеширования фигур и схлопывания повторов"""
+    
+    def test_equal_shapes_hash_equal(self):
+        """Тест согласованности __hash__ с __eq__ и работы в множествах"""
+        assert hash(Sphere(1)) == hash(Sphere(1.0, Steel()))
+        assert hash(Parallelepiped(1, 2, 3)) == hash(Parallelepiped(1.0, 2.0, 3.0))
+        shapes = {Sphere(1), Sphere(1.0), Sphere(2), Tetrahedron(1), Parallelepiped(1, 2, 3)}
+        assert len(shapes) == 4
+        assert {Tetrahedron(2): 'ребро 2'}[Tetrahedron(2.0)] == 'ребро 2'
+        assert len({CompositeShape(), CompositeShape()}) == 2
+    
+    def test_canonical_key_tolerance(self):
+        """Тест квантования параметров в ключе"""
+        assert Sphere(1.0).canonical_key() != Sphere(1.0 + 1e-12).canonical_key()
+        assert Sphere(1.0).canonical_key(1e-6) == Sphere(1.0 + 1e-12).canonical_key(1e-6)
+        assert Sphere(1.0).canonical_key(1e-6) != Sphere(1.1).canonical_key(1e-6)
+        assert Parallelepiped(1, 2, 3).canonical_key()[0] == 'Parallelepiped'
+    
+    def test_deduplicate_counts(self):
+        """Тест схлопывания потока в пары (первое вхождение, число)"""
+        steel, copper = Steel(), Copper()
+        first = Sphere(1, steel)
+        stream = [first, Sphere(1, copper), Sphere(1.0, steel), Tetrahedron(1, steel),
+                  Sphere(1 + 1e-12, steel)]
+        pairs = list(deduplicate(stream))
+        assert [count for _, count in pairs] == [2, 1, 1, 1]
+        assert pairs[0][0] is first
+        assert [count for _, count in deduplicate(stream, tolerance=1e-9)] == [3, 1, 1]
+        assert [count for _, count in deduplicate(stream, window=2)] == [1, 1, 1, 1, 1]
+        with pytest.raises(ValueError):
+            list(deduplicate(stream, window=0))
+    
+    def test_deduplicate_keeps_assemblies_apart(self):
+        """Тест: разные сборки с одинаковым составом не схлопываются"""
+        first = CompositeShape([Sphere(1, Steel())])
+        second = CompositeShape([Sphere(1, Steel())])
+        assert [count for _, count in deduplicate([first, second, first])] == [2, 1]
+        assert first.canonical_key(1e-3) != second.canonical_key(1e-3)
+    
+    def test_batch_dedup(self, tmp_path):
+        """Тест пакетного режима с --dedup"""
+        parts = tmp_path / "parts.jsonl"
+        lines = ['{"type": "Sphere", "radius": 0.5, "material": "steel"}'] * 5
+        lines += ['{"type": "Sphere", "radius": 0.5, "material": "copper"}',
+                  '{"type": "Cube", "edge": 1, "material": "steel"}',
+                  '{"type": "Tetrahedron", "edge": 1, "material": "steel"}'] * 2
+        parts.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+        output = tmp_path / "results.csv"
+        
+        with GeometryDatabase(str(tmp_path / "batch.db")) as db:
+            summary = run_batch(str(parts), str(output), db, chunk_size=2, dedup=True)
+            statistics = db.get_statistics()
+            assert statistics['total_calculations'] == 9
+            assert statistics['by_material']['Сталь']['calculations'] == 7
+        
+        assert summary == {'rows': 3, 'errors': 2, 'parts': 9}
+        with open(output, encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+        assert [(row['line'], row['material'], row['count']) for row in rows] == [
+            ('1', 'Сталь', '5'), ('6', 'Медь', '2'), ('8', 'Сталь', '2')]
+    
+    def test_batch_dedup_rejects_invalid_options(self, tmp_path, capsys):
+        """Тест проверки параметров --dedup до создания выходного файла"""
+        parts = tmp_path / "parts.jsonl"
+        parts.write_text('{"type": "Sphere", "radius": 0.5, "material": "steel"}\n', encoding='utf-8')
+        output = tmp_path / "results.csv"
+        base = ['batch', '--in', str(parts), '--out', str(output), '--dedup']
+        
+        for extra in (['--dedup-tolerance', '-1'], ['--workers', '2'], ['--unordered']):
+            with pytest.raises(SystemExit):
+                main(base + extra)
+        with pytest.raises(ValueError):
+            run_batch(str(parts), str(output), dedup=True, tolerance=-1.0)
+        with pytest.raises(ValueError):
+            run_batch(str(parts), str(output), dedup=True, workers=2)
+        assert not output.exists()
+        assert '--dedup' in capsys.readouterr().err
+
+
+
+class TestCalculationService:
+    """Тесты HTTP/JSON сервиса расчетов"""
+    
+    @staticmethod
+    async def request(port, method, path, payload=None):
+        """Один запрос к сервису; возвращает код ответа и JSON"""
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+        response = await reader.read()
+        writer.close()
+        head, _, body = response.partition(b'\r\n\r\n')
+        return int(head.split()[1]), json.loads(body)
+    
+    def run_with_service(self, tmp_path, scenario):
+        async def run():
+            db = GeometryDatabase(str(tmp_path / "service.db"))
+            service = CalculationService(db, cache=ResultCache(), queue_size=2)
+            _, port = await service.start('127.0.0.1', 0)
+            try:
+                return await scenario(service, port)
+            finally:
+                await service.stop()
+                db.close()
+        return asyncio.run(run())
+    
+    def test_calculate_and_history(self, tmp_path):
+        """Тест расчета, записи через очередь и чтения истории"""
+        async def scenario(service, port):
+            status, result = await self.request(port, 'POST', '/calculate',
+                                                {'type': 'Sphere', 'radius': 1, 'material': 'Сталь'})
+            assert status == 200
+            assert result['mass'] == Sphere(1, Steel()).to_dict()['mass']
+            assert result['parameters'] == {'radius': 1.0}
+            
+            status, batch = await self.request(port, 'POST', '/calculate/batch', {'parts': [
+                {'type': 'Tetrahedron', 'edge': 2, 'material': 'aluminum'},
+                {'type': 'Sphere', 'radius': -1, 'material': 'Сталь'},
+                {'type': 'Parallelepiped', 'length': 1, 'width': 2, 'height': 3, 'material': 'Медь'}
+            ]})
+            assert status == 200
+            assert [result['index'] for result in batch['results']] == [0, 2]
+            assert [error['index'] for error in batch['errors']] == [1]
+            
+            await service.flush()
+            status, page = await self.request(port, 'GET', '/history?limit=2')
+            assert [row['shape_type'] for row in page['calculations']] == ['Parallelepiped', 'Tetrahedron']
+            status, page = await self.request(port, 'GET', f"/history?limit=2&after_id={page['next_after_id']}")
+            assert [row['shape_type'] for row in page['calculations']] == ['Sphere']
+            assert page['next_after_id'] is None
+            
+            status, statistics = await self.request(port, 'GET', '/statistics')
+            assert statistics['total_calculations'] == 3
+            assert statistics['pending_writes'] == 0
+        
+        self.run_with_service(tmp_path, scenario)
+    
+    def test_errors(self, tmp_path):
+        """Тест ответов на некорректные запросы"""
+        async def scenario(service, port):
+            assert (await self.request(port, 'GET', '/unknown'))[0] == 404
+            assert (await self.request(port, 'GET', '/calculate'))[0] == 405
+            assert (await self.request(port, 'POST', '/calculate', {'type': 'Cube'}))[0] == 400
+            assert (await self.request(port, 'POST', '/calculate/batch', {'parts': 1}))[0] == 400
+            assert (await self.request(port, 'GET', '/history?limit=abc'))[0] == 400
+        
+        self.run_with_service(tmp_path, scenario)
+    
+    def test_database_materials(self, tmp_path):
+        """Тест: материал, добавленный в справочник после запуска, доступен сервису"""
+        async def scenario(service, port):
+            part = {'type': 'Sphere', 'radius': 1, 'material': 'Титан'}
+            assert (await self.request(port, 'POST', '/calculate', part))[0] == 400
+            with GeometryDatabase(str(tmp_path / "service.db")) as other:
+                titanium = other.materials.register("Титан", 4500.0)
+            
+            status, result = await self.request(port, 'POST', '/calculate', part)
+            assert status == 200
+            assert result['mass'] == Sphere(1, titanium).to_dict()['mass']
+            status, batch = await self.request(port, 'POST', '/calculate/batch', [part, dict(part, radius=2)])
+            assert status == 200 and not batch['errors']
+            
+            await service.flush()
+            status, page = await self.request(port, 'GET', '/history')
+            assert [row['material'] for row in page['calculations']] == ['Титан'] * 3
+        
+        self.run_with_service(tmp_path, scenario)
+    
+    def test_queued_writes_are_flushed_on_stop(self, tmp_path):
+        """Тест дозаписи очереди при остановке сервиса"""
+        async def scenario(service, port):
+            for radius in range(1, 11):
+                await self.request(port, 'POST', '/calculate',
+                                   {'type': 'Sphere', 'radius': radius, 'material': 'Медь'})
+        
+        self.run_with_service(tmp_path, scenario)
+        with GeometryDatabase(str(tmp_path / "service.db")) as db:
+            assert db.get_statistics()['total_calculations'] == 10
+    
+    def test_queue_is_bounded_in_records(self, tmp_path):
+        """Тест: пакет больше очереди записывается, в очереди не больше queue_size расчетов"""
+        async def scenario(service, port):
+            sizes = []
+            put = service._queue.put
+            
+            async def tracked_put(record):
+                await put(record)
+                sizes.append(service._queue.qsize())
+            service._queue.put = tracked_put
+            
+            parts = [{'type': 'Sphere', 'radius': radius, 'material': 'Медь'} for radius in range(1, 8)]
+            status, batch = await self.request(port, 'POST', '/calculate/batch', parts)
+            assert status == 200 and len(batch['results']) == 7
+            await service.flush()
+            assert len(sizes) == 7 and max(sizes) <= 2
+            assert service.saved == 7
+        
+        self.run_with_service(tmp_path, scenario)
+
+
+class TestWriteBehindWriter:
+    """Тесты отложенной записи расчетов"""
+    
+    @staticmethod
+    def wait_for(condition, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+    
+    @staticmethod
+    def calculation(radius):
+        return Sphere(radius, Steel()).to_dict(), {'radius': radius}
+    
+    def test_commit_by_size(self, tmp_path):
+        """Тест фиксации при наборе max_batch записей"""
+        with GeometryDatabase(str(tmp_path / "writer.db")) as db:
+            with WriteBehindWriter(db, max_batch=3, max_delay=60) as writer:
+                for radius in (1, 2, 3, 4):
+                    writer.put(*self.calculation(radius))
+                assert self.wait_for(lambda: writer.committed == 3)
+                assert db.get_statistics()['total_calculations'] == 3
+            assert db.get_statistics()['total_calculations'] == 4
+    
+    def test_commit_by_time(self, tmp_path):
+        """Тест фиксации по истечении max_delay"""
+        with GeometryDatabase(str(tmp_path / "writer.db")) as db:
+            with WriteBehindWriter(db, max_batch=1000, max_delay=0.05) as writer:
+                writer.put(*self.calculation(1))
+                assert self.wait_for(lambda: writer.committed == 1)
+    
+    def test_flush_and_close(self, tmp_path):
+        """Тест flush() и запрета записи после close()"""
+        with GeometryDatabase(str(tmp_path / "writer.db")) as db:
+            writer = WriteBehindWriter(db, max_batch=1000, max_delay=60)
+            for radius in range(1, 101):
+                writer.put(*self.calculation(radius))
+            assert writer.flush() is True
+            assert db.get_statistics()['total_calculations'] == 100
+            writer.close()
+            writer.close()
+            with pytest.raises(RuntimeError):
+                writer.put(*self.calculation(1))
+    
+    def test_write_error_is_raised_from_flush(self, tmp_path, monkeypatch):
+        """Тест передачи ошибки фиксации в flush()"""
+        with GeometryDatabase(str(tmp_path / "writer.db")) as db:
+            save_rows = db._save_rows
+            failures = iter([sqlite3.OperationalError("database is locked")])
+            
+            def failing_save_rows(rows, chunk_size):
+                for error in failures:
+                    raise error
+                return save_rows(rows, chunk_size)
+            monkeypatch.setattr(db, '_save_rows', failing_save_rows)
+            
+            with WriteBehindWriter(db) as writer:
+                writer.put(*self.calculation(1))
+                with pytest.raises(sqlite3.OperationalError):
+                    writer.flush()
+                writer.put(*self.calculation(2))
+                assert writer.flush() is True
+            assert db.get_statistics()['total_calculations'] == 1
+    
+    def test_invalid_record_rejected_by_put(self, tmp_path):
+        """Тест: некорректный расчет отклоняется в put() и не срывает запись соседних"""
+        with GeometryDatabase(str(tmp_path / "writer.db")) as db:
+            with WriteBehindWriter(db) as writer:
+                writer.put(*self.calculation(1))
+                with pytest.raises(KeyError):
+                    writer.put({'type': 'Sphere'}, {'radius': 1})
+                with pytest.raises(ValueError):
+                    writer.put(dict(self.calculation(2)[0], material=None), {'radius': 2})
+                writer.put(*self.calculation(3))
+                assert writer.flush() is True
+                assert writer.committed == 2
+    
+    def test_flush_timeout_with_full_queue(self, tmp_path, monkeypatch):
+        """Тест: flush(timeout) не ждет дольше timeout места в полной очереди"""
+        with GeometryDatabase(str(tmp_path / "writer.db")) as db:
+            release = threading.Event()
+            save_rows = db._save_rows
+            
+            def blocked_save_rows(rows, chunk_size):
+                release.wait(5)
+                return save_rows(rows, chunk_size)
+            monkeypatch.setattr(db, '_save_rows', blocked_save_rows)
+            
+            writer = WriteBehindWriter(db, max_batch=1, queue_size=1)
+            writer.put(*self.calculation(1))
+            assert self.wait_for(lambda: writer.pending == 0)
+            writer.put(*self.calculation(2))
+            start = time.monotonic()
+            assert writer.flush(timeout=0.1) is False
+            assert time.monotonic() - start < 1.0
+            release.set()
+            assert writer.flush() is True
+            writer.close()
+            assert writer.committed == 2
+    
+    def test_console_reports_queued_save_and_write_error(self, tmp_path, monkeypatch, capsys):
+        """Тест: консоль сообщает о постановке в очередь и об ошибках записи, в том числе при выходе"""
+        from main import ConsoleGeometryCalculator
+        
+        db = GeometryDatabase(str(tmp_path / "writer.db"))
+        calculator = ConsoleGeometryCalculator.__new__(ConsoleGeometryCalculator)
+        calculator.db = db
+        calculator.writer = WriteBehindWriter(db)
+        calculator.clear_screen = lambda: None
+        calculator.save_to_database(*self.calculation(1))
+        calculator.save_to_database({'type': 'Sphere'}, {'radius': 1})
+        out = capsys.readouterr().out
+        assert 'поставлен в очередь' in out
+        assert 'Ошибка при сохранении в базу данных' in out
+        
+        def failing_save_rows(rows, chunk_size):
+            raise sqlite3.OperationalError("disk I/O error")
+        monkeypatch.setattr(db, '_save_rows', failing_save_rows)
+        calculator.save_to_database(*self.calculation(2))
+        calculator.flush_writes()
+        assert 'disk I/O error' in capsys.readouterr().out
+        
+        calculator.save_to_database(*self.calculation(3))
+        monkeypatch.setattr('builtins.input', lambda prompt='': '8')
+        calculator.show_main_menu()
+        assert 'disk I/O error' in capsys.readouterr().out
+        assert db._conn is None
+
+
+class TestReports:
+    """Тесты выгрузки истории в XLSX и DOCX"""
+    
+    @pytest.fixture
+    def db(self, tmp_path):
+        database = GeometryDatabase(str(tmp_path / "reports.db"))
+        calculations = [(Sphere(r, Steel()).to_dict(), {'radius': r}) for r in range(1, 6)]
+        calculations += [(Tetrahedron(e, Copper()).to_dict(), {'edge': e}) for e in range(1, 4)]
+        database.save_calculations(calculations)
+        yield database
+        database.close()
+    
+    def test_filtered_iteration(self, db):
+        """Тест фильтров iter_calculations"""
+        assert len(list(db.iter_calculations(shape_type='Sphere'))) == 5
+        assert len(list(db.iter_calculations(material='Медь', batch_size=2))) == 3
+        assert list(db.iter_calculations(shape_type='Sphere', material='Медь')) == []
+        assert len(list(db.iter_calculations(created_after='2000-01-01'))) == 8
+        assert list(db.iter_calculations(created_before='2000-01-01')) == []
+    
+    def test_export_xlsx(self, db, tmp_path):
+        """Тест выгрузки в XLSX с разбиением на листы"""
+        from openpyxl import load_workbook
+        
+        path = tmp_path / "history.xlsx"
+        assert export_xlsx(db, str(path), batch_size=3, max_sheet_rows=3) == 8
+        
+        workbook = load_workbook(path, read_only=True)
+        assert workbook.sheetnames == ['Расчеты', 'Расчеты 2', 'Расчеты 3']
+        rows = [row for sheet in workbook for row in sheet.iter_rows(min_row=2, values_only=True)]
+        assert len(rows) == 8
+        assert rows[0][2:4] == ('Sphere', 'Сталь')
+        assert rows[0][8] == 1
+        assert rows[0][-1] == Sphere(1, Steel()).to_dict()['mass']
+        workbook.close()
+        
+        path = tmp_path / "tetrahedra.xlsx"
+        assert export_xlsx(db, str(path), shape_type='Tetrahedron') == 3
+        assert export_xlsx(db, str(path), shape_type='Cube') == 0
+        assert load_workbook(path).sheetnames == ['Расчеты']
+    
+    def test_export_docx(self, db, tmp_path):
+        """Тест сводного отчета в DOCX"""
+        from docx import Document
+        
+        path = tmp_path / "history.docx"
+        assert export_docx(db, str(path), detail_rows=2) == 8
+        
+        document = Document(str(path))
+        by_shape, by_material, detail = document.tables
+        assert [row.cells[0].text for row in by_shape.rows[1:]] == ['Sphere', 'Tetrahedron']
+        assert by_shape.rows[1].cells[1].text == '5'
+        assert [row.cells[0].text for row in by_material.rows[1:]] == ['Медь', 'Сталь']
+        assert len(detail.rows) == 3
+        
+        assert export_docx(db, str(path), material='Медь') == 3
+        assert 'Материал: Медь' in [p.text for p in Document(str(path)).paragraphs]
+
+
+class TestResultFile:
+    """Тесты двоичного файла результатов"""
+    
+    def test_write_and_map(self, tmp_path):
+        """Тест записи и чтения через memmap"""
+        path = str(tmp_path / "results.bin")
+        shapes = [Sphere(1, Steel()), Tetrahedron(2, Copper()), Parallelepiped(1, 2, 3), Sphere(3, Steel())]
+        with ResultFileWriter(path, chunk_size=3) as writer:
+            for index, shape in enumerate(shapes, start=1):
+                writer.append(shape.to_dict(), shape.parameters, id=index)
+        
+        with ResultFile(path) as results:
+            assert len(results) == 4
+            assert isinstance(results.records, np.memmap)
+            volumes = results.column('volume')
+            assert np.shares_memory(volumes, results.records)
+            assert volumes.tolist() == [shape.to_dict()['volume'] for shape in shapes]
+            assert results[1:3]['id'].tolist() == [2, 3]
+            assert math.isnan(results[0]['edge'])
+            assert results.mask(shape_type='Sphere').tolist() == [True, False, False, True]
+            assert results.mask(material='Медь').tolist() == [False, True, False, False]
+            assert results.column('material_id')[2] == -1
+            
+            calculations = list(results.iter_calculations(batch_size=3))
+        
+        assert [data for data, _ in calculations] == [shape.to_dict() for shape in shapes]
+        assert [parameters for _, parameters in calculations] == [shape.parameters for shape in shapes]
+        with ResultFile(path) as results:
+            assert [m['name'] for m in results.materials] == ['Сталь', 'Медь']
+            assert [m['density'] for m in results.materials] == pytest.approx([7850.0, 8960.0], rel=1e-4)
+    
+    def test_failed_write_removes_file(self, tmp_path, monkeypatch):
+        """Тест: прерванная выгрузка не оставляет файл, похожий на полный"""
+        path = tmp_path / "results.bin"
+        with pytest.raises(RuntimeError):
+            with ResultFileWriter(str(path)) as writer:
+                writer.append(Sphere(1, Steel()).to_dict(), {'radius': 1})
+                raise RuntimeError("прервано")
+        assert not path.exists()
+        
+        def failing_write_records(self, records):
+            raise OSError("No space left on device")
+        monkeypatch.setattr(ResultFileWriter, 'write_records', failing_write_records)
+        with GeometryDatabase(str(tmp_path / "source.db")) as db:
+            db.save_calculation(Sphere(1, Steel()).to_dict(), {'radius': 1})
+            with pytest.raises(OSError):
+                db.export_results(str(path))
+        assert not path.exists()
+    
+    def test_database_round_trip(self, tmp_path):
+        """Тест выгрузки из базы и загрузки в другую базу"""
+        path = str(tmp_path / "results.bin")
+        calculations = [(Sphere(r, Steel()).to_dict(), {'radius': r}) for r in (0.5, 1.0, 1.5)]
+        calculations.append((Parallelepiped(1, 2, 3, Copper()).to_dict(),
+                             {'length': 1, 'width': 2, 'height': 3}))
+        
+        with GeometryDatabase(str(tmp_path / "source.db")) as source:
+            source.save_calculations(calculations)
+            assert source.export_results(path, batch_size=3) == 4
+            rows = list(source.iter_calculations())
+        
+        with ResultFile(path) as results:
+            assert results.column('id').tolist() == [row['id'] for row in rows]
+            assert results.materials == [{'name': 'Сталь', 'density': 7850.0},
+                                         {'name': 'Медь', 'density': 8960.0}]
+        
+        with GeometryDatabase(str(tmp_path / "target.db")) as target:
+            assert target.import_results(path)['rows'] == 4
+            copied = list(target.iter_calculations())
+        keys = ('shape_type', 'volume', 'surface_area', 'mass', 'material', 'parameters')
+        assert [[row[key] for key in keys] for row in copied] == [[row[key] for key in keys] for row in rows]
+    
+    def test_filtered_export_and_validation(self, tmp_path):
+        """Тест выгрузки с фильтром, пустого файла и проверки формата"""
+        path = str(tmp_path / "results.bin")
+        with GeometryDatabase(str(tmp_path / "source.db")) as db:
+            db.save_calculation(Sphere(1, Steel()).to_dict(), {'radius': 1})
+            assert db.export_results(path, shape_type='Tetrahedron') == 0
+            with ResultFile(path) as results:
+                assert len(results) == 0
+                assert list(results.iter_calculations()) == []
+        
+        (tmp_path / "bad.bin").write_bytes(b'not a result file' * 10)
+        with pytest.raises(ValueError):
+            ResultFile(str(tmp_path / "bad.bin"))
+
+
+class TestNthRoot:
+    """Тесты корня n-й степени методом Ньютона"""
+    
+    def test_wide_range_of_magnitudes(self):
+        """Тест точности и числа итераций от 1e-300 до 1e300"""
+        numbers = np.logspace(-300, 300, 2001)
+        for n in (2, 3, 5, -3):
+            roots, iterations = nth_root_newton_batch(numbers, n)
+            np.testing.assert_allclose(roots, numbers ** (1 / n), rtol=1e-12)
+            assert iterations.max() <= 6
+            for number in numbers[::250]:
+                assert math.isclose(nth_root_newton(float(number), n), number ** (1 / n), rel_tol=1e-12)
+    
+    def test_special_values(self):
+        """Тест отрицательных чисел, нуля, бесконечности и NaN"""
+        assert nth_root_newton(27, 3) == pytest.approx(3.0)
+        assert nth_root_newton(-27, 3) == pytest.approx(-3.0)
+        assert nth_root_newton(0, 4) == 0.0
+        
+        roots, iterations = nth_root_newton_batch([[-8.0, 0.0], [np.inf, np.nan]], 3)
+        assert roots.shape == (2, 2)
+        assert roots[0, 0] == pytest.approx(-2.0)
+        assert roots[0, 1] == 0.0 and roots[1, 0] == np.inf and np.isnan(roots[1, 1])
+        assert iterations[1].tolist() == [0, 0]
+    
+    def test_invalid_arguments(self):
+        """Тест ошибок для четного корня из отрицательного числа и n = 0"""
+        with pytest.raises(ValueError):
+            nth_root_newton(-4, 2)
+        with pytest.raises(ValueError):
+            nth_root_newton_batch([4.0, -4.0], 2)
+        with pytest.raises(ValueError):
+            nth_root_newton_batch([4.0], 0)
+
+
+class TestFastPower:
+    """Тесты возведения в степень скользящим окном"""
+    
+    def test_matches_builtin_pow(self):
+        """Тест совпадения с pow на случайных числах"""
+        rng = random.Random(17)
+        for _ in range(500):
+            base = rng.randrange(-10**40, 10**40)
+            exponent = rng.randrange(0, 2000)
+            mod = rng.choice([None, rng.randrange(1, 10**50)])
+            window = rng.choice([None, 1, 2, 3, 5, 8])
+            expected = pow(base, exponent, mod) if mod is not None else base ** exponent
+            assert fast_power(base, exponent, mod, window) == expected
+    
+    def test_negative_exponents(self):
+        """Тест отрицательных степеней с модулем и без"""
+        assert fast_power(3, -2, 7) == pow(3, -2, 7)
+        assert fast_power(2, -3) == 0.125
+        with pytest.raises(ValueError):
+            fast_power(6, -1, 9)
+        with pytest.raises(ValueError):
+            fast_power(2, 5, 0)
+    
+    def test_window_decomposition(self):
+        """Тест разбора показателя на окна"""
+        # 0b1011_0001 окнами по 3 бита: 101, 1, 000, 1
+        assert window_decomposition(0b10110001, 3) == [(3, 5), (1, 1), (4, 1)]
+        for exponent in range(1, 300):
+            for window in (1, 2, 4):
+                value = 0
+                for squarings, digit in window_decomposition(exponent, window):
+                    assert digit == 0 or digit % 2 == 1
+                    value = (value << squarings) + digit
+                assert value == exponent
+    
+    def test_batch(self):
+        """Тест пакетного возведения многих оснований в одну степень"""
+        rng = random.Random(5)
+        mod = rng.getrandbits(256) | 1
+        bases = [rng.getrandbits(256) for _ in range(20)]
+        exponent = rng.getrandbits(300)
+        assert fast_power_batch(bases, exponent, mod) == [pow(b, exponent, mod) for b in bases]
+        assert fast_power_batch([2, 3], 0) == [1, 1]
+        assert fast_power_batch([2, 4], -1) == [0.5, 0.25]
+
+
+class TestIntegerNthRoot:
+    """Тесты точного целочисленного корня"""
+    
+    def test_floor_property(self):
+        """Тест свойства root**n <= number < (root + 1)**n на случайных числах"""
+        rng = random.Random(23)
+        for _ in range(1000):
+            number = rng.getrandbits(rng.randrange(1, 4000))
+            n = rng.randrange(1, 40)
+            root, exact = integer_nth_root(number, n)
+            assert root ** n <= number < (root + 1) ** n
+            assert exact == (root ** n == number)
+    
+    def test_perfect_powers(self):
+        """Тест точных степеней и соседних с ними чисел"""
+        rng = random.Random(29)
+        for _ in range(200):
+            root = rng.getrandbits(rng.randrange(1, 2000))
+            n = rng.randrange(2, 12)
+            power = root ** n
+            assert integer_nth_root(power, n) == (root, True)
+            if root > 1:
+                assert integer_nth_root(power - 1, n) == (root - 1, False)
+            assert integer_nth_root(power + 1, n) == (root, power + 1 == (root + 1) ** n)
+    
+    def test_edge_cases(self):
+        """Тест малых, отрицательных чисел и неверных аргументов"""
+        assert integer_nth_root(0, 5) == (0, True)
+        assert integer_nth_root(1, 5) == (1, True)
+        assert integer_nth_root(17, 1) == (17, True)
+        assert integer_nth_root(-27, 3) == (-3, True)
+        assert integer_nth_root(-30, 3) == (-3, False)
+        assert nth_root_newton(10 ** 600, 3, exact=True) == (10 ** 200, True)
+        with pytest.raises(ValueError):
+            integer_nth_root(-16, 4)
+        with pytest.raises(ValueError):
+            integer_nth_root(16, 0)
+        with pytest.raises(TypeError):
+            integer_nth_root(16.0, 2)
+
+
+class TestInstrumentation:
+    """Тесты необязательного сбора метрик"""
+    
+    @pytest.fixture(autouse=True)
+    def clean_metrics(self):
+        metrics.reset()
+        yield
+        instrumentation.disable()
+        metrics.reset()
+    
+    def test_disabled_by_default(self, tmp_path):
+        """Тест отсутствия учета при выключенных метриках"""
+        db = GeometryDatabase(str(tmp_path / "test.db"))
+        Sphere(1.0, Steel()).volume
+        db.save_calculation(Sphere(1.0, Steel()).to_dict(), {'radius': 1.0})
+        db.close()
+        assert metrics.snapshot() == {'counters': {}, 'latency': {}}
+    
+    def test_shape_cache_hits(self):
+        """Тест счетчиков вычислений и попаданий в кэш свойств фигур"""
+        instrumentation.enable()
+        shape = Sphere(1.0, Steel())
+        shape.volume
+        shape.volume
+        shape.mass
+        shape.surface_area
+        assert metrics.counter('shape.Sphere.volume.computed') == 1
+        assert metrics.counter('shape.Sphere.volume.cached') == 2
+        assert metrics.counter('shape.Sphere.surface_area.computed') == 1
+        assert metrics.counter('shape.Sphere.surface_area.cached') == 0
+    
+    def test_database_calls_and_rows(self, tmp_path):
+        """Тест числа вызовов, строк и гистограмм времени методов базы"""
+        instrumentation.enable()
+        db = GeometryDatabase(str(tmp_path / "test.db"))
+        shapes = [Sphere(0.5 + i, Steel()) for i in range(5)]
+        db.save_calculation(shapes[0].to_dict(), {'radius': shapes[0].radius})
+        db.save_calculations((shape.to_dict(), {'radius': shape.radius}) for shape in shapes[1:])
+        assert len(db.get_calculations_page(limit=3)) == 3
+        assert sum(1 for _ in db.iter_calculations(batch_size=2)) == 5
+        db.close()
+        
+        assert metrics.counter('database.save_calculation.calls') == 1
+        assert metrics.counter('database.save_calculation.rows') == 1
+        assert metrics.counter('database.save_calculations.rows') == 4
+        assert metrics.counter('database.get_calculations_page.rows') == 3
+        assert metrics.counter('database.iter_calculations.calls') == 1
+        assert metrics.counter('database.iter_calculations.rows') == 5
+        latency = metrics.snapshot()['latency']['database.save_calculations']
+        assert latency['count'] == 1
+        assert latency['total'] > 0
+    
+    def test_errors_and_sinks(self, tmp_path):
+        """Тест учета ошибок и передачи событий в приемник JSON Lines"""
+        path = tmp_path / "events.jsonl"
+        sink = JsonLinesSink(str(path))
+        instrumentation.enable(sink)
+        
+        @instrumented('test.failing')
+        def failing():
+            raise RuntimeError("сбой")
+        
+        with pytest.raises(RuntimeError):
+            failing()
+        metrics.remove_sink(sink)
+        sink.close()
+        
+        assert metrics.counter('test.failing.errors') == 1
+        events = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+        assert len(events) == 1
+        assert events[0]['name'] == 'test.failing'
+        assert 'сбой' in events[0]['error']
+    
+    def test_histogram_quantiles(self):
+        """Тест корзин и квантилей гистограммы времени"""
+        histogram = Histogram()
+        for _ in range(98):
+            histogram.observe(5e-5)
+        histogram.observe(0.5)
+        histogram.observe(20.0)
+        data = histogram.to_dict()
+        assert data['count'] == 100
+        assert 5e-5 <= data['p50'] <= 1e-4
+        assert data['p99'] == pytest.approx(1.0)
+        assert data['max'] == 20.0
+        assert data['buckets']['inf'] == 1
+    
+    def test_quantile_within_observed_range(self):
+        """Тест: квантиль не выходит за наблюдавшиеся min и max"""
+        histogram = Histogram()
+        for _ in range(100):
+            histogram.observe(1.2e-4)
+        assert histogram.quantile(0.5) == pytest.approx(1.2e-4)
+        assert histogram.quantile(0.99) == pytest.approx(1.2e-4)
+        
+        histogram = Histogram()
+        for value in range(1, 101):
+            histogram.observe(value * 1e-5)
+        assert 4e-4 <= histogram.quantile(0.5) <= 6e-4
+        assert histogram.quantile(0.99) <= histogram.max
+        assert histogram.quantile(0.5) < histogram.quantile(0.99)
+    
+    def test_profiler_sampling(self):
+        """Тест выборочного профилирования каждого N-го вызова"""
+        instrumentation.enable()
+        calls = []
+        
+        @instrumented('test.profiled')
+        def profiled(value):
+            calls.append(value)
+            return value * 2
+        
+        metrics.profiler.start(sample_every=2)
+        assert [profiled(i) for i in range(4)] == [0, 2, 4, 6]
+        report = metrics.profiler.stop()
+        assert 'profiled' in report
+        assert calls == [0, 1, 2, 3]
+        assert not metrics.profiler.running
+
+
+class TestTriangleMesh:
+    """Тесты треугольной сетки и чтения двоичного STL"""
+    
+    @staticmethod
+    def cube(size=1.0):
+        """Куб [0, size]^3 из 12 треугольников с внешними нормалями"""
+        corners = np.array([[x, y, z] for x in (0, size) for y in (0, size) for z in (0, size)])
+        faces = [(0, 1, 3), (0, 3, 2), (4, 6, 7), (4, 7, 5), (0, 4, 5), (0, 5, 1),
+                 (2, 3, 7), (2, 7, 6), (0, 2, 6), (0, 6, 4), (1, 5, 7), (1, 7, 3)]
+        return corners[np.array(faces)]
+    
+    def test_cube_volume_area_mass(self):
+        """Тест объема, площади и массы куба"""
+        mesh = TriangleMesh(self.cube(2.0), Steel())
+        assert len(mesh) == 12
+        assert mesh.volume == pytest.approx(8.0)
+        assert mesh.surface_area == pytest.approx(24.0)
+        assert mesh.mass == pytest.approx(8.0 * 7850)
+        assert mesh.to_dict()['type'] == 'TriangleMesh'
+    
+    def test_orientation_and_scale(self):
+        """Тест: объем не зависит от ориентации граней, scale переводит единицы"""
+        inverted = self.cube()[:, ::-1]
+        assert TriangleMesh(inverted).volume == pytest.approx(1.0)
+        mesh = TriangleMesh(self.cube(1000.0), scale=0.001)
+        assert mesh.volume == pytest.approx(1.0)
+        assert mesh.surface_area == pytest.approx(6.0)
+    
+    def test_stl_round_trip_without_copy(self, tmp_path):
+        """Тест: вершины из STL - представление memmap, а не копия"""
+        path = str(tmp_path / 'cube.stl')
+        write_stl(path, self.cube(), header=b'cube')
+        assert os.path.getsize(path) == 84 + 12 * 50
+        
+        records = read_stl(path)
+        assert isinstance(records, np.memmap)
+        np.testing.assert_allclose(records['normal'][0], [-1, 0, 0])
+        mesh = TriangleMesh.from_stl(path, Copper())
+        assert isinstance(mesh.vertices.base, np.memmap)
+        assert mesh.volume == pytest.approx(1.0)
+        assert mesh.mass == pytest.approx(8960)
+    
+    def test_invalid_stl(self, tmp_path):
+        """Тест ошибок чтения STL и формы вершин"""
+        path = tmp_path / 'broken.stl'
+        path.write_bytes(bytes(80) + (5).to_bytes(4, 'little') + bytes(50))
+        with pytest.raises(ValueError, match="не соответствует"):
+            read_stl(str(path))
+        ascii_path = tmp_path / 'ascii.stl'
+        ascii_path.write_bytes(b'solid cube\n' + bytes(100))
+        with pytest.raises(ValueError, match="ASCII"):
+            read_stl(str(ascii_path))
+        empty = tmp_path / 'empty.stl'
+        write_stl(str(empty), np.zeros((0, 3, 3)))
+        assert len(read_stl(str(empty))) == 0
+        with pytest.raises(ValueError):
+            TriangleMesh(np.zeros((4, 3)))
+    
+    def test_cache_and_hash_by_content(self):
+        """Тест: сетки с равным числом треугольников различаются по вершинам"""
+        cache = ResultCache()
+        small, large = TriangleMesh(self.cube(1.0)), TriangleMesh(self.cube(2.0))
+        assert cache.calculate(small)['volume'] == pytest.approx(1.0)
+        assert cache.calculate(large)['volume'] == pytest.approx(8.0)
+        assert hash(small) == hash(TriangleMesh(self.cube(1.0)))
+        assert [count for _, count in deduplicate([small, large, TriangleMesh(self.cube(1.0))])] == [2, 1]
+    
+    def test_skip_duplicates_tells_meshes_apart(self, tmp_path):
+        """Тест: в базе сетки с равным числом треугольников различаются по вершинам"""
+        with GeometryDatabase(str(tmp_path / "mesh.db"), skip_duplicates=True) as db:
+            small, large = TriangleMesh(self.cube(1.0), Steel()), TriangleMesh(self.cube(2.0), Steel())
+            assert db.save_calculation(small.to_dict(), small.parameters)
+            assert db.save_calculation(large.to_dict(), large.parameters)
+            assert not db.save_calculation(small.to_dict(), small.parameters)
+            scaled = TriangleMesh(self.cube(1.0), Steel(), scale=0.5)
+            assert db.save_calculation(scaled.to_dict(), scaled.parameters)
+            assert db.get_statistics()['total_calculations'] == 3
+    
+    def test_digest_is_chunked(self, tmp_path, monkeypatch):
+        """Тест: хеш сетки из memmap не копирует все вершины и не зависит от порций"""
+        import tracemalloc
+        from geometry_package import mesh as mesh_module
+        
+        path = str(tmp_path / "cubes.stl")
+        write_stl(path, np.tile(self.cube(), (20000, 1, 1)))
+        expected = TriangleMesh.from_stl(path).digest
+        monkeypatch.setattr(mesh_module, 'CHUNK_TRIANGLES', 1000)
+        mesh = TriangleMesh.from_stl(path)
+        
+        tracemalloc.start()
+        try:
+            assert mesh.digest == expected
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        assert peak < mesh.vertices.nbytes / 4
+        assert TriangleMesh(np.asarray(mesh.vertices, dtype=np.float64)).digest == expected
+
+
 if __name__ == "__main__":
     # Запуск тестов напрямую
     pytest.main([__file__, "-v"])
\ No newline at end of file